@@ -29,6 +29,7 @@ import {
   getMascotPhrasesEnabled,
   getNickname,
   getSoundEnabled,
+  highlightSpans,
 } from '@/lib/data';
 import { playCorrectSound, playWrongSound } from '@/lib/sound';
 import { Heart, ChevronLeft, ChevronRight, ListOrdered, Shuffle, FolderOpen, BookOpen, Search, ArrowRight, LayoutGrid } from 'lucide-react';
@@ -50,6 +51,9 @@ import {
 
 type PracticeMode = 'order' | 'shuffle' | 'topic';
 
+/** 题目带预先算好的高亮位置时 HighlightTerms 用不到术语表；固定同一个空数组，避免其 useMemo 每次重算 */
+const NO_TERMS: string[] = [];
+
 function shuffleArray<T>(arr: T[]): T[] {
   const out = [...arr];
   for (let i = out.length - 1; i > 0; i--) {
@@ -253,6 +257,9 @@ function PracticeContent() {
   const isFavorite = q ? getFavoriteIds().includes(q.id) : false;
   const isMultiple = q ? isQuestionMultiple(q) : false;
   const answerCount = q ? getAnswerCount(q) : 1;
+  /** 逐术语匹配用的术语表：只在显示解析且没有预先算好的 highlights 时才拼 */
+  const highlightTerms =
+    q && showExplanation && !q.highlights ? [...new Set([...(q.related_terms ?? []), ...glossaryTerms])] : NO_TERMS;
 
   const handleSelect = (key: string) => {
     if (!q) return;
@@ -730,7 +737,8 @@ function PracticeContent() {
           <p className="mb-4 text-xs text-aws-navy/90 leading-relaxed">
             <HighlightTerms
               text={q.explanation.analysis}
-              terms={[...new Set([...(q.related_terms ?? []), ...glossaryTerms])]}
+              terms={highlightTerms}
+              spans={highlightSpans(q, 'explanation.analysis')}
               onTermClick={openTermDrawer}
               className="text-aws-navy/90"
             />
@@ -740,7 +748,8 @@ function PracticeContent() {
             <p className="text-xs text-aws-navy/90 leading-relaxed">
               <HighlightTerms
                 text={q.explanation.why_correct}
-                terms={[...new Set([...(q.related_terms ?? []), ...glossaryTerms])]}
+                terms={highlightTerms}
+                spans={highlightSpans(q, 'explanation.why_correct')}
                 onTermClick={openTermDrawer}
                 className="text-aws-navy/90"
               />
@@ -752,7 +761,8 @@ function PracticeContent() {
               <p className="text-xs text-aws-navy/90 leading-relaxed whitespace-pre-wrap">
                 <HighlightTerms
                   text={q.explanation.why_wrong}
-                  terms={[...new Set([...(q.related_terms ?? []), ...glossaryTerms])]}
+                  terms={highlightTerms}
+                  spans={highlightSpans(q, 'explanation.why_wrong')}
                   onTermClick={openTermDrawer}
                   className="text-aws-navy/90"
                 />
@@ -1,8 +1,9 @@
 'use client';
 
 import { useMemo } from 'react';
+import type { HighlightSpan } from '@/lib/data';
 
-type Segment = { type: 'text'; value: string } | { type: 'term'; value: string };
+type Segment = { type: 'text'; value: string } | { type: 'term'; value: string; term: string };
 
 /** 将正文中出现的术语切成片段，术语按长度降序避免短词先匹配 */
 function segmentByTerms(text: string, terms: string[]): Segment[] {
@@ -25,21 +26,36 @@ function segmentByTerms(text: string, terms: string[]): Segment[] {
     if (found.index > 0) {
       result.push({ type: 'text', value: remaining.slice(0, found.index) });
     }
-    result.push({ type: 'term', value: found.term });
+    result.push({ type: 'term', value: found.term, term: found.term });
     remaining = remaining.slice(found.index + found.term.length);
   }
   return result;
 }
 
+/** 按构建时算好的位置切片（见 scripts/build_app_questions.py --highlights），不再逐术语查找 */
+function segmentBySpans(text: string, spans: HighlightSpan[]): Segment[] {
+  const result: Segment[] = [];
+  let pos = 0;
+  for (const [start, length, term] of spans) {
+    if (start > pos) result.push({ type: 'text', value: text.slice(pos, start) });
+    result.push({ type: 'term', value: text.slice(start, start + length), term });
+    pos = start + length;
+  }
+  if (pos < text.length || result.length === 0) result.push({ type: 'text', value: text.slice(pos) });
+  return result;
+}
+
 type Props = {
   text: string;
   terms: string[];
+  /** 预先算好的术语位置；给出时忽略 terms */
+  spans?: HighlightSpan[];
   onTermClick: (term: string) => void;
   className?: string;
 };
 
-export function HighlightTerms({ text, terms, onTermClick, className = '' }: Props) {
-  const segments = useMemo(() => segmentByTerms(text, terms), [text, terms]);
+export function HighlightTerms({ text, terms, spans, onTermClick, className = '' }: Props) {
+  const segments = useMemo(() => (spans ? segmentBySpans(text, spans) : segmentByTerms(text, terms)), [text, terms, spans]);
   return (
     <span className={className}>
       {segments.map((seg, i) =>
@@ -49,7 +65,7 @@ export function HighlightTerms({ text, terms, onTermClick, className = '' }: Pro
           <button
             key={`${i}-${seg.value}`}
             type="button"
-            onClick={() => onTermClick(seg.value)}
+            onClick={() => onTermClick(seg.term)}
             className="cursor-pointer text-inherit underline decoration-aws-navy/40 underline-offset-2 hover:decoration-aws-navy/70"
           >
             {seg.value}
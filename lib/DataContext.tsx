@@ -1,7 +1,8 @@
 'use client';
 
 import { createContext, useContext, useState, useEffect, useCallback } from 'react';
-import type { Question, Glossary } from './data';
+import { attachHighlights } from './data';
+import type { Question, Glossary, HighlightsFile } from './data';
 
 type DataContextValue = {
   questions: Question[];
@@ -13,6 +14,39 @@ type DataContextValue = {
 
 const DataContext = createContext<DataContextValue | null>(null);
 
+type Manifest = { version: number; files: Record<string, string> };
+
+/**
+ * 数据文件地址：构建产物带内容哈希（见 scripts/build_app_questions.py --hash），由 manifest.json 给出，
+ * 文件名随内容变化，可走浏览器缓存，只有 manifest 每次向服务器验证；没有 manifest（本地开发）时直接读原文件。
+ */
+async function resolveDataUrls(): Promise<{ questions: string; glossary: string; highlights?: string; cache: RequestCache }> {
+  try {
+    const res = await fetch('/data/manifest.json', { cache: 'no-cache' });
+    if (res.ok) {
+      const manifest = (await res.json()) as Manifest;
+      const q = manifest.files?.['questions_v2.json'];
+      const g = manifest.files?.['glossary.json'];
+      const h = manifest.files?.['highlights.json'];
+      if (q && g) return { questions: `/data/${q}`, glossary: `/data/${g}`, highlights: h ? `/data/${h}` : undefined, cache: 'default' };
+    }
+  } catch {
+    // 忽略：回退到原文件
+  }
+  return { questions: '/data/questions_v2.json', glossary: '/data/glossary.json', cache: 'no-store' };
+}
+
+/** 预先算好的术语位置是可选的：没有或加载失败时 HighlightTerms 退回逐术语匹配 */
+async function loadHighlights(url: string | undefined, cache: RequestCache): Promise<HighlightsFile | null> {
+  if (!url) return null;
+  try {
+    const res = await fetch(url, { cache });
+    return res.ok ? ((await res.json()) as HighlightsFile) : null;
+  } catch {
+    return null;
+  }
+}
+
 export function DataProvider({ children }: { children: React.ReactNode }) {
   const [questions, setQuestions] = useState<Question[]>([]);
   const [glossary, setGlossary] = useState<Glossary | null>(null);
@@ -23,14 +57,16 @@ export function DataProvider({ children }: { children: React.ReactNode }) {
     setLoading(true);
     setError(null);
     try {
-      const [qRes, gRes] = await Promise.all([
-        fetch('/data/questions_v2.json', { cache: 'no-store' }),
-        fetch('/data/glossary.json', { cache: 'no-store' }),
+      const urls = await resolveDataUrls();
+      const [qRes, gRes, h] = await Promise.all([
+        fetch(urls.questions, { cache: urls.cache }),
+        fetch(urls.glossary, { cache: urls.cache }),
+        loadHighlights(urls.highlights, urls.cache),
       ]);
       if (!qRes.ok) throw new Error('题目数据加载失败');
       if (!gRes.ok) throw new Error('词库加载失败');
       const [q, g] = await Promise.all([qRes.json(), gRes.json()]);
-      setQuestions(Array.isArray(q) ? q : []);
+      setQuestions(Array.isArray(q) ? attachHighlights(q, h) : []);
       setGlossary(g && typeof g === 'object' ? g : null);
     } catch (e) {
       setError(e instanceof Error ? e.message : '加载失败');
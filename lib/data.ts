@@ -16,8 +16,40 @@ export type Question = {
   tags?: string[];
   related_terms?: string[];
   explanation?: { analysis: string; why_correct: string; why_wrong: string };
+  /** 构建时预先算好的术语位置（scripts/build_app_questions.py --highlights），键为字段路径如 "explanation.analysis" */
+  highlights?: Record<string, HighlightSpan[]>;
 };
 
+/** [起始下标, 长度, glossary 术语]；原文片段为 text.slice(start, start + length) */
+export type HighlightSpan = [number, number, string];
+
+/** highlights.json：spans[i] 对应第 i 题，每个字段为扁平的 [与上一段末尾的间隔, 长度, terms 下标, ...] */
+export type HighlightsFile = { version: number; count: number; terms: string[]; spans: Record<string, number[]>[] };
+
+/** 某字段预先算好的术语位置：题目带 highlights 时该字段无术语返回 []，没有 highlights 时返回 undefined（退回逐术语匹配） */
+export function highlightSpans(q: Question, path: string): HighlightSpan[] | undefined {
+  return q.highlights ? q.highlights[path] ?? [] : undefined;
+}
+
+/** 把 highlights.json 解码后挂到对应题目上；题数不一致（不是同一次构建）时原样返回 */
+export function attachHighlights(questions: Question[], data: HighlightsFile | null): Question[] {
+  if (!data || !Array.isArray(data.spans) || data.spans.length !== questions.length) return questions;
+  return questions.map((q, i) => {
+    const highlights: Record<string, HighlightSpan[]> = {};
+    for (const [path, flat] of Object.entries(data.spans[i] ?? {})) {
+      const spans: HighlightSpan[] = [];
+      let end = 0;
+      for (let j = 0; j + 2 < flat.length; j += 3) {
+        const start = end + flat[j];
+        spans.push([start, flat[j + 1], data.terms[flat[j + 2]]]);
+        end = start + flat[j + 1];
+      }
+      highlights[path] = spans;
+    }
+    return { ...q, highlights };
+  });
+}
+
 /** 将 best_answer 规范为字符串数组（兼容旧数据 string / 多字母串如 "AB"） */
 export function getBestAnswerArray(q: Question): string[] {
   const a = q.best_answer;
@@ -2,47 +2,39 @@
 """
 阶段 3：为 questions_bilingual.json 补全 tags、explanation、related_terms。
 调用 Gemini 生成考查点、解析、相关术语，输出 questions_bilingual_enriched.json。
-每 15 题一批调用 API，遇 429 自动重试（60s→120s→180s→300s），批间间隔 1s。
+按 token 预算多题一批调用 API（--batch-tokens，见 llm_batch.py），多批并发（--concurrency），遇 429 自动重试（60s→120s→180s→300s），见 llm_client.py。
 
 用法:
   export GEMINI_API_KEY="你的API密钥"
   python3 scripts/add_tags_and_explanation.py
   python3 scripts/add_tags_and_explanation.py --limit 5   # 试跑 5 题
-  python3 scripts/add_tags_and_explanation.py --resume  # 从断点继续（每 50 题保存）
+  python3 scripts/add_tags_and_explanation.py --resume  # 从断点继续（每批完成即追加到断点日志）
   python3 scripts/add_tags_and_explanation.py --fill-empty  # 全量跑完后，只补漏解析为空的题（逐题请求）
 """
 
 import json
-import os
 import re
 import sys
-import time
 from pathlib import Path
 
-RETRY_MAX = 4
-RETRY_WAIT_SEC = [60, 120, 180, 300]
-BASE_SLEEP_SEC = 1.0
-PROGRESS_SAVE_EVERY = 50
-# 每批题数，减少 API 调用以降低 429
-ENRICH_BATCH_SIZE = 15
-
-USE_NEW_GENAI = False
-try:
-    from google import genai as genai_new
-    USE_NEW_GENAI = True
-except ImportError:
-    try:
-        import google.generativeai as genai_old
-    except ImportError:
-        print("请先安装: pip install google-genai  或  pip install google-generativeai")
-        sys.exit(1)
+from checkpoint import ProgressJournal
+from llm_batch import AdaptiveBatcher, add_batch_args, bisect_batch, estimate_tokens, is_truncated, record_poison, salvage_by_id
+from llm_client import add_llm_args, create_client, map_ordered, run_llm
+from question_store import question_keys
+
 
 REPO_ROOT = Path(__file__).resolve().parent.parent
 DEFAULT_INPUT = REPO_ROOT / "public" / "data" / "questions_bilingual.json"
 DEFAULT_OUTPUT = REPO_ROOT / "public" / "data" / "questions_bilingual_enriched.json"
-PROGRESS_FILE = REPO_ROOT / "public" / "data" / ".enrich_progress.json"
+# 断点日志：每批完成后追加该批结果（见 checkpoint.py）；旧版整体重写的 .json 断点会自动迁移
+PROGRESS_FILE = REPO_ROOT / "public" / "data" / ".enrich_progress.jsonl"
+LEGACY_PROGRESS_FILE = REPO_ROOT / "public" / "data" / ".enrich_progress.json"
 DEBUG_PARSE_FAIL_LOG = REPO_ROOT / "public" / "data" / ".enrich_parse_fail_log.txt"
 GLOSSARY_PATH = REPO_ROOT / "public" / "data" / "glossary.json"
+# 批量打标中被二分隔离出的「毒题」题号，analyze_enrich_failures.py 会读取
+POISON_LOG = REPO_ROOT / "public" / "data" / ".enrich_poison_log.jsonl"
+# 修改打标/解析 prompt 时 +1：rebuild.py 会把所有题标为待重新打标
+PROMPT_VERSION = 1
 
 
 def log_parse_fail(label: str, raw_text: str):
@@ -55,17 +47,6 @@ def log_parse_fail(label: str, raw_text: str):
         pass
 
 
-def get_client_or_model():
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        print("请设置环境变量 GEMINI_API_KEY")
-        sys.exit(1)
-    if USE_NEW_GENAI:
-        return genai_new.Client(api_key=api_key.strip()), "new"
-    genai_old.configure(api_key=api_key.strip())
-    return genai_old.GenerativeModel("gemini-2.0-flash-lite"), "old"
-
-
 def load_glossary_keys() -> set[str]:
     """加载 glossary 键，用于 related_terms 对齐。"""
     if not GLOSSARY_PATH.exists():
@@ -123,10 +104,10 @@ def build_enrich_prompt(item: dict) -> str:
 
 
 def build_enrich_batch_prompt(items: list[dict]) -> str:
-    """多题一批的 prompt，要求返回 JSON 数组，顺序与输入一致。多选时按字母拆 correct_answer。"""
+    """多题一批的 prompt，每题带 id（批内题目键，见 question_keys），要求返回 JSON 数组且每个元素回带 id，便于按 id 取回。多选时按字母拆 correct_answer。"""
     n = len(items)
     parts = []
-    for i, item in enumerate(items, 1):
+    for i, (key, item) in enumerate(zip(question_keys(items), items), 1):
         q_cn = item.get("question_cn", "")
         opts_cn = item.get("options_cn") or {}
         opts_str = "\n   ".join(f"{k}. {v}" for k, v in sorted(opts_cn.items()))
@@ -138,13 +119,13 @@ def build_enrich_batch_prompt(items: list[dict]) -> str:
         wrong_opts = [k for k in sorted(opts_cn.keys()) if k not in correct_set]
         wrong_list = "、".join(wrong_opts) if wrong_opts else "其余选项"
         parts.append(
-            f"--- 题目 {i} ---\n"
+            f"--- 题目 {i} (id: {key}) ---\n"
             f"题干: {q_cn}\n"
             f"选项:\n   {opts_str}\n"
             f"正确答案: {correct_str}（why_correct 只写选项 {correct_str} 为何对；why_wrong 只写选项 {wrong_list} 为何错，不要写选项 {correct_str}）"
         )
     body = "\n\n".join(parts)
-    return f"""你是一位 AWS SAA-C03 备考解析助手。根据以下 {n} 道题目与各自正确答案，输出一个 JSON 数组（仅此数组，无其他文字）。数组必须恰好 {n} 个元素，顺序与题目 1～{n} 一一对应。
+    return f"""你是一位 AWS SAA-C03 备考解析助手。根据以下 {n} 道题目与各自正确答案，输出一个 JSON 数组（仅此数组，无其他文字）。数组必须恰好 {n} 个元素，顺序与题目 1～{n} 一一对应，每个元素的 "id" 照抄对应题目的 id。
 
 每道题的要求（与单题相同）：
 1. tags：考点/服务名数组，用英文服务名。
@@ -155,7 +136,18 @@ def build_enrich_batch_prompt(items: list[dict]) -> str:
 
 {body}
 
-输出：JSON 数组，共 {n} 个元素，每个元素为 {{"tags": [...], "explanation": {{"analysis": "...", "why_correct": "...", "why_wrong": "..."}}, "related_terms": [...]}}。"""
+输出：JSON 数组，共 {n} 个元素，每个元素为 {{"id": 题目 id, "tags": [...], "explanation": {{"analysis": "...", "why_correct": "...", "why_wrong": "..."}}, "related_terms": [...]}}。"""
+
+
+def estimate_input_tokens(item: dict) -> int:
+    """单题在批量 prompt 中占用的输入 token（题干 + 选项 + 正确答案说明行）。"""
+    opts = item.get("options_cn") or {}
+    return estimate_tokens(item.get("question_cn", "")) + sum(estimate_tokens(v) for v in opts.values()) + 60
+
+
+def estimate_output_tokens(item: dict) -> int:
+    """单题解析的输出 token：三段解析与 tags/related_terms 约 450 token，题目越长解析越长。"""
+    return 450 + estimate_input_tokens(item) // 4
 
 
 def parse_enrich_response(text: str) -> dict | None:
@@ -200,51 +192,24 @@ def _normalize_explanation(o: dict) -> dict | None:
     return None
 
 
-def parse_enrich_batch_response(text: str, expected_len: int) -> list[dict] | None:
-    """解析多题一批的 JSON 数组，长度须与 expected_len 一致。"""
-    text = text.strip()
-    if text.startswith("```"):
-        text = re.sub(r"^```(?:json)?\s*", "", text)
-        text = re.sub(r"\s*```\s*$", "", text)
-    try:
-        arr = json.loads(text)
-        if not isinstance(arr, list) or len(arr) != expected_len:
-            return None
-        out = []
-        for i, o in enumerate(arr):
-            if not isinstance(o, dict) or "tags" not in o or "related_terms" not in o:
-                return None
-            if "explanation" not in o and "why_correct" not in o:
-                return None
-            exp = _normalize_explanation(o)
-            if exp is None:
-                return None
-            out.append({
-                "tags": o.get("tags") if isinstance(o.get("tags"), list) else [],
-                "explanation": exp,
-                "related_terms": o.get("related_terms") if isinstance(o.get("related_terms"), list) else [],
-            })
-        return out
-    except (json.JSONDecodeError, TypeError):
+def _normalize_enrich_item(o: dict) -> dict | None:
+    if "tags" not in o or "related_terms" not in o:
         return None
+    if "explanation" not in o and "why_correct" not in o:
+        return None
+    exp = _normalize_explanation(o)
+    if exp is None:
+        return None
+    return {
+        "tags": o.get("tags") if isinstance(o.get("tags"), list) else [],
+        "explanation": exp,
+        "related_terms": o.get("related_terms") if isinstance(o.get("related_terms"), list) else [],
+    }
 
 
-def load_progress() -> tuple[list, int]:
-    if not PROGRESS_FILE.exists():
-        return [], 0
-    try:
-        data = json.loads(PROGRESS_FILE.read_text(encoding="utf-8"))
-        return data.get("items", []), data.get("last_index", 0)
-    except Exception:
-        return [], 0
-
-
-def save_progress(items: list, last_index: int):
-    PROGRESS_FILE.parent.mkdir(parents=True, exist_ok=True)
-    PROGRESS_FILE.write_text(
-        json.dumps({"items": items, "last_index": last_index}, ensure_ascii=False, indent=2),
-        encoding="utf-8",
-    )
+def parse_enrich_batch_response(text: str, keys: list) -> dict[str, dict]:
+    """按 id 解析多题一批的 JSON 数组：返回 题目键 -> {tags, explanation, related_terms}，只含完好的元素；缺失或格式错误的题不在结果中。"""
+    return salvage_by_id(text, keys, _normalize_enrich_item)
 
 
 def has_enrichment(item: dict) -> bool:
@@ -277,42 +242,7 @@ def align_related_terms(terms: list[str], glossary_keys: set[str]) -> list[str]:
     return out
 
 
-def enrich_one(client_or_model, sdk: str, item: dict, glossary_keys: set[str]) -> dict:
-    """为单题调用 API 生成 tags、explanation、related_terms。"""
-    qid = item.get("id", 0)
-    for attempt in range(RETRY_MAX + 1):
-        try:
-            prompt = build_enrich_prompt(item)
-            if sdk == "new":
-                response = client_or_model.models.generate_content(
-                    model="gemini-2.0-flash-lite",
-                    contents=prompt,
-                )
-                text = response.text if hasattr(response, "text") else (response.candidates[0].content.parts[0].text if response.candidates else "")
-            else:
-                response = client_or_model.generate_content(prompt)
-                text = response.text if hasattr(response, "text") else (response.candidates[0].content.parts[0].text if response.candidates else "")
-            parsed = parse_enrich_response(text)
-            if parsed:
-                terms = align_related_terms(parsed["related_terms"], glossary_keys)
-                return {
-                    **item,
-                    "tags": parsed["tags"],
-                    "explanation": parsed["explanation"],
-                    "related_terms": terms,
-                }
-            log_parse_fail(f"题 {qid}", text)
-            print(f"  [WARN] 题 {qid} 解析格式异常，保留空（原始响应已写入 {DEBUG_PARSE_FAIL_LOG.name}）")
-        except Exception as e:
-            err_str = str(e)
-            is_rate_limit = "429" in err_str or "Resource exhausted" in err_str or "quota" in err_str.lower() or "rate" in err_str.lower()
-            if is_rate_limit and attempt < RETRY_MAX:
-                wait = RETRY_WAIT_SEC[attempt]
-                print(f"  [429/限流] 题 {qid}，{wait} 秒后重试（第 {attempt + 1}/{RETRY_MAX} 次）")
-                time.sleep(wait)
-            else:
-                print(f"  [ERROR] 题 {qid}: {e}")
-        break
+def _empty_enrichment(item: dict) -> dict:
     return {
         **item,
         "tags": [],
@@ -321,57 +251,85 @@ def enrich_one(client_or_model, sdk: str, item: dict, glossary_keys: set[str]) -
     }
 
 
-def enrich_batch(client_or_model, sdk: str, items: list[dict], glossary_keys: set[str]) -> list[dict]:
-    """每批最多 ENRICH_BATCH_SIZE 题调用一次 API；失败或解析异常则逐题回退。"""
+async def enrich_one(client, item: dict, glossary_keys: set[str]) -> dict:
+    """为单题调用 API 生成 tags、explanation、related_terms。"""
+    qid = item.get("id", 0)
+    text = await client.generate(build_enrich_prompt(item), label=f"题 {qid}", validate=lambda t: parse_enrich_response(t) is not None)
+    if text is None:
+        return _empty_enrichment(item)
+    parsed = parse_enrich_response(text)
+    if parsed:
+        terms = align_related_terms(parsed["related_terms"], glossary_keys)
+        return {
+            **item,
+            "tags": parsed["tags"],
+            "explanation": parsed["explanation"],
+            "related_terms": terms,
+        }
+    log_parse_fail(f"题 {qid}", text)
+    print(f"  [WARN] 题 {qid} 解析格式异常，保留空（原始响应已写入 {DEBUG_PARSE_FAIL_LOG.name}）")
+    return _empty_enrichment(item)
+
+
+async def _request_enrich_batch(
+    client, items: list[dict], glossary_keys: set[str], batcher: AdaptiveBatcher | None = None
+) -> list[dict | None] | None:
+    """一批题只发一次请求；按批内题目键（重复题号为 "题号#n"）取回完好的结果，取不回的题为 None（由 bisect_batch 重新排队），请求失败返回 None（整批留空）。"""
     n = len(items)
-    prompt = build_enrich_batch_prompt(items)
-    for attempt in range(RETRY_MAX + 1):
-        try:
-            if sdk == "new":
-                response = client_or_model.models.generate_content(
-                    model="gemini-2.0-flash-lite",
-                    contents=prompt,
-                )
-                text = response.text if hasattr(response, "text") else (response.candidates[0].content.parts[0].text if response.candidates else "")
-            else:
-                response = client_or_model.generate_content(prompt)
-                text = response.text if hasattr(response, "text") else (response.candidates[0].content.parts[0].text if response.candidates else "")
-            parsed_list = parse_enrich_batch_response(text, n)
-            if parsed_list:
-                return [
-                    {
-                        **item,
-                        "tags": p["tags"],
-                        "explanation": p["explanation"],
-                        "related_terms": align_related_terms(p["related_terms"], glossary_keys),
-                    }
-                    for item, p in zip(items, parsed_list)
-                ]
-            ids_str = ",".join(str(item.get("id", i)) for i, item in enumerate(items))
-            log_parse_fail(f"本批 {n} 题 id={ids_str}", text)
-            print(f"  [WARN] 本批 {n} 题解析格式异常，改为逐题请求（原始响应已写入 {DEBUG_PARSE_FAIL_LOG.name}）")
-            return [enrich_one(client_or_model, sdk, item, glossary_keys) for item in items]
-        except Exception as e:
-            err_str = str(e)
-            is_rate_limit = "429" in err_str or "Resource exhausted" in err_str or "quota" in err_str.lower() or "rate" in err_str.lower()
-            if is_rate_limit and attempt < RETRY_MAX:
-                wait = RETRY_WAIT_SEC[attempt]
-                ids_str = ",".join(str(item.get("id", i)) for i, item in enumerate(items))
-                print(f"  [429/限流] 本批题 {ids_str}，{wait} 秒后重试（第 {attempt + 1}/{RETRY_MAX} 次）")
-                time.sleep(wait)
-            else:
-                print(f"  [ERROR] 本批 {n} 题: {e}，改为逐题请求")
-                return [enrich_one(client_or_model, sdk, item, glossary_keys) for item in items]
+    keys = question_keys(items)
+    ids_str = ",".join(keys)
+    text = await client.generate(
+        build_enrich_batch_prompt(items), label=f"本批题 {ids_str}", validate=lambda t: bool(parse_enrich_batch_response(t, keys))
+    )
+    if text is None:
+        print(f"  [WARN] 本批 {n} 题请求失败，保留空，留待 --fill-empty")
+        return None
+    parsed = parse_enrich_batch_response(text, keys)
+    if batcher:
+        batcher.record(n, len(parsed), is_truncated(text))
+    if len(parsed) < n:
+        missing = [k for k in keys if k not in parsed]
+        log_parse_fail(f"本批 {n} 题 id={ids_str}，缺失/格式异常 id={','.join(missing)}", text)
+        if not parsed:
+            print(f"  [WARN] 本批 {n} 题解析格式异常{'，二分拆批重试' if n > 1 else ''}（原始响应已写入 {DEBUG_PARSE_FAIL_LOG.name}）")
+        else:
+            print(f"  [WARN] 本批 {n} 题取回 {len(parsed)} 题，缺失/格式异常的题 {','.join(missing)} 重新请求（原始响应已写入 {DEBUG_PARSE_FAIL_LOG.name}）")
     return [
-        {**item, "tags": [], "explanation": {"analysis": "", "why_correct": "", "why_wrong": ""}, "related_terms": []}
-        for item in items
+        {
+            **item,
+            "tags": parsed[key]["tags"],
+            "explanation": parsed[key]["explanation"],
+            "related_terms": align_related_terms(parsed[key]["related_terms"], glossary_keys),
+        }
+        if key in parsed
+        else None
+        for item, key in zip(items, keys)
     ]
 
 
-def _run_fill_empty(client_or_model, sdk: str, output_path: Path, glossary_keys: set[str]):
-    """只补漏解析为空的题：从 enriched 或进度中找出未成功的题，逐题重新请求。"""
-    if PROGRESS_FILE.exists():
-        done_items, last_index = load_progress()
+def _on_poison(item: dict):
+    print(f"  [POISON] 题 {item.get('id')} 单独成批仍失败，改用单题请求（已记入 {POISON_LOG.name}）")
+    record_poison(POISON_LOG, "enrich", item.get("id"))
+
+
+async def enrich_batch(client, items: list[dict], glossary_keys: set[str], batcher: AdaptiveBatcher | None = None) -> list[dict]:
+    """一批题调用一次 API；解析异常则对半拆批递归重试，拆到单题仍失败再用单题 prompt；请求失败的批留空。"""
+    # 只有按预算装出的整批才反馈给 batcher，二分出的子批不计
+    return await bisect_batch(
+        items,
+        lambda sub: _request_enrich_batch(client, sub, glossary_keys, batcher if sub is items else None),
+        lambda item: enrich_one(client, item, glossary_keys),
+        _on_poison,
+        _empty_enrichment,
+    )
+
+
+async def _run_fill_empty(client, output_path: Path, glossary_keys: set[str]):
+    """只补漏解析为空的题：从 enriched 或进度中找出未成功的题，逐题重新请求（并发）。"""
+    journal = ProgressJournal(PROGRESS_FILE, legacy_path=LEGACY_PROGRESS_FILE)
+    if journal.exists():
+        done_items = journal.load()
+        last_index = len(done_items)
         source = "进度"
     else:
         if not output_path.exists():
@@ -387,43 +345,38 @@ def _run_fill_empty(client_or_model, sdk: str, output_path: Path, glossary_keys:
         print(f"当前 {source} 中无解析为空的题，无需补漏。")
         return
     print(f"从 {source} 中检出 {len(empty_indices)} 题需补漏（逐题请求），题号示例: {empty_indices[:15]}{'...' if len(empty_indices) > 15 else ''}")
-    for idx in empty_indices:
-        item = done_items[idx]
-        qid = item.get("id", idx + 1)
-        done_items[idx] = enrich_one(client_or_model, sdk, item, glossary_keys)
-        time.sleep(BASE_SLEEP_SEC)
-    if PROGRESS_FILE.exists():
-        save_progress(done_items, last_index)
+
+    def on_item(k: int, enriched: dict):
+        # 每题完成即写入断点日志，中断时已补的题不丢
+        if source == "进度":
+            journal.update([empty_indices[k]], [enriched])
+
+    client.plan(len(empty_indices))
+    results = await map_ordered(lambda idx: enrich_one(client, done_items[idx], glossary_keys), empty_indices, on_item)
+    for idx, enriched in zip(empty_indices, results):
+        done_items[idx] = enriched
+    if source == "进度":
+        journal.compact(done_items)
         print(f"已更新进度，共 {len(done_items)} 题，断点第 {last_index} 题。")
     else:
         output_path.write_text(json.dumps(done_items, ensure_ascii=False, indent=2), encoding="utf-8")
         print(f"已写入: {output_path}，共 {len(done_items)} 题。")
 
 
-def main():
-    import argparse
-    parser = argparse.ArgumentParser(description="为题目补全 tags、explanation、related_terms")
-    parser.add_argument("input", nargs="?", default=str(DEFAULT_INPUT), help="输入 JSON（questions_bilingual.json）")
-    parser.add_argument("output", nargs="?", default=str(DEFAULT_OUTPUT), help="输出 JSON（enriched）")
-    parser.add_argument("--resume", action="store_true", help="从上次进度继续")
-    parser.add_argument("--limit", type=int, default=0, help="最多处理题数（0=全部）")
-    parser.add_argument("--fill-empty", action="store_true", help="只补漏解析为空的题（逐题请求，避免批解析失败）")
-    args = parser.parse_args()
-
-    input_path = Path(args.input).resolve()
-    output_path = Path(args.output).resolve()
-    if not input_path.exists():
-        print(f"输入文件不存在: {input_path}")
-        sys.exit(1)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-
-    client_or_model, sdk = get_client_or_model()
-    print("使用: Gemini 2 Flash Lite")
+async def _run(args, input_path: Path, output_path: Path):
+    client = create_client(args)
+    print(f"使用: Gemini 2 Flash Lite（并发 {client.concurrency}）")
     glossary_keys = load_glossary_keys()
     print(f"已加载 glossary 键数: {len(glossary_keys)}")
+    try:
+        await _enrich_all(args, client, input_path, output_path, glossary_keys)
+    finally:
+        client.close()
+
 
+async def _enrich_all(args, client, input_path: Path, output_path: Path, glossary_keys: set[str]):
     if args.fill_empty:
-        _run_fill_empty(client_or_model, sdk, output_path, glossary_keys)
+        await _run_fill_empty(client, output_path, glossary_keys)
         return
 
     with open(input_path, "r", encoding="utf-8") as f:
@@ -431,34 +384,64 @@ def main():
     if not isinstance(raw, list):
         raw = [raw]
 
-    done_items, last_index = load_progress() if args.resume else ([], 0)
-    if args.resume and done_items:
+    journal = ProgressJournal(PROGRESS_FILE, legacy_path=LEGACY_PROGRESS_FILE)
+    done_items = journal.load() if args.resume else []
+    last_index = len(done_items)
+    if done_items:
         print(f"从进度恢复: 已完成 {len(done_items)} 题，从第 {last_index + 1} 题继续")
     else:
-        last_index = 0
-        done_items = []
+        # 从头开始时清掉旧日志，避免新旧记录混在一起
+        journal.remove()
 
     end_index = len(raw) if args.limit <= 0 else min(last_index + args.limit, len(raw))
 
-    print(f"每 {ENRICH_BATCH_SIZE} 题一批调用 API")
+    # 每轮按 token 预算装出 concurrency 批并发请求，按顺序收集后保存断点；预算随截断/缺失情况自动调整
+    batcher = AdaptiveBatcher(estimate_input_tokens, estimate_output_tokens, output_budget=args.batch_tokens, metrics=client.metrics)
+    print(f"按每批约 {batcher.output_budget} 输出 token 装批调用 API，每轮 {client.concurrency} 批")
+    client.plan(len(batcher.split(raw[last_index:end_index])))
     start = last_index
     while start < end_index:
-        chunk_end = min(start + ENRICH_BATCH_SIZE, end_index)
-        chunk = [raw[i] for i in range(start, chunk_end)]
-        enriched = enrich_batch(client_or_model, sdk, chunk, glossary_keys)
-        done_items.extend(enriched)
-        if (start + len(chunk)) % PROGRESS_SAVE_EVERY == 0 or chunk_end == end_index:
-            save_progress(done_items, chunk_end)
-            print(f"  已处理 {len(done_items)}/{end_index} 题，已保存断点（第 {chunk_end} 题）")
-        time.sleep(BASE_SLEEP_SEC)
-        start = chunk_end
+        chunks = batcher.split(raw[start:end_index], max_batches=client.concurrency)
+        round_end = start + sum(len(c) for c in chunks)
+        offsets = [start + sum(len(c) for c in chunks[:k]) for k in range(len(chunks))]
+        # 每批一完成就追加到断点日志（不必等同轮其它批），崩溃最多丢失在途的批次
+        results = await map_ordered(
+            lambda chunk: enrich_batch(client, chunk, glossary_keys, batcher),
+            chunks,
+            lambda k, enriched: journal.append(offsets[k], enriched),
+        )
+        for enriched in results:
+            done_items.extend(enriched)
+        print(f"  已处理 {len(done_items)}/{end_index} 题（本轮每批 {'/'.join(str(len(c)) for c in chunks)} 题），已保存断点（第 {round_end} 题）")
+        start = round_end
 
     with open(output_path, "w", encoding="utf-8") as f:
         json.dump(done_items, f, ensure_ascii=False, indent=2)
-    if PROGRESS_FILE.exists():
-        PROGRESS_FILE.unlink()
+    journal.remove()
     print(f"已写入: {output_path}，共 {len(done_items)} 题")
 
 
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="为题目补全 tags、explanation、related_terms")
+    parser.add_argument("input", nargs="?", default=str(DEFAULT_INPUT), help="输入 JSON（questions_bilingual.json）")
+    parser.add_argument("output", nargs="?", default=str(DEFAULT_OUTPUT), help="输出 JSON（enriched）")
+    parser.add_argument("--resume", action="store_true", help="从上次进度继续")
+    parser.add_argument("--limit", type=int, default=0, help="最多处理题数（0=全部）")
+    parser.add_argument("--fill-empty", action="store_true", help="只补漏解析为空的题（逐题请求，避免批解析失败）")
+    add_llm_args(parser)
+    add_batch_args(parser)
+    args = parser.parse_args()
+
+    input_path = Path(args.input).resolve()
+    output_path = Path(args.output).resolve()
+    if not input_path.exists():
+        print(f"输入文件不存在: {input_path}")
+        sys.exit(1)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    run_llm(_run(args, input_path, output_path))
+
+
 if __name__ == "__main__":
     main()
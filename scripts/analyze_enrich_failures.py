@@ -21,8 +21,11 @@ import json
 import sys
 from pathlib import Path
 
+from llm_batch import load_poison_ids
+
 REPO_ROOT = Path(__file__).resolve().parent.parent
 DEFAULT_PATH = REPO_ROOT / "public" / "data" / "questions_bilingual_enriched.json"
+POISON_LOG = REPO_ROOT / "public" / "data" / ".enrich_poison_log.jsonl"
 
 
 def has_enrichment(item: dict) -> bool:
@@ -123,6 +126,10 @@ def main():
     print("5. no_obvious_source_issue（无明显源数据问题，多为 API 超时/429 或模型解析异常）")
     ids = by_reason["no_obvious_source_issue"]
     print(f"   题数: {len(ids)}，题号: {ids[:40]}{'...' if len(ids) > 40 else ''}\n")
+    poison_ids = load_poison_ids(POISON_LOG, "enrich")
+    if poison_ids:
+        print(f"另：批量请求中被二分隔离的题（{POISON_LOG.name}，不论是否已补全）")
+        print(f"   题数: {len(poison_ids)}，题号: {poison_ids[:40]}{'...' if len(poison_ids) > 40 else ''}\n")
     print("-" * 60)
     print("建议：")
     if by_reason["options_mismatch"]:
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+App 发布产物：把题库、百科等 JSON 写成紧凑格式（无缩进、无多余空格），并预先生成 .gz 与 .br 压缩版本，
+静态服务器（如 nginx gzip_static / brotli_static）可直接发送压缩文件，不必每次请求现压。
+由 build_app_questions.py --dist 调用，输出到 public/data/dist/（生成物，不入库）。
+
+- 压缩参数固定（gzip 9、brotli 11，gzip 头不写时间戳），内容不变时产物逐字节不变；
+- brotli 需 pip install brotli，未安装时只生成 .gz 并提示；
+- 每个产物记录 原始（indent=2）/ 紧凑 / gzip / brotli 字节数，report() 打印汇总表；
+- hashed=True 时文件名带内容哈希（questions_v2.<hash>.json），并由 write_manifest() 写出 public/data/manifest.json
+  （逻辑名 -> 实际文件）。内容变了文件名才变，数据文件可长期缓存（immutable），只有 manifest 需要每次验证；
+- 每次构建结束 prune() 删除上次写出、本次未再写出的旧产物（旧哈希、数量变化后多出的分片）。
+"""
+import gzip
+import hashlib
+import json
+import os
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # 可选依赖：未安装时跳过 .br
+    brotli = None
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DATA_DIR = REPO_ROOT / "public" / "data"
+DIST_DIR = DATA_DIR / "dist"
+GLOSSARY_PATH = DATA_DIR / "glossary.json"
+MANIFEST_PATH = DATA_DIR / "manifest.json"
+MANIFEST_VERSION = 1
+HASH_LEN = 10
+# 记录本次构建写出的文件，供下次 prune() 删除旧产物
+ARTIFACT_LIST = ".artifacts.json"
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+
+def dumps_min(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps_pretty(obj) -> bytes:
+    """与仓库中 JSON 文件相同的排版（indent=2），用作对比基准。"""
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def compress_variants(data: bytes) -> dict[str, bytes]:
+    """返回 后缀 -> 内容：""（原文）、".gz"，以及安装了 brotli 时的 ".br"。"""
+    out = {"": data, ".gz": gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)}
+    if brotli is not None:
+        out[".br"] = brotli.compress(data, quality=BROTLI_QUALITY)
+    return out
+
+
+def write_bytes(path: Path, data: bytes):
+    """临时文件 + os.replace 写入，中断时不留半个文件。"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:HASH_LEN]
+
+
+class ArtifactWriter:
+    """向 out_dir 写紧凑 JSON 及其压缩版本，并记录各产物字节数；hashed=True 时文件名带内容哈希。"""
+
+    def __init__(self, out_dir: Path = DIST_DIR, hashed: bool = False):
+        self.out_dir = Path(out_dir)
+        self.hashed = hashed
+        self.sizes: list[dict] = []
+        # 逻辑名 -> 实际文件名（相对 out_dir）
+        self.files: dict[str, str] = {}
+        self._warned = False
+
+    def write(self, name: str, obj, group: str | None = None) -> str:
+        """写 name（紧凑 JSON，可含子目录）及其 .gz/.br，返回实际文件名（相对 out_dir，hashed 时带哈希）。
+        group 相同的产物在报告中合并为一行。"""
+        data = dumps_min(obj)
+        variants = compress_variants(data)
+        actual = name
+        if self.hashed:
+            stem, dot, ext = name.rpartition(".")
+            actual = f"{stem}.{content_hash(data)}{dot}{ext}"
+        path = self.out_dir / actual
+        for suffix, content in variants.items():
+            write_bytes(path.with_name(path.name + suffix), content)
+        if brotli is None and not self._warned:
+            print("  [DIST] 未安装 brotli（pip install brotli），只生成 .gz")
+            self._warned = True
+        self.files[name] = actual
+        self.sizes.append(
+            {
+                "name": name,
+                "file": actual,
+                "group": group,
+                "pretty": len(dumps_pretty(obj)),
+                "min": len(data),
+                "gz": len(variants[".gz"]),
+                "br": len(variants[".br"]) if ".br" in variants else None,
+            }
+        )
+        return actual
+
+    def prune(self) -> int:
+        """删除上次构建写出、本次没有再写的文件（旧哈希、多出的分片），返回删除的文件数。
+        只删 out_dir/.artifacts.json 中记录过的文件，--dist-dir 指向其它目录时不会误删无关文件。"""
+        listing = self.out_dir / ARTIFACT_LIST
+        keep = sorted(f"{actual}{suffix}" for actual in self.files.values() for suffix in ("", ".gz", ".br"))
+        try:
+            previous = json.loads(listing.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            previous = []
+        removed = 0
+        for rel in set(previous) - set(keep):
+            path = self.out_dir / rel
+            if path.is_file():
+                path.unlink()
+                removed += 1
+            if path.parent != self.out_dir and path.parent.is_dir() and not any(path.parent.iterdir()):
+                path.parent.rmdir()
+        write_bytes(listing, json.dumps(keep, ensure_ascii=False).encode("utf-8"))
+        return removed
+
+    def write_manifest(self, path: Path = MANIFEST_PATH) -> dict:
+        """写 manifest：逻辑名 -> 相对 manifest 所在目录的实际路径（如 dist/questions_v2.<hash>.json）与字节数。"""
+        base = Path(os.path.relpath(self.out_dir, Path(path).parent)).as_posix()
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "files": {name: f"{base}/{actual}" for name, actual in self.files.items()},
+            "bytes": {s["name"]: s["min"] for s in self.sizes},
+        }
+        write_bytes(Path(path), json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"))
+        return manifest
+
+    def total(self, field: str, sizes: list[dict] | None = None) -> int:
+        return sum(s[field] or 0 for s in (self.sizes if sizes is None else sizes))
+
+    def _rows(self) -> list[dict]:
+        """未分组的产物各占一行，同组产物合并为一行。"""
+        rows: list = []
+        groups: dict[str, list[dict]] = {}
+        for s in self.sizes:
+            if s["group"] is None:
+                rows.append(s)
+                continue
+            if s["group"] not in groups:
+                groups[s["group"]] = []
+                rows.append(groups[s["group"]])
+            groups[s["group"]].append(s)
+        out = []
+        for row in rows:
+            if isinstance(row, dict):
+                out.append(row)
+                continue
+            has_br = all(s["br"] for s in row)
+            out.append(
+                {
+                    "name": f"{row[0]['group']}（{len(row)} 个，紧凑最大 {max(s['min'] for s in row) / 1024:,.0f} KB）",
+                    "pretty": self.total("pretty", row),
+                    "min": self.total("min", row),
+                    "gz": self.total("gz", row),
+                    "br": self.total("br", row) if has_br else None,
+                }
+            )
+        return out
+
+    def report(self):
+        def kb(n):
+            return "-" if n is None else f"{n / 1024:,.1f}"
+
+        print(f"  {'产物':<32}{'原始 KB':>11}{'紧凑 KB':>11}{'gzip KB':>11}{'brotli KB':>11}{'压缩比':>8}")
+        for s in self._rows():
+            best = s["br"] or s["gz"]
+            print(f"  {s['name']:<32}{kb(s['pretty']):>11}{kb(s['min']):>11}{kb(s['gz']):>11}{kb(s['br']):>11}{s['pretty'] / best:>7.1f}x")
+        if len(self.sizes) > 1:
+            br = self.total("br") if all(s["br"] for s in self.sizes) else None
+            best = br or self.total("gz")
+            print(
+                f"  {'合计':<32}{kb(self.total('pretty')):>11}{kb(self.total('min')):>11}{kb(self.total('gz')):>11}{kb(br):>11}"
+                f"{self.total('pretty') / best:>7.1f}x"
+            )
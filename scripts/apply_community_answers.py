@@ -11,6 +11,9 @@
   export GEMINI_API_KEY="你的密钥"
   python3 scripts/re_explain_community_answers.py
 
+逐题逻辑注册为 postprocess.py 的 community_answer 变换，通常由 postprocess.py 与其它后处理一起单遍执行；
+本脚本只执行这一个变换。
+
 用法：
   python3 scripts/apply_community_answers.py
 """
@@ -18,6 +21,9 @@
 import json
 from pathlib import Path
 
+from postprocess import run, transform
+from question_store import question_keys
+
 REPO_ROOT = Path(__file__).resolve().parent.parent
 RAW_PATH = REPO_ROOT / "public" / "data" / "raw_questions_en.json"
 V2_PATH = REPO_ROOT / "public" / "data" / "questions_v2.json"
@@ -32,22 +38,28 @@ def load_raw() -> list[dict]:
         return json.load(f)
 
 
-def build_mismatch_map(raw_items: list[dict]) -> dict[int, tuple[str, str]]:
-    """返回 id -> (community_answer, vote_percentage) 的映射，仅包含 PDF 答案与社区答案不一致的题。"""
+def build_mismatch_map(raw_items: list[dict]) -> dict[str, tuple[str, str]]:
+    """返回 题目键 -> (community_answer, vote_percentage) 的映射，仅包含 PDF 答案与社区答案不一致的题。
+    题目键见 question_store.question_keys（重复题号的第 n 题为 "题号#n"），与 v2 / enriched 中同位置的题对应。"""
     out = {}
-    for item in raw_items:
-        qid = int(item.get("id", 0) or 0)
-        if not qid:
+    for key, item in zip(question_keys(raw_items), raw_items):
+        if not int(item.get("id", 0) or 0):
             continue
         pdf = (item.get("correct_answer") or "").strip()
         community = (item.get("community_answer") or "").strip()
         vote = (item.get("vote_percentage") or "").strip()
         if not community or pdf == community:
             continue
-        out[qid] = (community, vote)
+        out[key] = (community, vote)
     return out
 
 
+def load_mismatch() -> dict[str, tuple[str, str]]:
+    if not RAW_PATH.exists():
+        raise SystemExit(f"未找到 {RAW_PATH}，请先运行 extract_pdf_en.py")
+    return build_mismatch_map(load_raw())
+
+
 def ensure_disclaimer(analysis: str, community_answer: str, vote_percentage: str) -> str:
     """若 analysis 尚未包含免责说明，则在开头加上。"""
     if not analysis or not isinstance(analysis, str):
@@ -58,79 +70,48 @@ def ensure_disclaimer(analysis: str, community_answer: str, vote_percentage: str
     return f"{line}\n\n{analysis}" if analysis.strip() else line
 
 
+def _with_disclaimer(expl, analysis: str, community_answer: str, vote_percentage: str) -> dict:
+    """返回 analysis 开头补上免责说明后的 explanation；原 explanation 不是对象时新建。"""
+    if isinstance(expl, dict):
+        return {**expl, "analysis": ensure_disclaimer(analysis, community_answer, vote_percentage)}
+    return {"analysis": ensure_disclaimer("", community_answer, vote_percentage), "why_correct": "", "why_wrong": ""}
+
+
+@transform("community_answer", order=10, context=load_mismatch)
+def apply_community_answer(q: dict, file: str, key: str, mismatch: dict) -> dict:
+    """答案改为社区答案并在 analysis 开头补免责说明；v2 改 best_answer/official_answer，enriched 改 correct_answer。"""
+    if key not in mismatch:
+        return {}
+    community_answer, vote_percentage = mismatch[key]
+    expl = q.get("explanation")
+    analysis = expl.get("analysis") if isinstance(expl, dict) else ""
+    explanation = _with_disclaimer(expl, analysis if isinstance(analysis, str) else "", community_answer, vote_percentage)
+    if file == "v2":
+        return {
+            "best_answer": community_answer,
+            "official_answer": community_answer,
+            "vote_percentage": vote_percentage,
+            "explanation": explanation,
+        }
+    fields = {"correct_answer": community_answer, "explanation": explanation}
+    if "vote_percentage" in q or vote_percentage:
+        fields["vote_percentage"] = vote_percentage
+    return fields
+
+
 def main() -> None:
-    if not RAW_PATH.exists():
-        raise SystemExit(f"未找到 {RAW_PATH}，请先运行 extract_pdf_en.py")
     if not V2_PATH.exists():
         raise SystemExit(f"未找到 {V2_PATH}")
     if not ENRICHED_PATH.exists():
         raise SystemExit(f"未找到 {ENRICHED_PATH}")
 
-    raw_items = load_raw()
-    mismatch = build_mismatch_map(raw_items)
-    if not mismatch:
-        print("没有需要更新的题目（PDF 答案与社区答案一致）。")
+    # 单独执行 postprocess.py 中的这一个变换：两个文件各读写一遍，同一事务提交
+    report = run(["community_answer"], files={"v2": V2_PATH, "enriched": ENRICHED_PATH})
+    if not report.changed("community_answer"):
+        print("没有需要更新的题目（PDF 答案与社区答案一致，或已全部改为社区答案）。")
         return
-
-    print(f"将把 {len(mismatch)} 道题的答案改为社区投票答案，并补充解析说明。")
-
-    # 更新 questions_v2.json
-    with V2_PATH.open("r", encoding="utf-8") as f:
-        v2_list = json.load(f)
-    v2_by_id = {int(q["id"]): q for q in v2_list if isinstance(q, dict) and "id" in q}
-
-    for qid, (community_answer, vote_percentage) in mismatch.items():
-        q = v2_by_id.get(qid)
-        if not q:
-            continue
-        q["best_answer"] = community_answer
-        q["official_answer"] = community_answer
-        q["vote_percentage"] = vote_percentage
-        expl = q.get("explanation")
-        if isinstance(expl, dict):
-            analysis = expl.get("analysis") or ""
-            expl["analysis"] = ensure_disclaimer(analysis, community_answer, vote_percentage)
-        else:
-            q["explanation"] = {
-                "analysis": ensure_disclaimer("", community_answer, vote_percentage),
-                "why_correct": "",
-                "why_wrong": "",
-            }
-
-    with V2_PATH.open("w", encoding="utf-8") as f:
-        json.dump(v2_list, f, ensure_ascii=False, indent=2)
-
+    print(f"已把 {report.changed('community_answer', 'v2')} 道题的答案改为社区投票答案，并补充解析说明。")
     print(f"已写入 {V2_PATH}")
-
-    # 更新 questions_bilingual_enriched.json
-    with ENRICHED_PATH.open("r", encoding="utf-8") as f:
-        enriched_list = json.load(f)
-    enriched_by_id = {int(q.get("id")): q for q in enriched_list if isinstance(q, dict) and "id" in q}
-
-    for qid, (community_answer, vote_percentage) in mismatch.items():
-        q = enriched_by_id.get(qid)
-        if not q:
-            continue
-        q["correct_answer"] = community_answer
-        if "vote_percentage" in q or vote_percentage:
-            q["vote_percentage"] = vote_percentage
-        expl = q.get("explanation")
-        if isinstance(expl, dict):
-            analysis = expl.get("analysis")
-            if isinstance(analysis, str):
-                expl["analysis"] = ensure_disclaimer(analysis, community_answer, vote_percentage)
-            else:
-                expl["analysis"] = ensure_disclaimer("", community_answer, vote_percentage)
-        else:
-            q["explanation"] = {
-                "analysis": ensure_disclaimer("", community_answer, vote_percentage),
-                "why_correct": "",
-                "why_wrong": "",
-            }
-
-    with ENRICHED_PATH.open("w", encoding="utf-8") as f:
-        json.dump(enriched_list, f, ensure_ascii=False, indent=2)
-
     print(f"已写入 {ENRICHED_PATH}")
     print("完成。")
 
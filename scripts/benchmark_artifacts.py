@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+发布产物基准：对题库、百科等 JSON 比较 原始（indent=2）/ 紧凑 / gzip / brotli 四种形式的字节数与解码耗时
+（解压 + json.loads，取 --repeat 次的中位数），量化 build_app_questions.py --dist 的收益。
+产物在内存中按 app_artifacts.py 的参数生成，不读写 public/data/dist/。
+
+用法:
+  python3 scripts/benchmark_artifacts.py
+  python3 scripts/benchmark_artifacts.py public/data/questions_v2.json --repeat 20
+  python3 scripts/benchmark_artifacts.py --json artifacts_bench.json   # 结果另存为 JSON
+"""
+import gzip
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from app_artifacts import DATA_DIR, GLOSSARY_PATH, brotli, compress_variants, dumps_min, dumps_pretty
+
+DEFAULT_FILES = (DATA_DIR / "questions_v2.json", GLOSSARY_PATH)
+DEFAULT_REPEAT = 10
+
+
+def _decoder(suffix: str):
+    if suffix == ".gz":
+        return gzip.decompress
+    if suffix == ".br":
+        return brotli.decompress
+    return lambda data: data
+
+
+def decode_ms(data: bytes, suffix: str, repeat: int) -> float:
+    decompress = _decoder(suffix)
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        json.loads(decompress(data))
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times)
+
+
+def bench_file(path: Path, repeat: int) -> list[dict]:
+    obj = json.loads(path.read_text(encoding="utf-8"))
+    pretty = dumps_pretty(obj)
+    variants = {"原始": (pretty, "")}
+    for suffix, data in compress_variants(dumps_min(obj)).items():
+        variants[{"": "紧凑", ".gz": "gzip", ".br": "brotli"}[suffix]] = (data, suffix)
+    return [
+        {
+            "file": path.name,
+            "variant": name,
+            "bytes": len(data),
+            "ratio": round(len(pretty) / len(data), 2),
+            "decode_ms": round(decode_ms(data, suffix, repeat), 2),
+        }
+        for name, (data, suffix) in variants.items()
+    ]
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="比较发布产物各形式的字节数与解码耗时")
+    parser.add_argument("files", nargs="*", help="要测的 JSON（默认 questions_v2.json 与 glossary.json）")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help=f"每种形式解码次数，取中位数（默认 {DEFAULT_REPEAT}）")
+    parser.add_argument("--json", type=str, default="", help="结果另存为 JSON")
+    args = parser.parse_args()
+
+    paths = [Path(p).resolve() for p in args.files] or [p for p in DEFAULT_FILES if p.exists()]
+    missing = [p for p in paths if not p.exists()]
+    if missing:
+        print(f"文件不存在: {', '.join(str(p) for p in missing)}")
+        sys.exit(1)
+    if brotli is None:
+        print("未安装 brotli（pip install brotli），跳过 brotli 一栏")
+
+    print(f"{'文件':<24}{'形式':<8}{'字节':>12}{'压缩比':>8}{'解码(ms)':>10}")
+    results = []
+    for path in paths:
+        for r in bench_file(path, args.repeat):
+            results.append(r)
+            print(f"{r['file']:<24}{r['variant']:<8}{r['bytes']:>12,}{r['ratio']:>7.1f}x{r['decode_ms']:>10.1f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"已写入: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
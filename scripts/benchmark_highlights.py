@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+术语高亮基准：在整个题库上比较 components/HighlightTerms.tsx 的 segmentByTerms（术语按长度排序后，
+每切一段都对全部术语 indexOf，术语表为本题 related_terms 加全部 glossary 键，与 app/practice/page.tsx 相同）
+与 build_app_questions.py --highlights 预先算好的位置（App 只按位置切字符串）的耗时，并统计两者分段一致的字段比例。
+
+- 字段同 build_app_questions.HIGHLIGHT_FIELDS（题干、选项、解析），每个字段各算一遍；
+- 预计算一栏分两部分：构建时的多模式匹配（一次性）与渲染时的切片（每次显示）；
+- 两种分段应当完全一致（构建时已逐字段校验）；有不一致的字段时列出前几处并以退出码 1 结束。
+
+用法:
+  python3 scripts/benchmark_highlights.py
+  python3 scripts/benchmark_highlights.py --limit 200          # 只测前 200 题
+  python3 scripts/benchmark_highlights.py --json highlights_bench.json
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+from app_artifacts import GLOSSARY_PATH
+from build_app_questions import DEFAULT_OUTPUT, HIGHLIGHT_FIELDS, decode_spans, highlight_spans, highlight_terms, to_utf16_spans
+from term_matcher import field_texts, segment_by_terms
+
+# 不一致时列出的字段数
+REPORT_TOP = 10
+
+
+def segment_by_spans(text: str, spans: list[tuple[int, int, str]]) -> list[tuple[str, str]]:
+    """按预先算好的位置切片（App 端的做法）。"""
+    result = []
+    pos = 0
+    for start, length, _ in spans:
+        if start > pos:
+            result.append(("text", text[pos:start]))
+        result.append(("term", text[start : start + length]))
+        pos = start + length
+    if pos < len(text) or not result:
+        result.append(("text", text[pos:]))
+    return result
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="比较逐术语 indexOf 分段与预计算高亮位置的耗时")
+    parser.add_argument("--input", type=str, default=str(DEFAULT_OUTPUT), help="题库 JSON（默认 questions_v2.json）")
+    parser.add_argument("--limit", type=int, default=0, help="只测前 N 题（0=全部）")
+    parser.add_argument("--json", type=str, default="", help="结果另存为 JSON")
+    args = parser.parse_args()
+
+    input_path = Path(args.input)
+    if not input_path.exists() or not GLOSSARY_PATH.exists():
+        print(f"文件不存在: {input_path if not input_path.exists() else GLOSSARY_PATH}")
+        sys.exit(1)
+    questions = json.loads(input_path.read_text(encoding="utf-8"))
+    if args.limit:
+        questions = questions[: args.limit]
+    glossary = list(json.loads(GLOSSARY_PATH.read_text(encoding="utf-8")))
+    texts = [dict(field_texts(q, HIGHLIGHT_FIELDS)) for q in questions]
+    n_fields = sum(len(t) for t in texts)
+    print(f"{len(questions)} 题，{n_fields} 个字段，glossary {len(glossary)} 个术语")
+
+    started = time.perf_counter()
+    naive = []
+    for q, fields in zip(questions, texts):
+        terms = highlight_terms(q, glossary)
+        naive.append({path: segment_by_terms(text, terms) for path, text in fields.items()})
+    naive_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    data = highlight_spans(questions, glossary)
+    build_s = time.perf_counter() - started
+
+    decoded = [{path: decode_spans(flat, data["terms"]) for path, flat in fields.items()} for fields in data["spans"]]
+    started = time.perf_counter()
+    for fields, spans in zip(texts, decoded):
+        for path, text in fields.items():
+            segment_by_spans(text, spans.get(path, []))
+    slice_s = time.perf_counter() - started
+
+    differ = [
+        (q.get("id"), path)
+        for q, fields, naive_q, spans in zip(questions, texts, naive, decoded)
+        for path, text in fields.items()
+        if to_utf16_spans(text, naive_q[path]) != spans.get(path, [])
+    ]
+    same = n_fields - len(differ)
+    results = {
+        "questions": len(questions),
+        "fields": n_fields,
+        "naive_ms": round(naive_s * 1000, 1),
+        "matcher_build_ms": round(build_s * 1000, 1),
+        "slice_ms": round(slice_s * 1000, 1),
+        "speedup_render": round(naive_s / max(slice_s, 1e-9), 1),
+        "same_fields": same,
+    }
+    print(f"{'方式':<26}{'总耗时(ms)':>12}{'每题(ms)':>10}")
+    for name, seconds in (("逐术语 indexOf（每次渲染）", naive_s), ("多模式匹配（构建时一次）", build_s), ("按位置切片（每次渲染）", slice_s)):
+        print(f"{name:<26}{seconds * 1000:>12,.1f}{seconds * 1000 / max(len(questions), 1):>10.3f}")
+    print(f"渲染耗时为逐术语 indexOf 的 1/{results['speedup_render']:,.0f}；两种分段完全一致的字段 {same}/{n_fields}（{same / max(n_fields, 1):.1%}）")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"已写入: {args.json}")
+    if differ:
+        print("分段不一致的字段: " + "，".join(f"题 {qid} {path}" for qid, path in differ[:REPORT_TOP]))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
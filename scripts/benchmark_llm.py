@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+LLM 脚本吞吐基准：用离线替身（llm_standin.py）端到端跑 translate / enrich / fill_glossary / re_explain，
+统计每分钟处理的题目（词条）数，便于在 CI 中量化并发、批大小、重试策略的改动效果。
+
+- 各阶段从 public/data 取前 --limit 条作为输入，所有输出、断点、日志都写到临时目录，不改动仓库数据；
+- 默认用合成响应（可配延迟、429 比例、格式异常比例）；给出 --cassette 时改为回放录制的真实响应；
+- 429 退避时间默认按 0.01 倍缩短（--retry-wait-scale），否则一次 429 就要真等 60 秒；
+- 每次运行的 llm_metrics 指标（请求数、延迟、429、解析失败、退避时间）一并汇总，--json 中保留完整指标。
+
+用法:
+  python3 scripts/benchmark_llm.py
+  python3 scripts/benchmark_llm.py --stages translate,enrich --concurrency 1,4,8
+  python3 scripts/benchmark_llm.py --rate-429 0.05 --malformed-rate 0.02 --seed 1
+  python3 scripts/benchmark_llm.py --cassette public/data/.llm_cassette.jsonl
+  python3 scripts/benchmark_llm.py --json benchmark.json   # 结果另存为 JSON
+  python3 scripts/benchmark_llm.py --check   # 只做正确性检查：题号重复的题同批翻译/打标，各自取回自己的结果
+"""
+import asyncio
+import contextlib
+import importlib
+import io
+import json
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from llm_client import LLMClient
+from llm_standin import DEFAULT_LATENCY_MS, DEFAULT_PER_TOKEN_MS, StandinProvider
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DATA_DIR = REPO_ROOT / "public" / "data"
+STAGES = ("translate", "enrich", "fill_glossary", "re_explain")
+DEFAULT_LIMIT = 200
+
+
+def _write_head(src: Path, dst: Path, limit: int) -> int:
+    items = json.loads(src.read_text(encoding="utf-8"))[:limit]
+    dst.write_text(json.dumps(items, ensure_ascii=False), encoding="utf-8")
+    return len(items)
+
+
+def setup_stage(stage: str, tmp: Path, limit: int):
+    """准备某阶段的输入，返回 (模块, 需改指向临时目录的模块常量, 脚本参数, 待处理条数)。"""
+    if stage == "translate":
+        mod = importlib.import_module("translate_en_to_cn")
+        n = _write_head(DATA_DIR / "raw_questions_en.json", tmp / "in.json", limit)
+        patches = {
+            "PROGRESS_FILE": tmp / "progress.jsonl",
+            "LEGACY_PROGRESS_FILE": tmp / "progress.json",
+            "POISON_LOG": tmp / "poison.jsonl",
+        }
+        return mod, patches, [str(tmp / "in.json"), str(tmp / "out.json")], n
+    if stage == "enrich":
+        mod = importlib.import_module("add_tags_and_explanation")
+        n = _write_head(DATA_DIR / "questions_bilingual.json", tmp / "in.json", limit)
+        patches = {
+            "PROGRESS_FILE": tmp / "progress.jsonl",
+            "LEGACY_PROGRESS_FILE": tmp / "progress.json",
+            "POISON_LOG": tmp / "poison.jsonl",
+            "DEBUG_PARSE_FAIL_LOG": tmp / "parse_fail.txt",
+        }
+        return mod, patches, [str(tmp / "in.json"), str(tmp / "out.json")], n
+    if stage == "fill_glossary":
+        mod = importlib.import_module("fill_glossary")
+        shutil.copy(DATA_DIR / "glossary.json", tmp / "glossary.json")
+        shutil.copy(DATA_DIR / "questions_v2.json", tmp / "questions_v2.json")
+        patches = {
+            "GLOSSARY_PATH": tmp / "glossary.json",
+            "QUESTIONS_PATH": tmp / "questions_v2.json",
+            "JOURNAL_FILE": tmp / "journal.jsonl",
+            "LEGACY_PROGRESS_FILE": tmp / "progress.json",
+        }
+        with _patched(mod, patches):
+            n = min(limit, len(mod.get_terms_to_fill(False)[0]))
+        return mod, patches, ["--limit", str(limit)], n
+    if stage == "re_explain":
+        mod = importlib.import_module("re_explain_multiple_choice")
+        shutil.copy(DATA_DIR / "questions_v2.json", tmp / "questions_v2.json")
+        patches = {"QUESTIONS_PATH": tmp / "questions_v2.json", "FAIL_LOG": tmp / "fail.txt"}
+        questions = json.loads((tmp / "questions_v2.json").read_text(encoding="utf-8"))
+        n = min(limit, sum(1 for q in questions if len(mod.get_best_answer_letters(q)) >= 2))
+        return mod, patches, ["--limit", str(limit)], n
+    raise ValueError(f"未知阶段: {stage}")
+
+
+@contextlib.contextmanager
+def _patched(mod, patches: dict):
+    saved = {k: getattr(mod, k) for k in patches}
+    for k, v in patches.items():
+        setattr(mod, k, v)
+    try:
+        yield
+    finally:
+        for k, v in saved.items():
+            setattr(mod, k, v)
+
+
+def provider_argv(args, concurrency: int) -> list[str]:
+    argv = ["--concurrency", str(concurrency), "--no-cache", "--retry-wait-scale", str(args.retry_wait_scale)]
+    if args.cassette:
+        return argv + ["--provider", "replay", "--cassette", args.cassette]
+    argv += [
+        "--provider", "standin",
+        "--standin-latency-ms", str(args.latency_ms),
+        "--standin-per-token-ms", str(args.per_token_ms),
+        "--standin-429-rate", str(args.rate_429),
+        "--standin-malformed-rate", str(args.malformed_rate),
+    ]
+    if args.seed is not None:
+        argv += ["--standin-seed", str(args.seed)]
+    return argv
+
+
+def run_stage(stage: str, concurrency: int, args) -> dict:
+    with tempfile.TemporaryDirectory(prefix=f"bench_{stage}_") as tmp_dir:
+        mod, patches, stage_argv, n = setup_stage(stage, Path(tmp_dir), args.limit)
+        metrics_path = Path(tmp_dir) / "metrics.json"
+        argv = [f"{mod.__name__}.py"] + stage_argv + provider_argv(args, concurrency) + ["--metrics-json", str(metrics_path)]
+        if args.batch_tokens and stage in ("translate", "enrich", "fill_glossary"):
+            argv += ["--batch-tokens", str(args.batch_tokens)]
+        out = io.StringIO()
+        saved_argv = sys.argv
+        sys.argv = argv
+        start = time.perf_counter()
+        try:
+            with _patched(mod, patches), contextlib.redirect_stdout(sys.stdout if args.verbose else out):
+                mod.main()
+        finally:
+            sys.argv = saved_argv
+        elapsed = time.perf_counter() - start
+        metrics = json.loads(metrics_path.read_text(encoding="utf-8")) if metrics_path.exists() else {}
+    requests = metrics.get("requests", {})
+    return {
+        "stage": stage,
+        "concurrency": concurrency,
+        "items": n,
+        "seconds": round(elapsed, 3),
+        "items_per_min": round(n / elapsed * 60, 1) if elapsed > 0 else 0.0,
+        "requests": requests.get("completed", 0),
+        "latency_p50_ms": requests.get("latency_ms", {}).get("p50", 0.0),
+        "rate_limited": requests.get("rate_limited", 0),
+        "parse_failed": metrics.get("parse", {}).get("failed", 0),
+        "backoff_sleep_sec": metrics.get("time_sec", {}).get("backoff_sleep", 0.0),
+        "warnings": out.getvalue().count("[WARN]"),
+        "metrics": metrics,
+    }
+
+
+def duplicate_id_items(path: Path) -> list[dict]:
+    """题库中题号重复的全部题（保持原顺序），用来凑一个含重复题号的批。"""
+    items = json.loads(path.read_text(encoding="utf-8"))
+    counts: dict = {}
+    for item in items:
+        counts[item.get("id")] = counts.get(item.get("id"), 0) + 1
+    return [item for item in items if counts[item.get("id")] > 1]
+
+
+async def _check_duplicate_ids(tmp: Path) -> list[str]:
+    translate = importlib.import_module("translate_en_to_cn")
+    enrich = importlib.import_module("add_tags_and_explanation")
+    client = LLMClient(StandinProvider(latency_ms=0, per_token_ms=0, seed=0), "standin")
+    errors = []
+    raw = duplicate_id_items(DATA_DIR / "raw_questions_en.json")
+    with _patched(translate, {"POISON_LOG": tmp / "translate_poison.jsonl"}):
+        translated = await translate.translate_batch(client, raw)
+    for src, out in zip(raw, translated):
+        # 替身译文以本题题干开头，串题时会带上另一道同号题的题干
+        if (src.get("question_en") or "").strip()[:60] not in out.get("question_cn", ""):
+            errors.append(f"translate: 题 {src.get('id')} 取回的不是本题的译文")
+    bilingual = duplicate_id_items(DATA_DIR / "questions_bilingual.json")
+    with _patched(enrich, {"POISON_LOG": tmp / "enrich_poison.jsonl", "DEBUG_PARSE_FAIL_LOG": tmp / "parse_fail.txt"}):
+        enriched = await enrich.enrich_batch(client, bilingual, set())
+    for src, out in zip(bilingual, enriched):
+        if out.get("question_cn") != src.get("question_cn") or not enrich.has_enrichment(out):
+            errors.append(f"enrich: 题 {src.get('id')} 取回的不是本题的结果")
+    for log in tmp.glob("*_poison.jsonl"):
+        errors.append(f"{log.stem}: 有题被当作毒题隔离")
+    client.close()
+    return errors
+
+
+def check_duplicate_ids() -> bool:
+    """把题库中题号重复的题放进同一批，经离线替身翻译、打标，确认每题取回的都是自己的结果。"""
+    with tempfile.TemporaryDirectory(prefix="bench_check_") as tmp_dir:
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            errors = asyncio.run(_check_duplicate_ids(Path(tmp_dir)))
+    n = len(duplicate_id_items(DATA_DIR / "raw_questions_en.json"))
+    if errors:
+        print(f"检查未通过（{n} 道重复题号的题同批）:")
+        for e in errors:
+            print(f"  {e}")
+        return False
+    print(f"检查通过: {n} 道重复题号的题同批翻译、打标，各自取回本题结果")
+    return True
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="用离线替身测量各 LLM 脚本的端到端吞吐")
+    parser.add_argument("--stages", type=str, default=",".join(STAGES), help=f"逗号分隔，可选 {','.join(STAGES)}")
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT, help=f"每阶段处理前 N 条（默认 {DEFAULT_LIMIT}）")
+    parser.add_argument("--concurrency", type=str, default="4", help="并发数，逗号分隔可对比多组，如 1,4,8")
+    parser.add_argument("--batch-tokens", type=int, default=0, help="批量阶段的 --batch-tokens（0=脚本默认）")
+    parser.add_argument("--latency-ms", type=float, default=DEFAULT_LATENCY_MS, help=f"合成响应的基础延迟（默认 {DEFAULT_LATENCY_MS:g} ms）")
+    parser.add_argument("--per-token-ms", type=float, default=DEFAULT_PER_TOKEN_MS, help=f"每个输出 token 追加的延迟（默认 {DEFAULT_PER_TOKEN_MS:g} ms）")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="返回 429 的比例（0~1）")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="返回截断/非 JSON 响应的比例（0~1）")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子")
+    parser.add_argument("--retry-wait-scale", type=float, default=0.01, help="429 退避等待时间倍数（默认 0.01）")
+    parser.add_argument("--cassette", type=str, default="", help="改为回放该 cassette 中录制的响应")
+    parser.add_argument("--json", type=str, default="", help="结果另存为 JSON")
+    parser.add_argument("--verbose", action="store_true", help="显示各脚本自身的输出")
+    parser.add_argument("--check", action="store_true", help="只检查题号重复的题同批请求时不串题，不跑基准；不通过时退出码为 1")
+    args = parser.parse_args()
+
+    if args.check:
+        sys.exit(0 if check_duplicate_ids() else 1)
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        print(f"未知阶段: {', '.join(unknown)}（可选 {', '.join(STAGES)}）")
+        sys.exit(1)
+    concurrencies = [int(c) for c in args.concurrency.split(",") if c.strip()]
+
+    mode = f"回放 {args.cassette}" if args.cassette else (
+        f"合成响应（延迟 {args.latency_ms:g} ms + {args.per_token_ms:g} ms/token，429 {args.rate_429:.0%}，格式异常 {args.malformed_rate:.0%}）"
+    )
+    print(f"基准: {mode}，429 退避 ×{args.retry_wait_scale:g}")
+    print(f"{'阶段':<14}{'并发':>6}{'条数':>8}{'请求':>6}{'耗时(s)':>10}{'条/分钟':>10}{'p50(ms)':>9}{'429':>6}{'解析失败':>8}")
+    results = []
+    for stage in stages:
+        for c in concurrencies:
+            r = run_stage(stage, c, args)
+            results.append(r)
+            print(
+                f"{stage:<14}{c:>6}{r['items']:>8}{r['requests']:>6}{r['seconds']:>10.2f}{r['items_per_min']:>10.1f}"
+                f"{r['latency_p50_ms']:>9.0f}{r['rate_limited']:>6}{r['parse_failed']:>8}"
+            )
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"mode": mode, "results": results}, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"已写入: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
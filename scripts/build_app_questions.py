@@ -3,19 +3,72 @@
 阶段 4：将 questions_bilingual（或 enriched）转为 App 使用的 questions_v2.json 格式。
 字段映射：correct_answer → best_answer / official_answer，保留中英题干与选项，补全 tags、explanation、related_terms。
 
+--dist 时另外输出发布产物（见 app_artifacts.py）：紧凑 JSON 及预压缩的 .gz / .br，写到 public/data/dist/，并打印各产物字节数。
+--shards 时再把题目按题库顺序与按标签（经 tag_aliases.py 规范化）切成分片（每片紧凑 JSON 约 --shard-kb KB），
+并写出小索引 index.json（每题的题号、topic、规范标签、是否多选、所在分片，以及各分片文件与其中题号的最小/最大值），
+前端可只取当前页面需要的分片。
+--split 时再按冷热拆分：questions_core.json（出题所需：题干、选项、答案、标签、附图）在前，
+questions_explanations.json（解析、相关术语）与 questions_en.json（英文题干与选项）按题目键索引，答题后或切换英文时再取。
+--locales 时再按语言输出 locales/cn.json（不含英文题干与选项）、locales/en.json（不含中文题干与选项）、
+locales/bilingual.json 与共用的 locales/index.json（题号列表与各语言文件），写完后读回校验各包题号顺序与答案完全一致。
+--hash 时产物文件名带内容哈希（questions_v2.<hash>.json 等），并写出 public/data/manifest.json（逻辑名 -> 实际文件），
+App 先取 manifest 再取数据文件，数据文件可长期缓存。
+--highlights 时再输出 highlights.json：用 term_matcher.py 的多模式匹配一遍算出每题 question_cn、options_cn、explanation
+各字段中术语的位置（按题目顺序，每段为 [与上一段末尾的间隔, 长度, 术语下标]）。术语表与匹配规则同 HighlightTerms.tsx
+（本题 related_terms ∪ glossary 键，区分大小写，最早出现、同位置最长），写出前逐字段与逐术语 indexOf 的分段对照，
+不一致即失败；App 只需按位置切字符串，显示结果不变（基准见 benchmark_highlights.py）。
+--term-index 时再输出 term_index.json（glossary 术语 -> 引用它的题号，升序后差分编码）与 term_counts.json
+（术语 -> 引用题数），百科页面可直接显示「出现在 N 道题中」并跳转，不必在运行时扫描全部题目。
+--tag-index 时再输出 tag_index.json：标签经 tag_aliases.py 规范化（别名表 public/data/tag_aliases.json）后，
+每个规范标签的题号（升序后差分编码）、题数、多选题数与平均投票率，按题数从多到少；分类练习页只取这一个小文件即可列出考点。
+
 用法:
   python3 scripts/build_app_questions.py
   python3 scripts/build_app_questions.py public/data/questions_bilingual_enriched.json public/data/questions_v2.json
+  python3 scripts/build_app_questions.py --dist        # 生成 questions_v2.json 后再输出发布产物
+  python3 scripts/build_app_questions.py --dist-only   # 不重建，直接由现有 questions_v2.json 输出发布产物
+  python3 scripts/build_app_questions.py --dist-only --shards --shard-kb 64 --tag-min 20
+  python3 scripts/build_app_questions.py --dist-only --split
+  python3 scripts/build_app_questions.py --dist-only --locales
+  python3 scripts/build_app_questions.py --dist-only --hash --shards
+  python3 scripts/build_app_questions.py --dist-only --tag-index
+  python3 scripts/build_app_questions.py --dist-only --hash --highlights --term-index --tag-index   # 部署时（netlify.toml）
 """
 
 import json
 import sys
+from collections import Counter
+from itertools import accumulate
 from pathlib import Path
 
+from app_artifacts import DIST_DIR, GLOSSARY_PATH, MANIFEST_PATH, ArtifactWriter, dumps_min
+from question_store import question_keys
+from tag_aliases import canonical_map, load_aliases
+from term_matcher import TermMatcher, field_texts, glossary_keys, segment_by_terms, term_question_ids
+
 REPO_ROOT = Path(__file__).resolve().parent.parent
 DEFAULT_INPUT = REPO_ROOT / "public" / "data" / "questions_bilingual_enriched.json"
 FALLBACK_INPUT = REPO_ROOT / "public" / "data" / "questions_bilingual.json"
 DEFAULT_OUTPUT = REPO_ROOT / "public" / "data" / "questions_v2.json"
+SHARD_DIR = "shards"
+INDEX_VERSION = 2
+# 每个分片紧凑 JSON 的目标大小（KB）；单题超过目标时独占一片
+DEFAULT_SHARD_KB = 128
+# 题数不少于此值的标签才单独成片，其余标签的题经索引按题号分片获取
+DEFAULT_TAG_MIN = 10
+# 冷数据：答题后才显示的解析、只在英文模式显示的英文文本；其余字段进核心产物
+EXPLANATION_FIELDS = ("explanation", "related_terms")
+EN_FIELDS = ("question_en", "options_en")
+LOCALE_DIR = "locales"
+# 各语言独有的文本字段；某语言的包去掉其它语言的字段，bilingual 保留全部
+LOCALE_FIELDS = {"cn": ("question_cn", "options_cn"), "en": EN_FIELDS}
+# 各语言包之间必须一致的答案字段
+ANSWER_FIELDS = ("best_answer", "official_answer")
+# 预先计算术语高亮位置的字段
+HIGHLIGHT_FIELDS = ("question_cn", "options_cn", "explanation")
+HIGHLIGHT_VERSION = 1
+TERM_INDEX_VERSION = 1
+TAG_INDEX_VERSION = 1
 
 
 def to_app_item(item: dict) -> dict:
@@ -51,36 +104,387 @@ def to_app_item(item: dict) -> dict:
     return out
 
 
+def answer_letters(item: dict) -> list[str]:
+    a = item.get("best_answer")
+    if isinstance(a, list):
+        return [str(x).strip().upper() for x in a if str(x).strip()]
+    return [c for c in str(a or "").upper() if c.isalpha()]
+
+
+def split_by_size(items: list[dict], target_bytes: int) -> list[list[dict]]:
+    """按顺序装片：累计紧凑 JSON 字节数超过 target_bytes 前换下一片。"""
+    chunks, current, size = [], [], 0
+    for item in items:
+        n = len(dumps_min(item)) + 1
+        if current and size + n > target_bytes:
+            chunks.append(current)
+            current, size = [], 0
+        current.append(item)
+        size += n
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def write_shards(app_list: list[dict], writer: ArtifactWriter, target_bytes: int, tag_min: int, alias_table: dict[str, list[str]]) -> dict:
+    """写顺序分片、标签分片与 index.json，返回索引。
+    顺序分片按序号命名（ids-000.json …），start 为首题在题库中的下标；题号不保证升序、唯一（555、889 各有两道），
+    索引中另记各片题号的最小 / 最大值。标签与 tag_index 相同，经别名表规范化，每题每个规范标签只计一次。"""
+    id_shards, shard_of = [], []
+    start = 0
+    for chunk in split_by_size(app_list, target_bytes):
+        name = f"{SHARD_DIR}/ids-{len(id_shards):03d}.json"
+        file = writer.write(name, chunk, group=f"{SHARD_DIR}/ids-*")
+        shard_of.extend([len(id_shards)] * len(chunk))
+        ids = [q.get("id") for q in chunk]
+        id_shards.append({"file": file, "start": start, "count": len(chunk), "min_id": min(ids), "max_id": max(ids)})
+        start += len(chunk)
+
+    mapping = canonical_map((t for q in app_list for t in q.get("tags") or []), alias_table)
+    q_tags = [list(dict.fromkeys(mapping[t] for t in q.get("tags") or [] if t in mapping)) for q in app_list]
+    counts = Counter(t for ts in q_tags for t in ts)
+    tags = [t for t, _ in counts.most_common()]
+    tag_no = {t: i for i, t in enumerate(tags)}
+    tag_shards = {}
+    for tag in tags:
+        if counts[tag] < tag_min:
+            break
+        members = [q for q, ts in zip(app_list, q_tags) if tag in ts]
+        files = []
+        for part, chunk in enumerate(split_by_size(members, target_bytes), 1):
+            name = f"{SHARD_DIR}/tag-{tag_no[tag]:03d}-{part}.json"
+            files.append(writer.write(name, chunk, group=f"{SHARD_DIR}/tag-*"))
+        tag_shards[tag] = files
+
+    index = {
+        "version": INDEX_VERSION,
+        "count": len(app_list),
+        "id_shards": id_shards,
+        "tag_shards": tag_shards,
+        "tags": tags,
+        # 按列存放，第 i 题对应各列第 i 项；tags 列为标签表 tags（规范标签）中的下标，shard 为 id_shards 中的下标
+        "questions": {
+            "id": [q.get("id") for q in app_list],
+            "topic": [q.get("topic", "") for q in app_list],
+            "tags": [[tag_no[t] for t in ts] for ts in q_tags],
+            "multi": [1 if len(answer_letters(q)) > 1 else 0 for q in app_list],
+            "shard": shard_of,
+        },
+    }
+    writer.write("index.json", index)
+    return index
+
+
+def write_split(app_list: list[dict], writer: ArtifactWriter) -> dict[str, dict]:
+    """写核心 / 解析 / 英文三个产物，返回各自的字节数记录（见 ArtifactWriter.sizes）。
+    解析与英文按题目键索引（题号；重复题号第 n 次出现为 "题号#n"，与核心中的顺序对应）。"""
+    cold = set(EXPLANATION_FIELDS) | set(EN_FIELDS)
+    keys = question_keys(app_list)
+    parts = {
+        "questions_core.json": [{k: v for k, v in q.items() if k not in cold} for q in app_list],
+        "questions_explanations.json": {key: {f: q[f] for f in EXPLANATION_FIELDS if f in q} for key, q in zip(keys, app_list)},
+        "questions_en.json": {key: {f: q[f] for f in EN_FIELDS if f in q} for key, q in zip(keys, app_list)},
+    }
+    sizes = {}
+    for name, obj in parts.items():
+        writer.write(name, obj)
+        sizes[name] = writer.sizes[-1]
+    return sizes
+
+
+def locale_bundles(app_list: list[dict]) -> dict[str, list[dict]]:
+    bundles = {}
+    for locale in LOCALE_FIELDS:
+        drop = {f for other, fields in LOCALE_FIELDS.items() if other != locale for f in fields}
+        bundles[locale] = [{k: v for k, v in q.items() if k not in drop} for q in app_list]
+    bundles["bilingual"] = app_list
+    return bundles
+
+
+def validate_locales(bundles: dict[str, list[dict]]) -> list[str]:
+    """各语言包题数、题号顺序与答案字段须完全一致，返回发现的问题（空列表表示通过）。"""
+    errors = []
+    names = list(bundles)
+    base = bundles[names[0]]
+    for name in names[1:]:
+        other = bundles[name]
+        if len(other) != len(base):
+            errors.append(f"{name} 共 {len(other)} 题，{names[0]} 共 {len(base)} 题")
+            continue
+        for i, (a, b) in enumerate(zip(base, other)):
+            if a.get("id") != b.get("id"):
+                errors.append(f"{name} 第 {i + 1} 题题号为 {b.get('id')}，{names[0]} 为 {a.get('id')}")
+                continue
+            diff = [f for f in ANSWER_FIELDS if a.get(f) != b.get(f)]
+            if diff:
+                errors.append(f"{name} 题 {a.get('id')} 的 {'/'.join(diff)} 与 {names[0]} 不一致")
+    return errors
+
+
+def write_locales(app_list: list[dict], writer: ArtifactWriter) -> list[str]:
+    """写各语言包与共用索引，读回后校验，返回校验发现的问题。"""
+    files = {}
+    for locale, items in locale_bundles(app_list).items():
+        files[locale] = writer.write(f"{LOCALE_DIR}/{locale}.json", items)
+    writer.write(f"{LOCALE_DIR}/index.json", {"count": len(app_list), "ids": [q.get("id") for q in app_list], "locales": files})
+    written = {}
+    for locale, name in files.items():
+        with open(writer.out_dir / name, "r", encoding="utf-8") as f:
+            written[locale] = json.load(f)
+    return validate_locales(written)
+
+
+def highlight_terms(q: dict, glossary: list[str]) -> list[str]:
+    """某题高亮用的术语表，同 app/practice/page.tsx：[...new Set([...related_terms, ...glossaryTerms])]。"""
+    return list(dict.fromkeys([*(t for t in q.get("related_terms") or [] if isinstance(t, str)), *glossary]))
+
+
+def to_utf16_spans(text: str, found: list[tuple[int, int, str]]) -> list[tuple[int, int, str]]:
+    """码点下标 -> UTF-16 码元下标（与 JS 的 slice 一致）；没有 BMP 以外字符时原样返回。"""
+    if not any(ord(ch) > 0xFFFF for ch in text):
+        return found
+    return [(utf16_len(text[:start]), utf16_len(text[start : start + n]), term) for start, n, term in found]
+
+
+def highlight_spans(app_list: list[dict], glossary: list[str]) -> dict:
+    """每题各字段的术语位置：spans[i][路径] 为扁平的 [间隔, 长度, 术语下标, ...]，间隔从上一段末尾算起；
+    术语按首次出现编号存于 terms，只含实际出现过的术语。下标按 UTF-16 码元计（与 JS 的 slice 一致）。
+    一个精确匹配（exact）的自动机装下 glossary 与全部 related_terms，每题只在本题的术语表里取最左、最长的出现。"""
+    matcher = TermMatcher([*glossary, *(t for q in app_list for t in q.get("related_terms") or [] if isinstance(t, str))], exact=True)
+    glossary_set = set(glossary)
+    terms: dict[str, int] = {}
+    spans = []
+    for q in app_list:
+        allowed = glossary_set.union(t for t in q.get("related_terms") or [] if isinstance(t, str))
+        fields = {}
+        for path, text in field_texts(q, HIGHLIGHT_FIELDS):
+            found = to_utf16_spans(text, matcher.find(text, allowed))
+            if not found:
+                continue
+            flat, end = [], 0
+            for start, length, term in found:
+                flat += [start - end, length, terms.setdefault(term, len(terms))]
+                end = start + length
+            fields[path] = flat
+        spans.append(fields)
+    return {"version": HIGHLIGHT_VERSION, "count": len(app_list), "terms": list(terms), "spans": spans}
+
+
+def utf16_len(text: str) -> int:
+    return len(text.encode("utf-16-le")) // 2
+
+
+def decode_spans(flat: list[int], terms: list[str]) -> list[tuple[int, int, str]]:
+    """扁平的 [间隔, 长度, 术语下标, ...] -> [(start, length, term)]。"""
+    out, end = [], 0
+    for i in range(0, len(flat), 3):
+        start = end + flat[i]
+        out.append((start, flat[i + 1], terms[flat[i + 2]]))
+        end = start + flat[i + 1]
+    return out
+
+
+def validate_highlights(app_list: list[dict], data: dict, glossary: list[str]) -> list[str]:
+    """校验每个字段的术语段与 HighlightTerms.tsx 逐术语 indexOf 的分段（term_matcher.segment_by_terms，
+    只带原文中出现的术语，结果不变）完全相同，即换成预计算位置后 App 显示的内容不变。"""
+    errors = []
+    if len(data["spans"]) != len(app_list):
+        return [f"高亮条数 {len(data['spans'])} 与题数 {len(app_list)} 不一致"]
+    for key, q, fields in zip(question_keys(app_list), app_list, data["spans"]):
+        terms = highlight_terms(q, glossary)
+        for path, text in field_texts(q, HIGHLIGHT_FIELDS):
+            expected = to_utf16_spans(text, segment_by_terms(text, [t for t in terms if t in text]))
+            actual = decode_spans(fields.get(path, []), data["terms"])
+            if actual != expected:
+                diff = next((a, e) for a, e in zip([*actual, None], [*expected, None]) if a != e)
+                errors.append(f"题 {key} {path}: 预计算 {diff[0]} 与逐术语匹配 {diff[1]} 不一致")
+    return errors
+
+
+def write_highlights(app_list: list[dict], writer: ArtifactWriter, glossary: list[str]) -> tuple[dict, list[str]]:
+    data = highlight_spans(app_list, glossary)
+    writer.write("highlights.json", data)
+    return data, validate_highlights(app_list, data, glossary)
+
+
+def delta_encode(ids: list[int]) -> list[int]:
+    """升序题号 -> [首个题号, 与前一个的差, ...]。"""
+    return [b - a for a, b in zip([0, *ids], ids)]
+
+
+def delta_decode(deltas: list[int]) -> list[int]:
+    return list(accumulate(deltas))
+
+
+def write_term_index(app_list: list[dict], writer: ArtifactWriter, matcher: TermMatcher) -> dict[str, list[int]]:
+    """写 term_index.json（术语 -> 差分编码的题号，aliases 为 glossary 中规范化后重复的键 -> 代表术语）
+    与 term_counts.json（术语 -> 引用题数，从多到少），返回 术语 -> 题号。"""
+    refs = term_question_ids(matcher, app_list)
+    writer.write(
+        "term_index.json",
+        {
+            "version": TERM_INDEX_VERSION,
+            "count": len(app_list),
+            "aliases": matcher.duplicates,
+            "ids": {t: delta_encode(ids) for t, ids in refs.items()},
+        },
+    )
+    writer.write("term_counts.json", {"version": TERM_INDEX_VERSION, "count": len(app_list), "counts": {t: len(ids) for t, ids in refs.items()}})
+    return refs
+
+
+def vote_value(item: dict) -> float | None:
+    """vote_percentage（如 "93%"）-> 93.0；没有投票数据时为 None。"""
+    try:
+        return float(str(item.get("vote_percentage") or "").strip().rstrip("%"))
+    except ValueError:
+        return None
+
+
+def tag_index(app_list: list[dict], alias_table: dict[str, list[str]]) -> dict:
+    """规范标签 -> 题号（差分编码）、题数、多选题数、平均投票率（没有投票数据的题不计入，全无时为 null），按题数从多到少。
+    重复题号的几道题分别计入题数与统计，ids 中只列一次。输出的 aliases 为原标签 -> 规范名（只列与规范名不同的），前端可据此把题目上的原标签对应到索引。"""
+    mapping = canonical_map((t for q in app_list for t in q.get("tags") or []), alias_table)
+    members: dict[str, list[dict]] = {}
+    for q in app_list:
+        for tag in dict.fromkeys(mapping[t] for t in q.get("tags") or [] if t in mapping):
+            members.setdefault(tag, []).append(q)
+    tags = {}
+    for tag, qs in sorted(members.items(), key=lambda kv: (-len(kv[1]), kv[0])):
+        votes = [v for v in map(vote_value, qs) if v is not None]
+        tags[tag] = {
+            "count": len(qs),
+            "multi": sum(1 for q in qs if len(answer_letters(q)) > 1),
+            "vote": round(sum(votes) / len(votes), 1) if votes else None,
+            "ids": delta_encode(sorted({q.get("id") for q in qs})),
+        }
+    return {
+        "version": TAG_INDEX_VERSION,
+        "count": len(app_list),
+        "aliases": {raw: canonical for raw, canonical in mapping.items() if raw != canonical},
+        "tags": tags,
+    }
+
+
+def write_dist(app_list: list[dict], dist_dir: Path, hashed: bool = False) -> ArtifactWriter:
+    """输出发布产物：题库与百科的紧凑 JSON 及压缩版本。"""
+    writer = ArtifactWriter(dist_dir, hashed=hashed)
+    writer.write("questions_v2.json", app_list)
+    if GLOSSARY_PATH.exists():
+        with open(GLOSSARY_PATH, "r", encoding="utf-8") as f:
+            writer.write("glossary.json", json.load(f))
+    return writer
+
+
 def main():
     import argparse
     parser = argparse.ArgumentParser(description="生成 App 用 questions_v2.json")
     parser.add_argument("input", nargs="?", default=None, help="输入 JSON（默认先读 enriched，若无则读 bilingual）")
     parser.add_argument("output", nargs="?", default=str(DEFAULT_OUTPUT), help="输出 questions_v2.json 路径")
+    parser.add_argument("--dist", action="store_true", help="另外输出紧凑 JSON 与 .gz/.br 发布产物")
+    parser.add_argument("--dist-only", action="store_true", help="不重新生成 questions_v2.json，由现有文件输出发布产物")
+    parser.add_argument("--shards", action="store_true", help="另外输出按题号区间、按标签的分片与 index.json（含 --dist）")
+    parser.add_argument("--shard-kb", type=int, default=DEFAULT_SHARD_KB, help=f"每片紧凑 JSON 的目标大小 KB（默认 {DEFAULT_SHARD_KB}）")
+    parser.add_argument("--tag-min", type=int, default=DEFAULT_TAG_MIN, help=f"题数不少于此值的标签才单独成片（默认 {DEFAULT_TAG_MIN}）")
+    parser.add_argument("--split", action="store_true", help="另外输出核心 / 解析 / 英文三个拆分产物（含 --dist）")
+    parser.add_argument("--locales", action="store_true", help="另外输出 cn / en / bilingual 语言包并校验（含 --dist）")
+    parser.add_argument("--highlights", action="store_true", help="另外输出预先计算的术语高亮位置 highlights.json 并校验（含 --dist）")
+    parser.add_argument("--term-index", action="store_true", help="另外输出 glossary 术语 -> 题号的反向索引与引用计数（含 --dist）")
+    parser.add_argument("--tag-index", action="store_true", help="另外输出规范化标签的倒排索引 tag_index.json（含 --dist）")
+    parser.add_argument("--hash", action="store_true", help="产物文件名带内容哈希，并写出 public/data/manifest.json（含 --dist）")
+    parser.add_argument("--dist-dir", type=str, default=str(DIST_DIR), help=f"发布产物目录（默认 {DIST_DIR.relative_to(REPO_ROOT)}）")
     args = parser.parse_args()
 
-    if args.input:
-        input_path = Path(args.input).resolve()
+    output_path = Path(args.output).resolve()
+    if args.dist_only:
+        if not output_path.exists():
+            print(f"文件不存在: {output_path}，请先不带 --dist-only 运行")
+            sys.exit(1)
+        with open(output_path, "r", encoding="utf-8") as f:
+            app_list = json.load(f)
     else:
-        input_path = DEFAULT_INPUT.resolve()
+        if args.input:
+            input_path = Path(args.input).resolve()
+        else:
+            input_path = DEFAULT_INPUT.resolve()
+            if not input_path.exists():
+                input_path = FALLBACK_INPUT.resolve()
+
         if not input_path.exists():
-            input_path = FALLBACK_INPUT.resolve()
-    output_path = Path(args.output).resolve()
+            print(f"输入文件不存在: {input_path}")
+            print("请先运行: python3 scripts/add_tags_and_explanation.py 生成 questions_bilingual_enriched.json")
+            sys.exit(1)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+
+        with open(input_path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        if not isinstance(raw, list):
+            raw = [raw]
+
+        app_list = [to_app_item(item) for item in raw]
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(app_list, f, ensure_ascii=False, indent=2)
+        print(f"已写入: {output_path}，共 {len(app_list)} 题")
 
-    if not input_path.exists():
-        print(f"输入文件不存在: {input_path}")
-        print("请先运行: python3 scripts/add_tags_and_explanation.py 生成 questions_bilingual_enriched.json")
-        sys.exit(1)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-
-    with open(input_path, "r", encoding="utf-8") as f:
-        raw = json.load(f)
-    if not isinstance(raw, list):
-        raw = [raw]
-
-    app_list = [to_app_item(item) for item in raw]
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(app_list, f, ensure_ascii=False, indent=2)
-    print(f"已写入: {output_path}，共 {len(app_list)} 题")
+    if args.dist or args.dist_only or args.shards or args.split or args.locales or args.highlights or args.term_index or args.tag_index or args.hash:
+        dist_dir = Path(args.dist_dir).resolve()
+        writer = write_dist(app_list, dist_dir, hashed=args.hash)
+        matcher = TermMatcher.from_glossary(GLOSSARY_PATH) if args.term_index else None
+        if args.shards:
+            index = write_shards(app_list, writer, args.shard_kb * 1024, args.tag_min, load_aliases())
+            n_id = len(index["id_shards"])
+            n_tag_files = sum(len(files) for files in index["tag_shards"].values())
+            print(
+                f"分片: 按顺序 {n_id} 片（平均每片 {len(app_list) / max(1, n_id):.0f} 题），"
+                f"标签 {len(index['tag_shards'])} 个（共 {len(index['tags'])} 个，题数 >= {args.tag_min}）{n_tag_files} 片"
+            )
+        if args.split:
+            sizes = write_split(app_list, writer)
+            total = sum(s["min"] for s in sizes.values())
+            print(
+                "冷热拆分: "
+                + "，".join(f"{name} {s['min'] / 1024:,.0f} KB / gzip {s['gz'] / 1024:,.0f} KB（{s['min'] / total:.0%}）" for name, s in sizes.items())
+            )
+        if args.locales:
+            errors = write_locales(app_list, writer)
+            for err in errors[:20]:
+                print(f"  [校验失败] {err}")
+            if errors:
+                print(f"语言包校验失败: {len(errors)} 处")
+                sys.exit(1)
+            cn, bi = (s["gz"] for s in writer.sizes if s["name"] in (f"{LOCALE_DIR}/cn.json", f"{LOCALE_DIR}/bilingual.json"))
+            print(f"语言包: {'、'.join([*LOCALE_FIELDS, 'bilingual'])} 校验通过（题号与答案一致）；中文包 gzip 为双语包的 {cn / bi:.0%}")
+        if args.highlights:
+            data, errors = write_highlights(app_list, writer, glossary_keys(GLOSSARY_PATH))
+            for err in errors[:20]:
+                print(f"  [校验失败] {err}")
+            if errors:
+                print(f"术语高亮校验失败: {len(errors)} 处")
+                sys.exit(1)
+            n_spans = sum(len(flat) // 3 for fields in data["spans"] for flat in fields.values())
+            print(f"术语高亮: {n_spans} 处，涉及 {len(data['terms'])} 个术语，与逐术语匹配逐字段一致（{'、'.join(HIGHLIGHT_FIELDS)}）")
+        if args.term_index:
+            refs = write_term_index(app_list, writer, matcher)
+            in_glossary = sum(1 for t in refs if t in matcher.terms)
+            top = "，".join(f"{t} {len(ids)}" for t, ids in list(refs.items())[:5])
+            print(f"术语反向索引: {len(refs)} 个术语（glossary 中 {in_glossary} 个，其余为 related_terms 中缺失的词条）；引用最多: {top}")
+        if args.tag_index:
+            index = tag_index(app_list, load_aliases())
+            writer.write("tag_index.json", index)
+            raw = len({t for q in app_list for t in q.get("tags") or []})
+            top = "，".join(f"{t} {e['count']}" for t, e in list(index["tags"].items())[:5])
+            print(f"标签倒排索引: {raw} 个标签规范化为 {len(index['tags'])} 个（合并 {len(index['aliases'])} 种写法）；题数最多: {top}")
+        removed = writer.prune()
+        manifest_path = dist_dir.parent / MANIFEST_PATH.name
+        if args.hash:
+            writer.write_manifest(manifest_path)
+            print(f"已写入 {manifest_path}（{len(writer.files)} 个产物）")
+        elif manifest_path.exists():
+            # 不带哈希的产物不能长期缓存，删掉旧 manifest，App 改回直接读 questions_v2.json
+            manifest_path.unlink()
+            print(f"已删除旧的 {manifest_path}")
+        print(f"已写入发布产物: {dist_dir}" + (f"（删除旧产物 {removed} 个）" if removed else ""))
+        writer.report()
 
 
 if __name__ == "__main__":
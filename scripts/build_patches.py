@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+题库增量补丁：比较同一产物（questions_v2.json、glossary.json 等）的两个版本，按题目键与字段生成紧凑补丁，
+并维护补丁链索引，已有旧版本的客户端只需下载变化的记录，不必重新下载整份题库。
+
+- 版本号为产物规范化内容（sort_keys、紧凑）的 sha256 前 10 位；
+- 列表产物按题目键对齐（题号；重复题号第 n 次出现为 "题号#n"，见 question_store.question_keys），对象产物（glossary）按键对齐；
+- 补丁内容：set（变化的字段，对象字段细到子字段，如 "explanation.analysis"）、unset（删掉的字段）、
+  add（新增的整条记录）、remove（删除的键）、order（顺序与默认不同时给出完整键顺序）；
+- 补丁写到 public/data/patches/<产物名>/<旧版本>-<新版本>.json（入库），索引 index.json 记录
+  latest、版本链与每个补丁的字节数、改动条数；新补丁的起点不是 latest 时重新开始一条链；
+- 生成后立即校验：对旧版本依次套用补丁链，规范化后须与新版本逐字节一致。
+
+用法:
+  python3 scripts/build_patches.py --git HEAD                      # 旧版本取 git HEAD 中的 questions_v2.json，新版本为当前文件
+  python3 scripts/build_patches.py old.json public/data/questions_v2.json
+  python3 scripts/build_patches.py --git HEAD~3 public/data/glossary.json
+  python3 scripts/build_patches.py --verify old.json               # 只校验：从 old 套用补丁链到 latest
+"""
+import gzip
+import hashlib
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from app_artifacts import dumps_min, write_bytes
+from question_store import question_keys
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DATA_DIR = REPO_ROOT / "public" / "data"
+DEFAULT_ARTIFACT = DATA_DIR / "questions_v2.json"
+PATCH_DIR = DATA_DIR / "patches"
+INDEX_VERSION = 1
+_MISSING = object()
+
+
+def canonical(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def version_of(obj) -> str:
+    return hashlib.sha256(canonical(obj)).hexdigest()[:10]
+
+
+def records(obj) -> dict:
+    """产物 -> 有序的 键 -> 记录。"""
+    if isinstance(obj, list):
+        return dict(zip(question_keys(obj), obj))
+    return dict(obj)
+
+
+def diff_record(old: dict, new: dict) -> tuple[dict, list[str]]:
+    """返回 (set, unset)：变化的字段（对象字段细到子字段）与删掉的字段。"""
+    set_fields, unset = {}, []
+    for field in dict.fromkeys([*old, *new]):
+        a, b = old.get(field, _MISSING), new.get(field, _MISSING)
+        if a == b:
+            continue
+        if b is _MISSING:
+            unset.append(field)
+        elif isinstance(a, dict) and isinstance(b, dict):
+            for sub in dict.fromkeys([*a, *b]):
+                sa, sb = a.get(sub, _MISSING), b.get(sub, _MISSING)
+                if sa == sb:
+                    continue
+                if sb is _MISSING:
+                    unset.append(f"{field}.{sub}")
+                else:
+                    set_fields[f"{field}.{sub}"] = sb
+        else:
+            set_fields[field] = b
+    return set_fields, unset
+
+
+def make_patch(old_obj, new_obj) -> dict:
+    old, new = records(old_obj), records(new_obj)
+    patch = {"from": version_of(old_obj), "to": version_of(new_obj), "kind": "list" if isinstance(new_obj, list) else "dict"}
+    sets, unsets = {}, {}
+    for key in new:
+        if key in old:
+            s, u = diff_record(old[key], new[key])
+            if s:
+                sets[key] = s
+            if u:
+                unsets[key] = u
+    patch["set"] = sets
+    patch["unset"] = unsets
+    patch["add"] = {key: new[key] for key in new if key not in old}
+    patch["remove"] = [key for key in old if key not in new]
+    if list(new) != default_order(old, patch):
+        patch["order"] = list(new)
+    return patch
+
+
+def default_order(old: dict, patch: dict) -> list[str]:
+    """未给出 order 时的顺序：旧顺序去掉删除的键，新增的键依次追加在末尾。"""
+    removed = set(patch["remove"])
+    return [key for key in old if key not in removed] + list(patch["add"])
+
+
+def apply_patch(obj, patch: dict):
+    """对产物套用一个补丁，返回新产物（不修改传入的对象）。"""
+    old = records(obj)
+    removed = set(patch["remove"])
+    out = {key: json.loads(json.dumps(item)) for key, item in old.items() if key not in removed}
+    for key, fields in patch["set"].items():
+        for path, value in fields.items():
+            field, _, sub = path.partition(".")
+            if sub and isinstance(out[key].get(field), dict):
+                out[key][field][sub] = value
+            else:
+                out[key][path] = value
+    for key, paths in patch["unset"].items():
+        for path in paths:
+            field, _, sub = path.partition(".")
+            target = out[key][field] if sub else out[key]
+            target.pop(sub or field, None)
+    out.update(patch["add"])
+    order = patch.get("order") or default_order(old, patch)
+    if patch["kind"] == "list":
+        return [out[key] for key in order]
+    return {key: out[key] for key in order}
+
+
+def load_index(patch_dir: Path) -> dict:
+    try:
+        return json.loads((patch_dir / "index.json").read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return {"version": INDEX_VERSION, "latest": None, "versions": [], "patches": []}
+
+
+def patch_chain(index: dict, start: str, end: str | None = None) -> list[dict] | None:
+    """从版本 start 到 end（默认 latest）需依次套用的补丁；start 不在链上时返回 None。"""
+    end = end or index["latest"]
+    if start == end:
+        return []
+    versions = index["versions"]
+    if start not in versions or end not in versions or versions.index(start) > versions.index(end):
+        return None
+    return index["patches"][versions.index(start) : versions.index(end)]
+
+
+def verify(old_obj, new_obj, index: dict, patch_dir: Path) -> bool:
+    chain = patch_chain(index, version_of(old_obj), version_of(new_obj))
+    if chain is None:
+        print(f"  [校验失败] 补丁链中没有 {version_of(old_obj)} → {version_of(new_obj)}")
+        return False
+    obj = old_obj
+    for entry in chain:
+        obj = apply_patch(obj, json.loads((patch_dir / entry["file"]).read_text(encoding="utf-8")))
+    ok = canonical(obj) == canonical(new_obj)
+    print(f"  [校验] 套用 {len(chain)} 个补丁后与新版本{'逐字节一致' if ok else '不一致'}（规范化后比较）")
+    return ok
+
+
+def load_json(path: Path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_git(ref: str, path: Path):
+    rel = path.resolve().relative_to(REPO_ROOT).as_posix()
+    out = subprocess.run(["git", "show", f"{ref}:{rel}"], cwd=REPO_ROOT, capture_output=True, check=False)
+    if out.returncode != 0:
+        print(f"无法从 git 读取 {ref}:{rel}: {out.stderr.decode('utf-8', 'replace').strip()}")
+        sys.exit(1)
+    return json.loads(out.stdout.decode("utf-8"))
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="生成产物两个版本之间的增量补丁并维护补丁链")
+    parser.add_argument("paths", nargs="*", help="旧版本 新版本（使用 --git 时只给新版本，默认 questions_v2.json）")
+    parser.add_argument("--git", type=str, default="", help="旧版本取该 git 版本中的同一文件，如 HEAD")
+    parser.add_argument("--verify", action="store_true", help="只校验：从旧版本套用补丁链能否得到新版本（默认 latest）")
+    parser.add_argument("--patch-dir", type=str, default="", help=f"补丁目录（默认 {PATCH_DIR.relative_to(REPO_ROOT)}/<产物名>）")
+    args = parser.parse_args()
+
+    paths = [Path(p) for p in args.paths]
+    if args.git:
+        new_path = paths[0] if paths else DEFAULT_ARTIFACT
+        old_obj = load_git(args.git, new_path)
+    elif args.verify and len(paths) == 1:
+        new_path = None
+        old_obj = load_json(paths[0])
+    elif len(paths) == 2:
+        new_path = paths[1]
+        old_obj = load_json(paths[0])
+    else:
+        parser.error("需给出 旧版本 新版本 两个文件，或使用 --git REF [新版本]")
+    if new_path is not None and not new_path.exists():
+        print(f"文件不存在: {new_path}")
+        sys.exit(1)
+
+    name = (new_path or DEFAULT_ARTIFACT).stem
+    patch_dir = Path(args.patch_dir) if args.patch_dir else PATCH_DIR / name
+    index = load_index(patch_dir)
+
+    if args.verify:
+        if new_path is None:
+            latest = index["latest"]
+            print(f"从 {version_of(old_obj)} 校验到 latest {latest}")
+            chain = patch_chain(index, version_of(old_obj))
+            if chain is None:
+                print(f"  [校验失败] {version_of(old_obj)} 不在补丁链上")
+                sys.exit(1)
+            obj = old_obj
+            for entry in chain:
+                obj = apply_patch(obj, load_json(patch_dir / entry["file"]))
+            ok = version_of(obj) == latest
+            print(f"  [校验] 套用 {len(chain)} 个补丁后版本为 {version_of(obj)}，{'与 latest 一致' if ok else '与 latest 不一致'}")
+        else:
+            ok = verify(old_obj, load_json(new_path), index, patch_dir)
+        sys.exit(0 if ok else 1)
+
+    new_obj = load_json(new_path)
+    old_v, new_v = version_of(old_obj), version_of(new_obj)
+    if old_v == new_v:
+        print(f"两个版本内容相同（{new_v}），无需补丁")
+        return
+
+    patch = make_patch(old_obj, new_obj)
+    data = dumps_min(patch)
+    file = f"{old_v}-{new_v}.json"
+    write_bytes(patch_dir / file, data)
+
+    if index["latest"] != old_v:
+        if index["latest"]:
+            print(f"旧版本 {old_v} 不是补丁链的 latest（{index['latest']}），重新开始补丁链")
+        index = {"version": INDEX_VERSION, "latest": old_v, "versions": [old_v], "patches": []}
+    full = dumps_min(new_obj)
+    entry = {
+        "from": old_v,
+        "to": new_v,
+        "file": file,
+        "bytes": len(data),
+        "gzip_bytes": len(gzip.compress(data, mtime=0)),
+        "full_bytes": len(full),
+        "full_gzip_bytes": len(gzip.compress(full, mtime=0)),
+        "changed": len(set(patch["set"]) | set(patch["unset"])),
+        "added": len(patch["add"]),
+        "removed": len(patch["remove"]),
+    }
+    index["patches"].append(entry)
+    index["versions"].append(new_v)
+    index["latest"] = new_v
+    write_bytes(patch_dir / "index.json", json.dumps(index, ensure_ascii=False, indent=2).encode("utf-8"))
+
+    fields = sum(len(f) for f in patch["set"].values()) + sum(len(u) for u in patch["unset"].values())
+    print(f"补丁 {old_v} → {new_v}: 改动 {entry['changed']} 条（{fields} 个字段），新增 {entry['added']}，删除 {entry['removed']}")
+    print(
+        f"  补丁 {entry['bytes'] / 1024:,.1f} KB（gzip {entry['gzip_bytes'] / 1024:,.1f} KB），"
+        f"完整产物 {entry['full_bytes'] / 1024:,.1f} KB（gzip {entry['full_gzip_bytes'] / 1024:,.1f} KB），"
+        f"为完整下载的 {entry['gzip_bytes'] / entry['full_gzip_bytes']:.2%}"
+    )
+    print(f"已写入: {patch_dir / file}，链长 {len(index['patches'])}")
+    if not verify(old_obj, new_obj, index, patch_dir):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
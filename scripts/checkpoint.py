@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+按题追加的断点日志（JSONL），供 translate_en_to_cn.py、add_tags_and_explanation.py 使用；
+fill_glossary.py 用按词条追加的 EntryJournal 与原子写回 atomic_write_json。
+
+旧做法每次断点都把全部 done_items 以 indent=2 整体重写进 .xxx_progress.json，题库越大越慢（总 I/O 随题数平方增长）。
+现在每批完成后只追加这一批的题：
+
+- 每行一条 {"i": 题目下标, "item": {...}}；同一下标出现多次时以最后一条为准（--retry-failed / --fill-empty 覆盖写）；
+- 每次 append 只 flush + fsync 一次（一批一次），进程崩溃最多丢失正在进行的那几批；
+- 续跑时回放日志：从下标 0 起连续已完成的题即 done_items，末尾被截断的半行直接忽略；
+- compact() 把日志重写为每题一行（临时文件 + os.replace，原子替换），用于 --retry-failed / --fill-empty 覆盖写后收尾；
+- 若只存在旧版 .xxx_progress.json，首次读取时自动迁移为日志。
+
+用法（脚本内）:
+  from checkpoint import ProgressJournal
+
+  journal = ProgressJournal(PROGRESS_FILE, legacy_path=LEGACY_PROGRESS_FILE)
+  done_items = journal.load()          # 回放日志
+  journal.append(start, batch_items)   # 一批完成后追加
+  journal.remove()                     # 全部写入输出文件后删除
+"""
+import json
+import os
+from pathlib import Path
+
+
+def _append_lines(path: Path, lines: list[str]):
+    """追加若干行并只 fsync 一次。"""
+    if not lines:
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("".join(lines))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def atomic_write_json(path: Path, obj, indent: int | None = 2):
+    """先写同目录临时文件并 fsync，再 os.replace 替换，写到一半中断也不会留下损坏的 JSON。"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class ProgressJournal:
+    def __init__(self, path: Path, legacy_path: Path | None = None):
+        self.path = Path(path)
+        self.legacy_path = Path(legacy_path) if legacy_path else None
+
+    def exists(self) -> bool:
+        return self.path.exists() or bool(self.legacy_path and self.legacy_path.exists())
+
+    def _replay(self) -> dict[int, dict]:
+        records: dict[int, dict] = {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    # 崩溃时写了一半的最后一行
+                    continue
+                if isinstance(rec, dict) and isinstance(rec.get("i"), int) and isinstance(rec.get("item"), dict):
+                    records[rec["i"]] = rec["item"]
+        return records
+
+    def _migrate_legacy(self):
+        try:
+            data = json.loads(self.legacy_path.read_text(encoding="utf-8"))
+            items = data.get("items", [])
+        except Exception:
+            items = []
+        self.compact(items)
+        self.legacy_path.unlink()
+        print(f"已将旧版断点 {self.legacy_path.name} 迁移为 {self.path.name}（{len(items)} 题）")
+
+    def load(self) -> list[dict]:
+        """回放日志，返回从下标 0 起连续完成的题（即可以跳过的前缀）。"""
+        if not self.path.exists() and self.legacy_path and self.legacy_path.exists():
+            self._migrate_legacy()
+        if not self.path.exists():
+            return []
+        records = self._replay()
+        done = []
+        while len(done) in records:
+            done.append(records[len(done)])
+        return done
+
+    def _write(self, records: list[tuple[int, dict]]):
+        _append_lines(self.path, [json.dumps({"i": i, "item": item}, ensure_ascii=False) + "\n" for i, item in records])
+
+    def append(self, start: int, items: list[dict]):
+        """追加 items（下标从 start 起），整批只 fsync 一次。"""
+        self._write([(start + k, item) for k, item in enumerate(items)])
+
+    def update(self, indices: list[int], items: list[dict]):
+        """覆盖写若干不连续下标的题（同样整批一次 fsync），回放时以最后一条为准。"""
+        self._write(list(zip(indices, items)))
+
+    def compact(self, items: list[dict]):
+        """把日志重写为 items 每题一行：先写临时文件并 fsync，再原子替换。"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for i, item in enumerate(items):
+                f.write(json.dumps({"i": i, "item": item}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def remove(self):
+        for p in (self.path, self.legacy_path):
+            if p and p.exists():
+                p.unlink()
+
+
+class EntryJournal:
+    """按键追加的日志：每行 {"key": 键, "value": {...}}，回放时同键以最后一条为准，末尾半行忽略。"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def load(self) -> dict[str, dict]:
+        if not self.path.exists():
+            return {}
+        entries: dict[str, dict] = {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(rec, dict) and isinstance(rec.get("key"), str) and isinstance(rec.get("value"), dict):
+                    entries[rec["key"]] = rec["value"]
+        return entries
+
+    def append(self, entries: dict[str, dict]):
+        """追加一批条目，整批只 fsync 一次。"""
+        _append_lines(self.path, [json.dumps({"key": k, "value": v}, ensure_ascii=False) + "\n" for k, v in entries.items()])
+
+    def remove(self):
+        if self.path.exists():
+            self.path.unlink()
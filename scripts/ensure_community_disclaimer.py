@@ -3,9 +3,10 @@
 为所有题目的 explanation.analysis 统一加上「本题以社区投票为准」前缀（若尚未包含）。
 格式：「【本题以社区投票为准，答案为 X（社区 Y%），解析仅供参考。】
 然后再接原有考查点概括（即现有 analysis 内容）。
+逐题逻辑注册为 postprocess.py 的 community_disclaimer 变换；本脚本只执行这一个变换。
 """
-import json
-import os
+
+from postprocess import ENRICHED_PATH, V2_PATH, run, transform
 
 PREFIX_MARKER = "【本题以社区投票为准"
 
@@ -31,34 +32,24 @@ def ensure_prefix(analysis, answer, pct):
     prefix = f"【本题以社区投票为准，答案为 {answer_str}（社区 {pct}），解析仅供参考。】\n\n"
     return prefix + analysis.strip()
 
-def process_file(path, use_best_answer=True):
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    updated = 0
-    for q in data:
-        if not q.get("explanation") or not isinstance(q["explanation"], dict):
-            continue
-        analysis = q["explanation"].get("analysis")
-        if not analysis:
-            continue
-        answer = get_answer(q, use_best_answer=use_best_answer)
-        pct = get_pct(q)
-        new_analysis = ensure_prefix(analysis, answer, pct)
-        if new_analysis != analysis:
-            q["explanation"]["analysis"] = new_analysis
-            updated += 1
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    return updated
+@transform("community_disclaimer", order=20)
+def add_community_disclaimer(q, file, key, ctx):
+    """analysis 缺前缀时补上（v2 用 best_answer，enriched 用 correct_answer）。"""
+    expl = q.get("explanation")
+    if not expl or not isinstance(expl, dict):
+        return {}
+    analysis = expl.get("analysis")
+    if not analysis:
+        return {}
+    new_analysis = ensure_prefix(analysis, get_answer(q, use_best_answer=file == "v2"), get_pct(q))
+    if new_analysis == analysis:
+        return {}
+    return {"explanation": {**expl, "analysis": new_analysis}}
 
 def main():
-    base = os.path.join(os.path.dirname(__file__), "..", "public", "data")
-    v2_path = os.path.join(base, "questions_v2.json")
-    enriched_path = os.path.join(base, "questions_bilingual_enriched.json")
-    v2_n = process_file(v2_path, use_best_answer=True)
-    enriched_n = process_file(enriched_path, use_best_answer=False)
-    print(f"questions_v2.json: {v2_n} 条 analysis 已补前缀")
-    print(f"questions_bilingual_enriched.json: {enriched_n} 条 analysis 已补前缀")
+    report = run(["community_disclaimer"], files={"v2": V2_PATH, "enriched": ENRICHED_PATH})
+    print(f"questions_v2.json: {report.changed('community_disclaimer', 'v2')} 条 analysis 已补前缀")
+    print(f"questions_bilingual_enriched.json: {report.changed('community_disclaimer', 'enriched')} 条 analysis 已补前缀")
 
 if __name__ == "__main__":
     main()
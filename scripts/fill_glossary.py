@@ -3,58 +3,70 @@
 用 Gemini 为 glossary 中「待补充」或题目 related_terms 中缺失的词条批量生成释义，
 合并回 glossary.json。支持断点续跑、限流重试。
 
+每批补好的词条先追加到旁路日志 .fill_glossary_journal.jsonl（一批一次 fsync），
+结束时（或每隔 --merge-every 秒）再一次性原子写回 glossary.json，不再每批整体重写近 1 MB 的文件。
+上次中断留下的日志会在启动时先合并进 glossary.json。
+待补词条按被多少道题引用从多到少排列（与 build_app_questions.py --term-index 的 term_counts.json 同一口径，
+见 term_matcher.term_question_ids），配合 --limit 先补最常用的。
+
 用法:
   export GEMINI_API_KEY="你的API密钥"
   python3 scripts/fill_glossary.py
   python3 scripts/fill_glossary.py --limit 30
   python3 scripts/fill_glossary.py --resume
   python3 scripts/fill_glossary.py --only-stubs   # 只补「（待补充）」条目，不补缺失
+  python3 scripts/fill_glossary.py --concurrency 8   # 同时在途的请求数（默认 4）
+  python3 scripts/fill_glossary.py --merge-every 300   # 运行中每 300 秒也写回一次 glossary.json（默认只在结束时写回）
 """
 import json
-import os
 import re
 import sys
 import time
 from pathlib import Path
 
-RETRY_MAX = 4
-RETRY_WAIT_SEC = [60, 120, 180, 300]
-BATCH_SIZE = 15
-BASE_SLEEP_SEC = 1.5
+from checkpoint import EntryJournal, atomic_write_json
+from llm_batch import AdaptiveBatcher, add_batch_args, estimate_tokens
+from llm_client import add_llm_args, create_client, map_ordered, run_llm
+from term_matcher import TermMatcher, term_question_ids
 
-try:
-    import google.generativeai as genai
-except ImportError:
-    print("请先安装: pip install google-generativeai")
-    sys.exit(1)
+# 一批解析异常时最多重新请求的次数
+PARSE_RETRY_MAX = 4
 
 REPO_ROOT = Path(__file__).resolve().parent.parent
 QUESTIONS_PATH = REPO_ROOT / "public" / "data" / "questions_v2.json"
 GLOSSARY_PATH = REPO_ROOT / "public" / "data" / "glossary.json"
-PROGRESS_FILE = REPO_ROOT / "public" / "data" / ".fill_glossary_progress.json"
+# 已补好、尚未写回 glossary.json 的词条（JSONL，每行一条）
+JOURNAL_FILE = REPO_ROOT / "public" / "data" / ".fill_glossary_journal.jsonl"
+# 旧版断点（已处理词条列表），--resume 时仍会读取
+LEGACY_PROGRESS_FILE = REPO_ROOT / "public" / "data" / ".fill_glossary_progress.json"
 
 
-def get_model():
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        print("请设置环境变量 GEMINI_API_KEY")
-        sys.exit(1)
-    genai.configure(api_key=api_key)
-    return genai.GenerativeModel("gemini-2.0-flash-lite")
+def reference_counts(questions: list[dict]) -> dict[str, int]:
+    """术语 -> 引用它的题数；glossary 中规范化后重复的键与其代表术语计数相同。"""
+    matcher = TermMatcher.from_glossary(GLOSSARY_PATH)
+    counts = {t: len(ids) for t, ids in term_question_ids(matcher, questions).items()}
+    for dup, rep in matcher.duplicates.items():
+        counts[dup] = counts.get(rep, 0)
+    return counts
 
 
-def get_terms_to_fill(only_stubs: bool) -> list[str]:
-    """需要补充的词条：glossary 里「（待补充）」或题目 related_terms 中缺失的。"""
+def get_terms_to_fill(only_stubs: bool) -> tuple[list[str], dict[str, int]]:
+    """需要补充的词条：glossary 里「（待补充）」或题目 related_terms 中缺失的，按引用题数从多到少排列；
+    同时返回引用计数（题目文件不存在时为空，保持原顺序）。"""
     with open(GLOSSARY_PATH, "r", encoding="utf-8") as f:
         glossary = json.load(f)
-    stub_terms = [k for k, v in glossary.items() if (v.get("definition") or "").strip() == "（待补充）"]
+    stub_terms = sorted(k for k, v in glossary.items() if (v.get("definition") or "").strip() == "（待补充）")
+
+    questions = []
+    if QUESTIONS_PATH.exists():
+        with open(QUESTIONS_PATH, "r", encoding="utf-8") as f:
+            questions = json.load(f)
+    counts = reference_counts(questions) if questions else {}
 
     if only_stubs:
-        return sorted(stub_terms)
+        return sorted(stub_terms, key=lambda t: -counts.get(t, 0)), counts
 
     terms_in_questions = set()
-    with open(QUESTIONS_PATH, "r", encoding="utf-8") as f:
-        questions = json.load(f)
     for q in questions:
         for t in q.get("related_terms") or []:
             terms_in_questions.add(t)
@@ -66,7 +78,8 @@ def get_terms_to_fill(only_stubs: bool) -> list[str]:
         if t not in seen:
             seen.add(t)
             out.append(t)
-    return out
+    # 引用题数相同时仍先 stubs 后 missing
+    return sorted(out, key=lambda t: -counts.get(t, 0)), counts
 
 
 def build_prompt(terms: list[str]) -> str:
@@ -86,6 +99,15 @@ def build_prompt(terms: list[str]) -> str:
 直接输出 JSON 对象，不要用 markdown 代码块包裹。"""
 
 
+def estimate_input_tokens(term: str) -> int:
+    return estimate_tokens(term) + 2
+
+
+def estimate_output_tokens(term: str) -> int:
+    """单个词条的输出 token：definition + analogy + 2～4 个 features 约 160 token，另加键名重复。"""
+    return 160 + 2 * estimate_tokens(term)
+
+
 def parse_batch_response(text: str, terms: list[str]) -> dict | None:
     text = text.strip()
     if text.startswith("```"):
@@ -114,55 +136,108 @@ def parse_batch_response(text: str, terms: list[str]) -> dict | None:
         return None
 
 
-def load_progress() -> list[str]:
-    """返回已处理过的 term 列表。glossary 以 GLOSSARY_PATH 为准（每批都会写回）。"""
-    if not PROGRESS_FILE.exists():
-        return []
+def load_legacy_done_terms() -> set[str]:
+    """旧版断点中已处理过的 term（其释义当时已逐批写回 glossary.json）。"""
+    if not LEGACY_PROGRESS_FILE.exists():
+        return set()
     try:
-        data = json.loads(PROGRESS_FILE.read_text(encoding="utf-8"))
-        return data.get("done_terms", [])
+        data = json.loads(LEGACY_PROGRESS_FILE.read_text(encoding="utf-8"))
+        return set(data.get("done_terms", []))
     except Exception:
-        return []
+        return set()
+
 
+def merge_into_glossary(glossary_snapshot: dict, journal: EntryJournal):
+    """把内存中的 glossary 原子写回 glossary.json；写回后日志中的条目已落盘，清空日志。"""
+    atomic_write_json(GLOSSARY_PATH, glossary_snapshot)
+    journal.remove()
 
-def save_progress(done_terms: list[str]):
-    PROGRESS_FILE.parent.mkdir(parents=True, exist_ok=True)
-    PROGRESS_FILE.write_text(
-        json.dumps({"done_terms": done_terms}, ensure_ascii=False, indent=2),
-        encoding="utf-8",
-    )
 
+def recover_journal(journal: EntryJournal) -> int:
+    """上次中断时日志里尚未写回的词条，先合并进 glossary.json。返回合并条数。"""
+    pending = journal.load()
+    if not pending:
+        journal.remove()
+        return 0
+    with open(GLOSSARY_PATH, "r", encoding="utf-8") as f:
+        glossary = json.load(f)
+    glossary.update(pending)
+    merge_into_glossary(glossary, journal)
+    return len(pending)
 
-def fill_batch(model, terms: list[str]) -> dict:
-    """对一批术语调用 API，返回 term -> { definition, analogy, features }。"""
+
+async def fill_batch(client, terms: list[str], batcher: AdaptiveBatcher | None = None) -> dict:
+    """对一批术语调用 API，返回 term -> { definition, analogy, features }。首次请求的取回条数反馈给 batcher。"""
     prompt = build_prompt(terms)
-    for attempt in range(RETRY_MAX + 1):
-        try:
-            response = model.generate_content(prompt)
-            text = response.text if hasattr(response, "text") else (response.candidates[0].content.parts[0].text if response.candidates else "")
-            parsed = parse_batch_response(text, terms)
-            if parsed:
-                return parsed
-            print(f"  [WARN] 本批 {len(terms)} 条解析异常，重试...")
-        except Exception as e:
-            err_str = str(e)
-            is_rate_limit = "429" in err_str or "Resource exhausted" in err_str or "quota" in err_str.lower() or "rate" in err_str.lower()
-            if is_rate_limit and attempt < RETRY_MAX:
-                wait = RETRY_WAIT_SEC[attempt]
-                print(f"  [429/限流] {wait} 秒后重试（第 {attempt + 1}/{RETRY_MAX} 次）")
-                time.sleep(wait)
-            else:
-                print(f"  [ERROR] 本批: {e}")
-                return {}
+    label = f"本批 {len(terms)} 条（{terms[0]} ...）"
+    for attempt in range(PARSE_RETRY_MAX + 1):
+        text = await client.generate(prompt, label=label, validate=lambda t: parse_batch_response(t, terms) is not None)
+        if text is None:
+            return {}
+        parsed = parse_batch_response(text, terms)
+        if batcher and attempt == 0:
+            batcher.record(len(terms), len(parsed or {}))
+        if parsed:
+            return parsed
+        print(f"  [WARN] 本批 {len(terms)} 条解析异常，重试...")
     return {}
 
 
+async def _run(args, terms_to_fill: list[str], glossary_snapshot: dict, journal: EntryJournal) -> int:
+    client = create_client(args)
+    batcher = AdaptiveBatcher(estimate_input_tokens, estimate_output_tokens, output_budget=args.batch_tokens, metrics=client.metrics)
+    try:
+        return await _fill_all(client, batcher, terms_to_fill, glossary_snapshot, journal, args.merge_every)
+    finally:
+        client.close()
+
+
+async def _fill_all(
+    client,
+    batcher: AdaptiveBatcher,
+    terms_to_fill: list[str],
+    glossary_snapshot: dict,
+    journal: EntryJournal,
+    merge_every: float = 0,
+) -> int:
+    # 每轮按 token 预算装出 concurrency 批并发请求；每批一完成就追加到日志，glossary.json 只在结束时（或按间隔）写回
+    client.plan(len(batcher.split(terms_to_fill)))
+    filled_total = 0
+    last_merge = time.monotonic()
+    start = 0
+    while start < len(terms_to_fill):
+        round_batches = batcher.split(terms_to_fill[start:], max_batches=client.concurrency)
+        for batch in round_batches:
+            print(f"  [{start + 1}/{len(terms_to_fill)}] 处理 {len(batch)} 条: {batch[0]} ... {batch[-1]}")
+            start += len(batch)
+        results = await map_ordered(
+            lambda batch: fill_batch(client, batch, batcher),
+            round_batches,
+            lambda _, filled: journal.append(filled),
+        )
+        merged = 0
+        for filled in results:
+            glossary_snapshot.update(filled)
+            merged += len(filled)
+        filled_total += merged
+        print(f"      本轮补充 {merged} 条（已记入 {journal.path.name}）")
+        if merge_every > 0 and time.monotonic() - last_merge >= merge_every:
+            merge_into_glossary(glossary_snapshot, journal)
+            last_merge = time.monotonic()
+            print(f"      已写回 glossary.json（累计 {filled_total} 条）")
+    merge_into_glossary(glossary_snapshot, journal)
+    return filled_total
+
+
 def main():
     import argparse
     parser = argparse.ArgumentParser(description="Fill glossary missing/stub entries with Gemini")
     parser.add_argument("--resume", action="store_true", help="从上次进度继续")
     parser.add_argument("--limit", type=int, default=0, help="最多处理 N 条（0=全部）")
     parser.add_argument("--only-stubs", action="store_true", help="只补「（待补充）」条目，不补题目中缺失的词条")
+    parser.add_argument("--merge-every", type=float, default=0, help="运行中每隔 N 秒把已补词条写回 glossary.json（0=只在结束时写回）")
+    add_llm_args(parser)
+    add_batch_args(parser)
     args = parser.parse_args()
 
     if not GLOSSARY_PATH.exists():
@@ -172,7 +247,12 @@ def main():
         print(f"题目文件不存在: {QUESTIONS_PATH}")
         sys.exit(1)
 
-    terms_to_fill = get_terms_to_fill(args.only_stubs)
+    journal = EntryJournal(JOURNAL_FILE)
+    recovered = recover_journal(journal)
+    if recovered:
+        print(f"已将上次未写回的 {recovered} 条（{JOURNAL_FILE.name}）合并进 glossary.json")
+
+    terms_to_fill, counts = get_terms_to_fill(args.only_stubs)
     if not terms_to_fill:
         print("没有需要补充的词条。")
         return
@@ -180,10 +260,13 @@ def main():
     if args.limit > 0:
         terms_to_fill = terms_to_fill[: args.limit]
     print(f"待补充词条数: {len(terms_to_fill)}")
+    if counts:
+        print("按引用题数优先: " + "，".join(f"{t} {counts.get(t, 0)}" for t in terms_to_fill[:10]))
 
     with open(GLOSSARY_PATH, "r", encoding="utf-8") as f:
         glossary_snapshot = json.load(f)
-    done_terms = load_progress() if args.resume else []
+    # 已补好的词条在合并日志后已不在待补列表中；旧版断点中处理过的词条用集合过滤
+    done_terms = load_legacy_done_terms() if args.resume else set()
     if args.resume and done_terms:
         terms_to_fill = [t for t in terms_to_fill if t not in done_terms]
         if not terms_to_fill:
@@ -191,25 +274,11 @@ def main():
             return
         print(f"续跑：剩余 {len(terms_to_fill)} 条")
 
-    model = get_model()
-    total_batches = (len(terms_to_fill) + BATCH_SIZE - 1) // BATCH_SIZE
-    for start in range(0, len(terms_to_fill), BATCH_SIZE):
-        batch = terms_to_fill[start : start + BATCH_SIZE]
-        batch_no = start // BATCH_SIZE + 1
-        print(f"  [{batch_no}/{total_batches}] 处理 {len(batch)} 条: {batch[0]} ... {batch[-1]}")
-        filled = fill_batch(model, batch)
-        for t, entry in filled.items():
-            glossary_snapshot[t] = entry
-            done_terms.append(t)
-        save_progress(done_terms)
-        # 写回 glossary.json，便于中断后已有结果不丢
-        GLOSSARY_PATH.write_text(json.dumps(glossary_snapshot, ensure_ascii=False, indent=2), encoding="utf-8")
-        print(f"      已合并 {len(filled)} 条到 glossary.json")
-        time.sleep(BASE_SLEEP_SEC)
-
-    if PROGRESS_FILE.exists():
-        PROGRESS_FILE.unlink()
-    print(f"完成。共补充 {len(done_terms)} 条，已写入: {GLOSSARY_PATH}")
+    filled = run_llm(_run(args, terms_to_fill, glossary_snapshot, journal))
+
+    if LEGACY_PROGRESS_FILE.exists():
+        LEGACY_PROGRESS_FILE.unlink()
+    print(f"完成。共补充 {filled} 条，已写入: {GLOSSARY_PATH}")
 
 
 if __name__ == "__main__":
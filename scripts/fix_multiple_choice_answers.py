@@ -8,23 +8,18 @@
   python3 scripts/fix_multiple_choice_answers.py
   python3 scripts/fix_multiple_choice_answers.py --limit 5   # 试跑 5 题
   python3 scripts/fix_multiple_choice_answers.py --dry-run   # 只输出建议，不写回
+  python3 scripts/fix_multiple_choice_answers.py --concurrency 8   # 同时在途的请求数（默认 4）
 """
 import json
-import os
 import re
-import sys
-import time
 from pathlib import Path
 
+from llm_client import add_llm_args, create_client, map_ordered, run_llm
+from llm_governor import QuotaExhausted
+from question_store import QuestionStore
+
 RETRY_MAX = 3
 RETRY_WAIT = [30, 60, 120]
-BATCH_SLEEP = 1.0
-
-try:
-    import google.generativeai as genai
-except ImportError:
-    print("请先安装: pip install google-generativeai")
-    sys.exit(1)
 
 REPO_ROOT = Path(__file__).resolve().parent.parent
 QUESTIONS_PATH = REPO_ROOT / "public" / "data" / "questions_v2.json"
@@ -55,15 +50,6 @@ def get_best_answer_array(item: dict) -> list[str]:
     return [s]
 
 
-def get_model():
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        print("请设置环境变量 GEMINI_API_KEY")
-        sys.exit(1)
-    genai.configure(api_key=api_key.strip())
-    return genai.GenerativeModel("gemini-2.0-flash-lite")
-
-
 def build_prompt(q: dict, expect_n: int, current_letters: list[str]) -> str:
     q_cn = q.get("question_cn", "")
     opts = q.get("options_cn") or {}
@@ -107,24 +93,53 @@ def parse_response(text: str, expect_n: int) -> list[str] | None:
         return None
 
 
+async def infer_one(client, item: dict) -> dict | None:
+    """为单题推断全部正确选项；解析失败时重新请求，最多 RETRY_MAX 次。返回更新记录或 None。"""
+    key, q, expect_n, current = item["key"], item["q"], item["expect_n"], item["current"]
+    qid = q.get("id")
+    prompt = build_prompt(q, expect_n, current)
+    for _ in range(RETRY_MAX + 1):
+        text = await client.generate(prompt, label=f"题 {qid}", validate=lambda t: parse_response(t, expect_n) is not None)
+        if text is None:
+            return None
+        parsed = parse_response(text, expect_n)
+        if parsed:
+            print(f"  题 {qid}: {q.get('best_answer')} -> {''.join(parsed)}")
+            return {"key": key, "id": qid, "old": q.get("best_answer"), "new": "".join(parsed), "letters": parsed}
+        print(f"  题 {qid}: 解析失败")
+    return None
+
+
+async def _run(args, to_fix: list[dict]) -> list[dict]:
+    client = create_client(args, retry_wait=RETRY_WAIT)
+    client.plan(len(to_fix))
+    done: list[dict] = []
+    try:
+        await map_ordered(lambda item: infer_one(client, item), to_fix, lambda _, u: done.append(u))
+    except QuotaExhausted as e:
+        print(f"[QUOTA] {e}，先写回已完成的 {len(done)} 题")
+    finally:
+        client.close()
+    return [u for u in done if u]
+
+
 def main():
     import argparse
     parser = argparse.ArgumentParser(description="用 Gemini 补全多选题正确答案")
     parser.add_argument("--limit", type=int, default=0, help="只处理前 N 题（0=全部）")
     parser.add_argument("--dry-run", action="store_true", help="只打印建议，不写回 JSON")
+    add_llm_args(parser)
     args = parser.parse_args()
 
-    with open(QUESTIONS_PATH, "r", encoding="utf-8") as f:
-        questions = json.load(f)
-
+    store = QuestionStore({"v2": QUESTIONS_PATH})
     to_fix = []
-    for i, q in enumerate(questions):
+    for key, q in store.items("v2"):
         expect_n = infer_answer_count(q.get("question_cn", ""), q.get("question_en", ""))
         if expect_n < 2:
             continue
         ans = get_best_answer_array(q)
         if len(ans) != expect_n:
-            to_fix.append({"index": i, "q": q, "expect_n": expect_n, "current": ans})
+            to_fix.append({"key": key, "q": q, "expect_n": expect_n, "current": ans})
 
     if args.limit > 0:
         to_fix = to_fix[: args.limit]
@@ -133,45 +148,20 @@ def main():
         return
 
     print(f"待补全题数: {len(to_fix)}")
-    model = get_model()
-    updates = []
-    for idx, item in enumerate(to_fix):
-        i, q, expect_n, current = item["index"], item["q"], item["expect_n"], item["current"]
-        qid = q.get("id")
-        prompt = build_prompt(q, expect_n, current)
-        for attempt in range(RETRY_MAX + 1):
-            try:
-                resp = model.generate_content(prompt)
-                text = resp.text if hasattr(resp, "text") else (resp.candidates[0].content.parts[0].text if resp.candidates else "")
-                parsed = parse_response(text, expect_n)
-                if parsed:
-                    updates.append({"index": i, "id": qid, "old": q.get("best_answer"), "new": "".join(parsed), "letters": parsed})
-                    print(f"  题 {qid}: {q.get('best_answer')} -> {''.join(parsed)}")
-                    break
-                print(f"  题 {qid}: 解析失败")
-            except Exception as e:
-                if "429" in str(e) or "Resource exhausted" in str(e):
-                    wait = RETRY_WAIT[min(attempt, len(RETRY_WAIT) - 1)]
-                    print(f"  题 {qid}: 限流，{wait}s 后重试")
-                    time.sleep(wait)
-                else:
-                    print(f"  题 {qid}: {e}")
-                    break
-        time.sleep(BATCH_SLEEP)
+    updates = run_llm(_run(args, to_fix))
 
     if not updates or args.dry_run:
         if updates and args.dry_run:
             print(" dry-run: 建议修改", [u["id"] for u in updates])
         return
 
-    id_to_new = {u["id"]: u["new"] for u in updates}
-    for q in questions:
-        if q.get("id") in id_to_new:
-            q["best_answer"] = id_to_new[q["id"]]
-            if q.get("official_answer") is not None:
-                q["official_answer"] = id_to_new[q["id"]]
-    with open(QUESTIONS_PATH, "w", encoding="utf-8") as f:
-        json.dump(questions, f, ensure_ascii=False, indent=2)
+    with store.transaction():
+        for u in updates:
+            fields = {"best_answer": u["new"]}
+            if store.get("v2", u["key"]).get("official_answer") is not None:
+                fields["official_answer"] = u["new"]
+            store.update("v2", u["key"], fields)
+    store.close()
     print(f"已写回 {QUESTIONS_PATH}，共更新 {len(updates)} 题")
 
 
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+多题一批请求的公共逻辑，供 translate_en_to_cn.py、add_tags_and_explanation.py 使用。
+
+- salvage_by_id：批量 prompt 给每题标一个批内唯一的键（题号；同批重复的题号记为 "题号#n"，
+  见 question_store.question_keys），响应按该键逐条取回；数组长度不符、个别元素缺失/格式错误、
+  甚至输出被截断时，仍保留所有完好的元素，只把缺失的题号重新排队。
+- bisect_batch：只对缺失的题重新请求；响应整批都解析不出时对半拆分后递归重试，一道「毒题」只多花
+  O(log n) 次请求即可被隔离出来。被隔离的题号追加到 poison 日志（JSONL），再用单题 prompt 兜底。
+  请求本身失败（客户端已用完超时与重试）不拆批、不记 poison，整批标为失败，留给 --retry-failed / --fill-empty。
+- AdaptiveBatcher：按每题估算的输入/输出 token 装批，不再固定 15 题一批；截断或缺失多时自动缩小预算，
+  连续顺利时逐步放大，让每个请求尽量装满又不触及输出上限。
+"""
+import asyncio
+import json
+import re
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Sequence, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# 单次请求的输出 token 预算（gemini-2.0-flash-lite 输出上限 8192，留出余量）与输入 token 预算
+DEFAULT_OUTPUT_TOKEN_BUDGET = 4000
+DEFAULT_INPUT_TOKEN_BUDGET = 12000
+MAX_BATCH_ITEMS = 40
+# 预算缩放范围：失败时 ×SHRINK，连续 GROW_AFTER 批全部取回时 ×GROW
+MIN_SCALE = 0.125
+MAX_SCALE = 1.75
+SHRINK = 0.5
+GROW = 1.25
+GROW_AFTER = 3
+# 一批中取不回的比例超过该值视为失败
+FAIL_TOLERANCE = 0.1
+
+_CJK_RE = re.compile(r"[\u3000-\u9fff\uff00-\uffef]")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：中日文字符约 1 字 1 token，其余约 4 字符 1 token。"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def strip_code_fence(text: str) -> str:
+    text = text.strip()
+    if text.startswith("```"):
+        text = re.sub(r"^```(?:json)?\s*", "", text)
+        text = re.sub(r"\s*```\s*$", "", text)
+    return text
+
+
+def salvage_json_array(text: str) -> tuple[list, bool]:
+    """逐个解析 JSON 数组元素，遇到截断或格式错误即停止。返回 (已解析的元素, 数组是否完整)。"""
+    text = strip_code_fence(text)
+    start = text.find("[")
+    if start < 0:
+        return [], False
+    decoder = json.JSONDecoder()
+    elements = []
+    pos = start + 1
+    n = len(text)
+    while True:
+        while pos < n and text[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= n:
+            return elements, False
+        if text[pos] == "]":
+            return elements, True
+        try:
+            value, pos = decoder.raw_decode(text, pos)
+        except json.JSONDecodeError:
+            return elements, False
+        elements.append(value)
+
+
+def salvage_by_id(text: str, keys: Sequence, normalize: Callable[[dict], dict | None]) -> dict[str, dict]:
+    """
+    从批量响应中按 id 取回每个完好的元素：返回 str(键) -> normalize(元素)。keys 须在批内唯一（同题号的两道题
+    共用一个键时只能取回一份，另一题会被写成同一结果），prompt 中每题的 id 即为该键。
+    元素缺 id 时，仅当数组完整且长度与 keys 一致才按位置对应；normalize 返回 None 视为格式错误而丢弃。
+    """
+    elements, complete = salvage_json_array(text)
+    expected = [str(k) for k in keys]
+    expected_set = set(expected)
+    positional = complete and len(elements) == len(expected)
+    out: dict[str, dict] = {}
+    for pos, el in enumerate(elements):
+        if not isinstance(el, dict):
+            continue
+        if "id" in el:
+            key = str(el.get("id")).strip()
+        elif positional:
+            key = expected[pos]
+        else:
+            continue
+        if key not in expected_set or key in out:
+            continue
+        norm = normalize(el)
+        if norm is not None:
+            out[key] = norm
+    return out
+
+
+def is_truncated(text: str) -> bool:
+    """批量响应的 JSON 数组是否未闭合（多为触及输出上限被截断）。"""
+    return not salvage_json_array(text)[1]
+
+
+class AdaptiveBatcher:
+    """
+    按 token 预算装批：est_input(item)/est_output(item) 估算单题输入/输出 token，
+    每批在 预算 × scale 内尽量多装（至少 1 题，至多 max_items 题）。
+    每次请求后调用 record(n, ok, truncated)：截断或取回率低于 1 - FAIL_TOLERANCE 时 scale 减半；
+    连续 GROW_AFTER 批全部取回时 scale ×GROW，上限 MAX_SCALE。给出 metrics（llm_metrics.LLMMetrics）时同时记入批大小分布。
+    """
+
+    def __init__(
+        self,
+        est_input: Callable[[T], int],
+        est_output: Callable[[T], int],
+        output_budget: int = DEFAULT_OUTPUT_TOKEN_BUDGET,
+        input_budget: int = DEFAULT_INPUT_TOKEN_BUDGET,
+        max_items: int = MAX_BATCH_ITEMS,
+        metrics=None,
+    ):
+        self.est_input = est_input
+        self.est_output = est_output
+        self.output_budget = output_budget
+        self.input_budget = input_budget
+        self.max_items = max_items
+        self.metrics = metrics
+        self.scale = 1.0
+        self._clean_streak = 0
+
+    def take(self, items: Sequence[T], start: int = 0) -> int:
+        """从 items[start] 起装一批，返回该批的结束下标（不含）。"""
+        out_budget = self.output_budget * self.scale
+        in_budget = self.input_budget * self.scale
+        used_in = used_out = 0
+        end = start
+        while end < len(items) and end - start < self.max_items:
+            cost_in, cost_out = self.est_input(items[end]), self.est_output(items[end])
+            if end > start and (used_in + cost_in > in_budget or used_out + cost_out > out_budget):
+                break
+            used_in += cost_in
+            used_out += cost_out
+            end += 1
+        return end
+
+    def split(self, items: Sequence[T], max_batches: int | None = None) -> list[list[T]]:
+        """按当前预算把 items 依次切成若干批；给出 max_batches 时最多切这么多批（其余留待下一轮）。"""
+        batches = []
+        start = 0
+        while start < len(items) and (max_batches is None or len(batches) < max_batches):
+            end = self.take(items, start)
+            batches.append(list(items[start:end]))
+            start = end
+        return batches
+
+    def record(self, n: int, ok: int, truncated: bool = False):
+        if self.metrics:
+            self.metrics.record_batch(n, ok, truncated)
+        if truncated or ok < n * (1 - FAIL_TOLERANCE):
+            self._clean_streak = 0
+            if self.scale > MIN_SCALE:
+                self.scale = max(MIN_SCALE, self.scale * SHRINK)
+                print(f"  [BATCH] {'输出被截断' if truncated else f'{n} 题仅取回 {ok} 题'}，批大小预算缩小到 {self.scale:.0%}")
+        elif ok >= n:
+            self._clean_streak += 1
+            if self._clean_streak >= GROW_AFTER and self.scale < MAX_SCALE:
+                self._clean_streak = 0
+                self.scale = min(MAX_SCALE, self.scale * GROW)
+
+
+def add_batch_args(parser):
+    """为批量脚本加上批大小预算参数。"""
+    parser.add_argument(
+        "--batch-tokens",
+        type=int,
+        default=DEFAULT_OUTPUT_TOKEN_BUDGET,
+        help=f"每批请求的输出 token 预算（默认 {DEFAULT_OUTPUT_TOKEN_BUDGET}），按题目长短自动决定每批题数",
+    )
+
+
+def record_poison(log_path: Path, stage: str, item_id, reason: str = "batch_rejected"):
+    """把被二分隔离出的题号追加到 poison 日志，便于事后排查。"""
+    try:
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"stage": stage, "id": item_id, "reason": reason, "time": time.strftime("%Y-%m-%d %H:%M:%S")}, ensure_ascii=False) + "\n")
+    except Exception:
+        pass
+
+
+def load_poison_ids(log_path: Path, stage: str | None = None) -> list:
+    """读取 poison 日志中的题号（去重、保持首次出现顺序）。"""
+    if not log_path.exists():
+        return []
+    ids = []
+    for line in log_path.read_text(encoding="utf-8").splitlines():
+        try:
+            rec = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if stage is None or rec.get("stage") == stage:
+            ids.append(rec.get("id"))
+    return list(dict.fromkeys(ids))
+
+
+async def bisect_batch(
+    items: list[T],
+    run_batch: Callable[[list[T]], Awaitable[list[R | None] | None]],
+    run_single: Callable[[T], Awaitable[R]],
+    on_poison: Callable[[T], None],
+    on_failed: Callable[[T], R],
+) -> list[R]:
+    """
+    run_batch(items) 发一次批量请求，返回与 items 等长、同序的结果；响应中取不回的题为 None，请求本身失败返回 None。
+    部分缺失时只把缺失的题作为新的一批重新请求；整批都取不回时对半拆分并发递归；
+    拆到单题仍失败则 on_poison(item) 记录，并用 run_single(item) 单题 prompt 兜底。
+    请求失败时客户端已按超时与退避重试过，再拆批只会成倍增加请求，这批题直接返回 on_failed(item)。
+    """
+    results = await run_batch(items)
+    if results is None:
+        return [on_failed(item) for item in items]
+    missing = [i for i, r in enumerate(results) if r is None]
+    if not missing:
+        return results
+    if len(missing) < len(items):
+        retried = await bisect_batch([items[i] for i in missing], run_batch, run_single, on_poison, on_failed)
+        for i, r in zip(missing, retried):
+            results[i] = r
+        return results
+    if len(items) == 1:
+        on_poison(items[0])
+        return [await run_single(items[0])]
+    mid = len(items) // 2
+    left, right = await asyncio.gather(
+        bisect_batch(items[:mid], run_batch, run_single, on_poison, on_failed),
+        bisect_batch(items[mid:], run_batch, run_single, on_poison, on_failed),
+    )
+    return left + right
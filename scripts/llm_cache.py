@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+LLM 响应的本地持久缓存（SQLite），供 llm_client.py 使用。
+
+- 键为 sha256(模型名 + prompt 全文)，prompt 不变则直接复用上次的响应（各脚本都不传生成参数，用的是模型默认值）；
+- 只缓存调用方校验通过（可解析）的响应，格式异常的响应下次仍会重新请求；
+- 记录命中/未命中次数；总大小超过上限时按最近使用时间淘汰（LRU），一次删到上限的 EVICT_TO；
+- 总大小在内存里累加，只在超限时才对全表求和；命中时的使用时间先记在内存，随下一次写入或每 TOUCH_FLUSH_EVERY 次命中一起提交。
+
+脚本参数（见 llm_client.add_llm_args）:
+  --no-cache        不读也不写缓存
+  --refresh         不读缓存，但用新响应覆盖缓存
+  --cache-max-mb N  缓存大小上限（默认 200 MB）
+"""
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_CACHE_PATH = REPO_ROOT / "public" / "data" / ".llm_cache.sqlite"
+DEFAULT_MAX_MB = 200
+# 超过上限时删到上限的这个比例，避免缓存满了以后每次写入都要淘汰
+EVICT_TO = 0.9
+TOUCH_FLUSH_EVERY = 100
+
+
+def cache_key(model: str, prompt: str) -> str:
+    # 早期的键里带一个恒为空的 params，保留该字段使已有缓存与 cassette 仍能命中
+    payload = json.dumps({"model": model, "prompt": prompt, "params": {}}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, path: Path = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, model TEXT, response TEXT, size INTEGER, created REAL, last_used REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON responses(last_used)")
+        self._db.commit()
+        # 总大小：打开时求一次，之后按本进程的写入累加（其它进程的写入在下次超限时重新求和）
+        self._total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        # 命中但尚未写回的 key -> 使用时间
+        self._touched: dict[str, float] = {}
+
+    def get(self, key: str) -> str | None:
+        row = self._db.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touched[key] = time.time()
+        if len(self._touched) >= TOUCH_FLUSH_EVERY:
+            self._flush_touched()
+            self._db.commit()
+        return row[0]
+
+    def _flush_touched(self):
+        if self._touched:
+            self._db.executemany("UPDATE responses SET last_used = ? WHERE key = ?", [(t, k) for k, t in self._touched.items()])
+            self._touched.clear()
+
+    def put(self, key: str, model: str, response: str):
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        old = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        self._total += size - (old[0] if old else 0)
+        self._flush_touched()
+        self._db.execute(
+            "INSERT OR REPLACE INTO responses (key, model, response, size, created, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, model, response, size, now, now),
+        )
+        self._evict()
+        self._db.commit()
+
+    def _evict(self):
+        """总大小超过上限时，从最久未使用的条目开始删除，删到上限的 EVICT_TO。"""
+        if self._total <= self.max_bytes:
+            return
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        target = self.max_bytes * EVICT_TO if total > self.max_bytes else total
+        to_delete = []
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY last_used ASC"):
+            if total <= target:
+                break
+            to_delete.append((key,))
+            total -= size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", to_delete)
+        self._total = total
+
+    def summary(self) -> str:
+        count, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        lookups = self.hits + self.misses
+        rate = f"{self.hits / lookups:.0%}" if lookups else "-"
+        return f"缓存: 命中 {self.hits}，未命中 {self.misses}（命中率 {rate}），共 {count} 条 / {total / 1024 / 1024:.1f} MB"
+
+    def close(self):
+        self._flush_touched()
+        self._db.commit()
+        self._db.close()
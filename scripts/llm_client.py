@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+所有调用 Gemini 的脚本共用的异步客户端。
+
+- 并发上限内同时保持多个请求在途（--concurrency），不再每题 sleep 串行等待；
+- 每个请求单独超时（--timeout），超时视为可重试；
+- 429/限流按 retry_wait 退避，只阻塞当前请求，其它请求照常进行；
+- map_ordered 按输入顺序收集结果，便于按题号写回；
+- 相同（模型、prompt、参数）的请求命中本地缓存（llm_cache.py）时不再调用 API；
+- --provider standin/replay 换成离线替身（llm_standin.py），无需 API key 即可跑通脚本或做基准测试；
+  --record-cassette 把本次所有响应录制下来，供 replay 回放；
+- 每次运行的延迟、token、429、解析失败、批大小与 sleep/在途时间记入 llm_metrics.LLMMetrics，结束时写成 JSON；
+- 真实 API 的请求先经过跨进程共享的限流器（llm_governor.py）：共用令牌桶与 429 冷却，按每日配额在用尽前干净退出。
+
+用法（脚本内）:
+  from llm_client import add_llm_args, create_client, map_ordered
+
+  client = create_client(args)
+  text = await client.generate(prompt, label="题 12", validate=lambda t: parse(t) is not None)
+  results = await map_ordered(lambda item: handle(client, item), items)
+  client.close()  # 打印缓存命中与运行指标，写出指标 JSON
+
+  run_llm(_run(args))  # 代替 asyncio.run：今日配额用尽时打印提示并以退出码 3 结束
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Sequence, TypeVar
+
+from llm_batch import estimate_tokens
+from llm_cache import DEFAULT_MAX_MB, LLMCache, cache_key
+from llm_governor import DEFAULT_RPM, DEFAULT_TPM, QuotaExhausted, RateGovernor, retry_hint_seconds
+from llm_metrics import DEFAULT_METRICS_DIR, LLMMetrics
+from llm_standin import DEFAULT_LATENCY_MS, DEFAULT_PER_TOKEN_MS, Cassette, ReplayProvider, StandinProvider
+
+DEFAULT_MODEL = "gemini-2.0-flash-lite"
+DEFAULT_CONCURRENCY = 4
+DEFAULT_TIMEOUT_SEC = 120.0
+# 429/限流时第 1~4 次重试前等待秒数
+RETRY_WAIT_SEC = [60, 120, 180, 300]
+PROVIDERS = ("gemini", "standin", "replay")
+SDK_NAMES = {"new": "google-genai", "old": "google-generativeai", "standin": "离线替身", "replay": "cassette 回放"}
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def is_rate_limit_error(e: Exception) -> bool:
+    err_str = str(e)
+    return "429" in err_str or "Resource exhausted" in err_str or "quota" in err_str.lower() or "rate" in err_str.lower()
+
+
+def response_text(response) -> str:
+    """从两种 SDK 的 response 中取出文本。"""
+    if hasattr(response, "text"):
+        return response.text or ""
+    return response.candidates[0].content.parts[0].text if response.candidates else ""
+
+
+def response_usage(response) -> tuple[int, int] | None:
+    """两种 SDK 的 response.usage_metadata 中的 (输入 token, 输出 token)；没有时返回 None。"""
+    usage = getattr(response, "usage_metadata", None)
+    prompt = getattr(usage, "prompt_token_count", None)
+    output = getattr(usage, "candidates_token_count", None)
+    if isinstance(prompt, int) and isinstance(output, int):
+        return prompt, output
+    return None
+
+
+class LLMClient:
+    """在并发上限内发请求；generate 成功返回文本，最终失败返回 None（已打印原因）。
+
+    sdk 为 "new"/"old" 时 backend 是 Gemini SDK 对象，其余（"standin"/"replay"）时 backend 提供 async generate(model, prompt)。
+    cache 为 None 时不使用缓存；refresh=True 时跳过读缓存，但仍写入新响应；recorder 不为 None 时把每个响应录进 cassette。
+    metrics_path 不为空时 close() 把运行指标写成 JSON；live_interval > 0 时运行中每隔该秒数打印一行指标快照。
+    governor 不为 None 时每个请求先向共享限流器取令牌，429 时由它决定（并让其它进程一起）等待多久。
+    """
+
+    def __init__(
+        self,
+        backend,
+        sdk: str,
+        model: str = DEFAULT_MODEL,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        timeout: float = DEFAULT_TIMEOUT_SEC,
+        retry_wait: Sequence[float] = RETRY_WAIT_SEC,
+        cache: LLMCache | None = None,
+        refresh: bool = False,
+        recorder: Cassette | None = None,
+        metrics: LLMMetrics | None = None,
+        metrics_path: Path | None = None,
+        live_interval: float = 0,
+        governor: RateGovernor | None = None,
+    ):
+        self.backend = backend
+        self.sdk = sdk
+        self.model = model
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.retry_wait = list(retry_wait)
+        self.cache = cache
+        self.refresh = refresh
+        self.recorder = recorder
+        self.metrics = metrics or LLMMetrics("llm", model, sdk)
+        self.metrics_path = metrics_path
+        self.live_interval = live_interval
+        self._live_task: asyncio.Task | None = None
+        self.governor = governor
+        self._sem = asyncio.Semaphore(self.concurrency)
+
+    async def _call(self, prompt: str) -> tuple[str, tuple[int, int] | None]:
+        """返回 (文本, (输入 token, 输出 token) 或 None)。"""
+        if self.sdk == "new":
+            response = await self.backend.aio.models.generate_content(model=self.model, contents=prompt)
+        elif self.sdk == "old":
+            response = await self.backend.generate_content_async(prompt)
+        else:
+            return await self.backend.generate(self.model, prompt), None
+        return response_text(response), response_usage(response)
+
+    def plan(self, n_requests: int):
+        """按每日配额检查本次预计的请求数，不够时提前说明会在哪里停下。"""
+        if not self.governor:
+            return
+        remaining = self.governor.remaining_today()
+        if remaining is None:
+            return
+        usable = max(0, remaining - self.governor.quota_reserve)
+        if n_requests > usable:
+            print(f"  [QUOTA] 今日剩余可用 {usable} 次请求，本次预计约 {n_requests} 次：将在配额用尽前停止，已完成部分写入断点，明日再 --resume")
+        else:
+            print(f"  [QUOTA] 本次预计约 {n_requests} 次请求，今日剩余可用 {usable} 次")
+
+    async def _live_report(self):
+        while True:
+            await asyncio.sleep(self.live_interval)
+            print(self.metrics.live_line())
+
+    async def generate(self, prompt: str, label: str = "", validate: Callable[[str], bool] | None = None) -> str | None:
+        """validate(text) 为真时才写入缓存；未提供则所有成功响应都缓存。"""
+        if self.live_interval > 0 and self._live_task is None:
+            self._live_task = asyncio.ensure_future(self._live_report())
+        key = cache_key(self.model, prompt) if self.cache else None
+        text = self.cache.get(key) if key and not self.refresh else None
+        if text is not None:
+            self.metrics.record_cache_hit()
+        else:
+            text = await self._generate_uncached(prompt, label)
+            valid = text is not None and (validate is None or validate(text))
+            if text is not None and validate is not None:
+                self.metrics.record_parse(valid)
+            if key and valid:
+                self.cache.put(key, self.model, text)
+        if self.recorder and text is not None:
+            self.recorder.record(self.model, prompt, text)
+        return text
+
+    async def _generate_uncached(self, prompt: str, label: str) -> str | None:
+        retry_max = len(self.retry_wait)
+        for attempt in range(retry_max + 1):
+            queued = time.monotonic()
+            try:
+                async with self._sem:
+                    throttled = await self.governor.acquire(estimate_tokens(prompt)) if self.governor else 0.0
+                    self.metrics.record_throttle(throttled)
+                    started = time.monotonic()
+                    self.metrics.request_started(started - queued - throttled)
+                    try:
+                        text, usage = await asyncio.wait_for(self._call(prompt), self.timeout)
+                    except BaseException:
+                        self.metrics.request_finished(time.monotonic() - started, ok=False)
+                        raise
+                    prompt_tokens, response_tokens = usage or (estimate_tokens(prompt), estimate_tokens(text))
+                    self.metrics.request_finished(time.monotonic() - started, prompt_tokens, response_tokens)
+                if self.governor:
+                    self.governor.on_success()
+                return text
+            except QuotaExhausted:
+                raise
+            except asyncio.TimeoutError:
+                self.metrics.record_timeout()
+                if attempt < retry_max:
+                    print(f"  [TIMEOUT] {label} {self.timeout:g} 秒未返回，重试（第 {attempt + 1}/{retry_max} 次）")
+                    continue
+                print(f"  [ERROR] {label}: 请求超时")
+                return None
+            except Exception as e:
+                if is_rate_limit_error(e) and attempt < retry_max:
+                    hint = retry_hint_seconds(e)
+                    if self.governor:
+                        wait = self.governor.on_rate_limit(hint, self.retry_wait[attempt])
+                    else:
+                        wait = hint if hint is not None else self.retry_wait[attempt]
+                    self.metrics.record_rate_limit(wait)
+                    print(f"  [429/限流] {label}，{wait:.0f} 秒后重试（第 {attempt + 1}/{retry_max} 次）")
+                    await asyncio.sleep(wait)
+                    continue
+                self.metrics.record_error()
+                print(f"  [ERROR] {label}: {e}")
+                return None
+        return None
+
+    def close(self):
+        if self._live_task:
+            self._live_task.cancel()
+            self._live_task = None
+        if self.cache:
+            print(self.cache.summary())
+            self.cache.close()
+            self.cache = None
+        if self.metrics_path:
+            self.metrics.write_json(self.metrics_path)
+            print(self.metrics.live_line().replace("[METRICS]", "[METRICS] 本次运行", 1) + f"（详见 {self.metrics_path}）")
+            self.metrics_path = None
+
+
+def add_llm_args(parser: argparse.ArgumentParser):
+    """为脚本加上并发、超时与缓存参数。"""
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help=f"同时在途的 API 请求数（默认 {DEFAULT_CONCURRENCY}）")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT_SEC, help=f"单个请求超时秒数（默认 {DEFAULT_TIMEOUT_SEC:g}）")
+    parser.add_argument("--no-cache", action="store_true", help="不读写本地响应缓存")
+    parser.add_argument("--refresh", action="store_true", help="不读缓存、重新请求，并用新响应覆盖缓存")
+    parser.add_argument("--cache-max-mb", type=int, default=DEFAULT_MAX_MB, help=f"本地响应缓存大小上限 MB（默认 {DEFAULT_MAX_MB}），超出按 LRU 淘汰")
+    parser.add_argument("--retry-wait-scale", type=float, default=1.0, help="429 退避等待时间的倍数（基准测试时可设 0.01）")
+    parser.add_argument("--metrics-json", type=str, default="", help="运行指标 JSON 的写入路径（默认 public/data/.llm_metrics/<脚本名>.json）")
+    parser.add_argument("--metrics-live", type=float, default=0, help="运行中每隔 N 秒打印一行指标快照（0=不打印）")
+    limits = parser.add_argument_group("跨进程限流与每日配额（见 llm_governor.py）")
+    limits.add_argument("--governor", choices=("auto", "on", "off"), default="auto", help="共享限流器：auto=仅真实 API 时启用")
+    limits.add_argument("--rpm", type=float, default=DEFAULT_RPM, help=f"每分钟请求数上限（默认 {DEFAULT_RPM}），遇 429 自动下调")
+    limits.add_argument("--tpm", type=float, default=DEFAULT_TPM, help=f"每分钟输入 token 上限（默认 {DEFAULT_TPM}）")
+    limits.add_argument("--daily-quota", type=int, default=0, help="每日请求配额（0=不限），跨进程累计")
+    limits.add_argument("--quota-reserve", type=int, default=0, help="配额中保留给其它任务的请求数，到达即停止")
+    group = parser.add_argument_group("provider（离线替身见 llm_standin.py）")
+    group.add_argument("--provider", choices=PROVIDERS, default="gemini", help="gemini=真实 API；standin=合成响应；replay=回放 cassette")
+    group.add_argument("--cassette", type=str, default="", help="--provider replay 时读取的 cassette 路径")
+    group.add_argument("--record-cassette", type=str, default="", help="把本次所有响应追加录制到该 cassette")
+    group.add_argument("--standin-latency-ms", type=float, default=DEFAULT_LATENCY_MS, help=f"standin 每个请求的基础延迟（默认 {DEFAULT_LATENCY_MS:g} ms）")
+    group.add_argument("--standin-per-token-ms", type=float, default=DEFAULT_PER_TOKEN_MS, help=f"standin 每个输出 token 追加的延迟（默认 {DEFAULT_PER_TOKEN_MS:g} ms）")
+    group.add_argument("--standin-429-rate", type=float, default=0.0, help="standin 返回 429 的比例（0~1）")
+    group.add_argument("--standin-malformed-rate", type=float, default=0.0, help="standin 返回截断/非 JSON 响应的比例（0~1）")
+    group.add_argument("--standin-seed", type=int, default=None, help="standin 随机种子，固定后多次运行结果一致")
+
+
+def _create_backend(args: argparse.Namespace, model: str):
+    """按 --provider 返回 (backend, sdk)。"""
+    provider = getattr(args, "provider", "gemini")
+    if provider == "standin":
+        return StandinProvider(
+            latency_ms=args.standin_latency_ms,
+            per_token_ms=args.standin_per_token_ms,
+            rate_429=args.standin_429_rate,
+            malformed_rate=args.standin_malformed_rate,
+            seed=args.standin_seed,
+        ), "standin"
+    if provider == "replay":
+        cassette = Cassette(Path(args.cassette)) if args.cassette else Cassette()
+        if not cassette.path.exists():
+            print(f"cassette 不存在: {cassette.path}（先用 --record-cassette 录制）")
+            sys.exit(1)
+        return ReplayProvider(cassette), "replay"
+
+    api_key = (os.environ.get("GEMINI_API_KEY") or "").strip()
+    if not api_key:
+        print("请设置环境变量 GEMINI_API_KEY")
+        sys.exit(1)
+    try:
+        from google import genai as genai_new
+
+        backend, sdk = genai_new.Client(api_key=api_key), "new"
+    except ImportError:
+        try:
+            import google.generativeai as genai_old
+        except ImportError:
+            print("请先安装: pip install google-genai  或  pip install google-generativeai")
+            sys.exit(1)
+        genai_old.configure(api_key=api_key)
+        backend, sdk = genai_old.GenerativeModel(model), "old"
+    return backend, sdk
+
+
+def create_client(
+    args: argparse.Namespace, retry_wait: Sequence[float] = RETRY_WAIT_SEC, model: str = DEFAULT_MODEL, stage: str | None = None
+) -> LLMClient:
+    """按 --provider 创建客户端。gemini 时读取 GEMINI_API_KEY，优先使用新版 google-genai，若无则用旧版 google-generativeai。
+
+    stage 为指标中的阶段名（默认脚本名）；一个进程内建多个客户端时（如 run_pipeline.py）各自给出，--metrics-json 的文件名按阶段名加后缀。
+    """
+    backend, sdk = _create_backend(args, model)
+    cache = None
+    # 离线替身不读写响应缓存，否则第二次运行全部命中缓存，测不出替身的延迟与错误
+    if sdk in ("new", "old") and not getattr(args, "no_cache", False):
+        cache = LLMCache(max_bytes=getattr(args, "cache_max_mb", DEFAULT_MAX_MB) * 1024 * 1024)
+    record_path = getattr(args, "record_cassette", "")
+    scale = getattr(args, "retry_wait_scale", 1.0)
+    metrics_path = getattr(args, "metrics_json", "")
+    if stage is None:
+        stage = Path(sys.argv[0]).stem or "llm"
+    elif metrics_path:
+        metrics_path = Path(metrics_path).with_name(f"{Path(metrics_path).stem}.{stage}.json")
+    provider = getattr(args, "provider", "gemini")
+    governor_mode = getattr(args, "governor", "auto")
+    governor = None
+    if governor_mode == "on" or (governor_mode == "auto" and sdk in ("new", "old")):
+        governor = RateGovernor(
+            provider,
+            model,
+            rpm=getattr(args, "rpm", DEFAULT_RPM),
+            tpm=getattr(args, "tpm", DEFAULT_TPM),
+            daily_quota=getattr(args, "daily_quota", 0),
+            quota_reserve=getattr(args, "quota_reserve", 0),
+        )
+        print(governor.describe())
+    metrics_path = metrics_path or DEFAULT_METRICS_DIR / f"{stage}.json"
+    return LLMClient(
+        backend,
+        sdk,
+        model=model,
+        concurrency=getattr(args, "concurrency", DEFAULT_CONCURRENCY),
+        timeout=getattr(args, "timeout", DEFAULT_TIMEOUT_SEC),
+        retry_wait=[w * scale for w in retry_wait],
+        cache=cache,
+        refresh=getattr(args, "refresh", False),
+        recorder=Cassette(Path(record_path)) if record_path else None,
+        metrics=LLMMetrics(stage, model, provider),
+        metrics_path=Path(metrics_path),
+        live_interval=getattr(args, "metrics_live", 0),
+        governor=governor,
+    )
+
+
+def run_llm(coro):
+    """代替 asyncio.run：今日配额用尽（QuotaExhausted）时打印提示并以退出码 3 结束；已完成的批次由各脚本的断点保存。"""
+    try:
+        return asyncio.run(coro)
+    except QuotaExhausted as e:
+        print(f"[QUOTA] {e}。已完成部分已保存，配额恢复后用 --resume（或对应的补漏参数）继续。")
+        sys.exit(3)
+
+
+async def map_ordered(
+    func: Callable[[T], Awaitable[R]],
+    items: Sequence[T],
+    on_result: Callable[[int, R], None] | None = None,
+) -> list[R]:
+    """并发执行 func(item)，结果按 items 顺序返回；on_result(i, result) 在每项完成时回调（完成顺序）。"""
+    results: list = [None] * len(items)
+
+    async def run(i: int, item: T):
+        results[i] = await func(item)
+        if on_result:
+            on_result(i, results[i])
+
+    await asyncio.gather(*(run(i, item) for i, item in enumerate(items)))
+    return results
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+跨进程共享的限流器，供 llm_client.py 使用：同时运行多个调用 Gemini 的脚本时，共用一个令牌桶与冷却时间，
+不再各自按固定的 60→120→180→300 秒盲目退避。
+
+- 状态存于 public/data/.llm_governor/<provider>-<模型>.json，读写时用 fcntl.flock 加锁（无 fcntl 的平台退化为进程内限流）；
+- 令牌桶：每分钟请求数（RPM）与每分钟 token 数（TPM）两个桶，发请求前先取令牌，不够就等；
+- 学习上限：遇到 429 时 RPM ×0.75（不低于 MIN_RPM），并让所有进程一起冷却；连续成功一分钟的量后 RPM +1，逐步试探回去；
+- 退避：优先采用 429 错误里给出的重试时间（retry in Ns / retryDelay），否则按 retry_wait 加随机抖动；
+- 每日配额：--daily-quota 给出每日请求上限（按太平洋时间零点重置，与 Gemini 一致）；剩余量低于 --quota-reserve 时
+  抛出 QuotaExhausted，脚本在已保存断点的位置干净退出，而不是睡 5 分钟再撞一次。
+
+用法（脚本内，由 llm_client.create_client 自动创建）:
+  governor = RateGovernor("gemini", "gemini-2.0-flash-lite", rpm=30, daily_quota=1500)
+  await governor.acquire(prompt_tokens)
+  governor.on_success()  /  wait = governor.on_rate_limit(hint_sec, fallback_sec)
+"""
+import asyncio
+import json
+import random
+import re
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows：只在进程内限流
+    fcntl = None
+
+try:
+    from zoneinfo import ZoneInfo
+
+    QUOTA_TZ = ZoneInfo("America/Los_Angeles")
+except Exception:
+    QUOTA_TZ = None
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_STATE_DIR = REPO_ROOT / "public" / "data" / ".llm_governor"
+DEFAULT_RPM = 30
+DEFAULT_TPM = 1_000_000
+MIN_RPM = 2
+# 429 时 RPM 乘以该系数；每成功 rpm 次（约一分钟的量）RPM +1
+DECREASE = 0.75
+# 令牌桶容量 = RPM × BURST_FRACTION（至少 1），避免冷却结束后所有进程同时涌入
+BURST_FRACTION = 0.25
+JITTER = (0.5, 1.0)
+
+_RETRY_HINT_RES = (
+    re.compile(r"retry in ([\d.]+)\s*s", re.I),
+    re.compile(r"retryDelay['\"]?\s*[:=]\s*['\"]?([\d.]+)s", re.I),
+    re.compile(r"retry[- ]after['\"]?\s*[:=]\s*['\"]?([\d.]+)", re.I),
+)
+
+
+class QuotaExhausted(Exception):
+    """今日请求配额即将用尽（已到保留量），脚本应保存进度后退出。"""
+
+
+def retry_hint_seconds(e: Exception) -> float | None:
+    """从 429 错误信息中解析服务端建议的重试等待秒数。"""
+    text = str(e)
+    for pattern in _RETRY_HINT_RES:
+        m = pattern.search(text)
+        if m:
+            try:
+                return float(m.group(1))
+            except ValueError:
+                continue
+    return None
+
+
+def quota_day(now: float) -> str:
+    if QUOTA_TZ is not None:
+        return datetime.fromtimestamp(now, QUOTA_TZ).strftime("%Y-%m-%d")
+    return time.strftime("%Y-%m-%d", time.gmtime(now - 8 * 3600))
+
+
+class RateGovernor:
+    def __init__(
+        self,
+        provider: str,
+        model: str,
+        rpm: float = DEFAULT_RPM,
+        tpm: float = DEFAULT_TPM,
+        daily_quota: int = 0,
+        quota_reserve: int = 0,
+        state_dir: Path = DEFAULT_STATE_DIR,
+    ):
+        safe = re.sub(r"[^A-Za-z0-9_.-]+", "_", f"{provider}-{model}")
+        self.path = Path(state_dir) / f"{safe}.json"
+        self.lock_path = self.path.with_suffix(".lock")
+        self.max_rpm = float(rpm)
+        self.tpm = float(tpm)
+        self.daily_quota = daily_quota
+        self.quota_reserve = quota_reserve
+        self._local_state: dict | None = None
+
+    # ---- 共享状态 ----
+    @contextmanager
+    def _locked_state(self):
+        """加锁读出状态，with 块内修改后写回。"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        lock = open(self.lock_path, "a+") if fcntl else None
+        try:
+            if lock:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+                try:
+                    state = json.loads(self.path.read_text(encoding="utf-8"))
+                except (OSError, json.JSONDecodeError):
+                    state = {}
+            else:
+                state = self._local_state or {}
+            self._normalize(state)
+            yield state
+            if lock:
+                tmp = self.path.with_suffix(".tmp")
+                tmp.write_text(json.dumps(state, ensure_ascii=False), encoding="utf-8")
+                tmp.replace(self.path)
+            else:
+                self._local_state = state
+        finally:
+            if lock:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+                lock.close()
+
+    def _normalize(self, state: dict):
+        now = time.time()
+        state.setdefault("rpm", self.max_rpm)
+        state["rpm"] = min(float(state["rpm"]), self.max_rpm)
+        state.setdefault("requests", self._capacity(state["rpm"]))
+        state.setdefault("tokens", self.tpm)
+        state.setdefault("updated", now)
+        state.setdefault("cooldown_until", 0.0)
+        state.setdefault("ok_streak", 0)
+        state.setdefault("rate_limited", 0)
+        day = quota_day(now)
+        if state.get("day") != day:
+            state["day"] = day
+            state["used_today"] = 0
+        # 按流逝时间补充两个桶
+        elapsed = max(0.0, now - state["updated"])
+        state["requests"] = min(self._capacity(state["rpm"]), state["requests"] + elapsed * state["rpm"] / 60)
+        state["tokens"] = min(self.tpm, state["tokens"] + elapsed * self.tpm / 60)
+        state["updated"] = now
+
+    @staticmethod
+    def _capacity(rpm: float) -> float:
+        return max(1.0, rpm * BURST_FRACTION)
+
+    # ---- 供 LLMClient 调用 ----
+    def remaining_today(self) -> int | None:
+        if self.daily_quota <= 0:
+            return None
+        with self._locked_state() as state:
+            return max(0, self.daily_quota - state["used_today"])
+
+    async def acquire(self, est_tokens: int = 0) -> float:
+        """取一个请求令牌（及 est_tokens 个 token 令牌），不够时等待；返回总等待秒数。"""
+        waited = 0.0
+        est_tokens = min(est_tokens, self.tpm)
+        while True:
+            with self._locked_state() as state:
+                if self.daily_quota > 0 and state["used_today"] >= self.daily_quota - self.quota_reserve:
+                    raise QuotaExhausted(
+                        f"今日已用 {state['used_today']}/{self.daily_quota} 次请求（保留 {self.quota_reserve} 次），停止发送新请求"
+                    )
+                now = time.time()
+                if state["cooldown_until"] > now:
+                    wait = state["cooldown_until"] - now
+                elif state["requests"] >= 1 and state["tokens"] >= est_tokens:
+                    state["requests"] -= 1
+                    state["tokens"] -= est_tokens
+                    state["used_today"] += 1
+                    return waited
+                else:
+                    need_req = max(0.0, 1 - state["requests"]) * 60 / state["rpm"]
+                    need_tok = max(0.0, est_tokens - state["tokens"]) * 60 / self.tpm
+                    wait = max(need_req, need_tok)
+            wait *= random.uniform(1.0, 1.2)
+            await asyncio.sleep(wait)
+            waited += wait
+
+    def on_success(self):
+        with self._locked_state() as state:
+            state["ok_streak"] += 1
+            if state["ok_streak"] >= state["rpm"] and state["rpm"] < self.max_rpm:
+                state["rpm"] = min(self.max_rpm, state["rpm"] + 1)
+                state["ok_streak"] = 0
+
+    def on_rate_limit(self, hint_sec: float | None, fallback_sec: float) -> float:
+        """记录一次 429：降低 RPM、清空令牌，并设置所有进程共享的冷却时间。返回本请求应等待的秒数。"""
+        with self._locked_state() as state:
+            now = time.time()
+            state["rate_limited"] += 1
+            state["ok_streak"] = 0
+            state["rpm"] = max(MIN_RPM, state["rpm"] * DECREASE)
+            state["requests"] = 0.0
+            wait = hint_sec if hint_sec is not None else fallback_sec * random.uniform(*JITTER)
+            # 已有更长的冷却（其它进程刚撞到 429）时沿用它，不叠加
+            state["cooldown_until"] = max(state["cooldown_until"], now + wait)
+            return state["cooldown_until"] - now + random.uniform(0, 1)
+
+    def describe(self) -> str:
+        with self._locked_state() as state:
+            rpm, used = state["rpm"], state["used_today"]
+        quota = f"，今日已用 {used}/{self.daily_quota}" if self.daily_quota > 0 else ""
+        return f"限流: 共享令牌桶 {rpm:.0f} RPM（上限 {self.max_rpm:g}）{quota}"
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+LLM 调用的运行指标，供 llm_client.py 使用：每个脚本（阶段）一份，结束时写成 JSON，可选运行中定时打印。
+
+记录内容：
+- 请求：次数、延迟直方图与 p50/p90/p99、超时/错误次数、排队等待（并发上限）时间；
+- token：每个请求的输入/输出 token（SDK 返回 usage 时用真实值，否则按 llm_batch.estimate_tokens 估算）；
+- 结果：缓存命中、响应校验（可解析）成功/失败、批大小分布与取回率、截断次数；
+- 时间去向：墙钟时间、至少一个请求在途的时间、429 退避 sleep 的时间、等限流令牌的时间、空闲时间。
+  慢的原因一眼可见：sleep 多是配额问题，在途时间长而请求少是模型延迟，空闲多是脚本自身的串行/等待。
+
+脚本参数（见 llm_client.add_llm_args）:
+  --metrics-json PATH   结束时写入的 JSON 路径（默认 public/data/.llm_metrics/<脚本名>.json）
+  --metrics-live SEC    运行中每 SEC 秒打印一行 [METRICS] 快照
+"""
+import bisect
+import json
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_METRICS_DIR = REPO_ROOT / "public" / "data" / ".llm_metrics"
+# 延迟直方图上界（毫秒），最后一档为 +inf
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2000, 5000, 10000, 30000, 60000)
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 20, 40)
+
+
+def _histogram(values: list[float], bounds: tuple) -> dict[str, int]:
+    counts = [0] * (len(bounds) + 1)
+    for v in values:
+        counts[bisect.bisect_left(bounds, v)] += 1
+    labels = [f"<={b:g}" for b in bounds] + [f">{bounds[-1]:g}"]
+    return dict(zip(labels, counts))
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class LLMMetrics:
+    def __init__(self, stage: str, model: str = "", provider: str = ""):
+        self.stage = stage
+        self.model = model
+        self.provider = provider
+        self.started_at = time.time()
+        self._t0 = time.monotonic()
+        self.latencies_ms: list[float] = []
+        self.prompt_tokens = 0
+        self.response_tokens = 0
+        self.queue_wait_sec = 0.0
+        self.throttle_sec = 0.0
+        self.rate_limited = 0
+        self.backoff_sleep_sec = 0.0
+        self.timeouts = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.parse_ok = 0
+        self.parse_failed = 0
+        self.batch_sizes: list[int] = []
+        self.batch_items = 0
+        self.batch_items_ok = 0
+        self.batch_truncated = 0
+        self._in_flight = 0
+        self._active_since = 0.0
+        self.active_sec = 0.0
+
+    # ---- 由 LLMClient 调用 ----
+    def request_started(self, queue_wait_sec: float):
+        self.queue_wait_sec += queue_wait_sec
+        if self._in_flight == 0:
+            self._active_since = time.monotonic()
+        self._in_flight += 1
+
+    def request_finished(self, latency_sec: float, prompt_tokens: int = 0, response_tokens: int = 0, ok: bool = True):
+        self._in_flight -= 1
+        if self._in_flight == 0:
+            self.active_sec += time.monotonic() - self._active_since
+        if ok:
+            self.latencies_ms.append(latency_sec * 1000)
+            self.prompt_tokens += prompt_tokens
+            self.response_tokens += response_tokens
+
+    def record_throttle(self, wait_sec: float):
+        """在共享限流器（llm_governor）前等令牌的时间。"""
+        self.throttle_sec += wait_sec
+
+    def record_rate_limit(self, wait_sec: float):
+        self.rate_limited += 1
+        self.backoff_sleep_sec += wait_sec
+
+    def record_timeout(self):
+        self.timeouts += 1
+
+    def record_error(self):
+        self.errors += 1
+
+    def record_cache_hit(self):
+        self.cache_hits += 1
+
+    def record_parse(self, ok: bool):
+        if ok:
+            self.parse_ok += 1
+        else:
+            self.parse_failed += 1
+
+    # ---- 由 AdaptiveBatcher 调用 ----
+    def record_batch(self, n: int, ok: int, truncated: bool = False):
+        self.batch_sizes.append(n)
+        self.batch_items += n
+        self.batch_items_ok += ok
+        if truncated:
+            self.batch_truncated += 1
+
+    def snapshot(self) -> dict:
+        wall = time.monotonic() - self._t0
+        active = self.active_sec + (time.monotonic() - self._active_since if self._in_flight else 0.0)
+        lat = sorted(self.latencies_ms)
+        parsed = self.parse_ok + self.parse_failed
+        return {
+            "stage": self.stage,
+            "model": self.model,
+            "provider": self.provider,
+            "started_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started_at)),
+            "requests": {
+                "completed": len(lat),
+                "rate_limited": self.rate_limited,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+                "cache_hits": self.cache_hits,
+                "latency_ms": {
+                    "p50": round(_percentile(lat, 0.5), 1),
+                    "p90": round(_percentile(lat, 0.9), 1),
+                    "p99": round(_percentile(lat, 0.99), 1),
+                    "max": round(lat[-1], 1) if lat else 0.0,
+                    "mean": round(sum(lat) / len(lat), 1) if lat else 0.0,
+                    "histogram": _histogram(lat, LATENCY_BUCKETS_MS),
+                },
+            },
+            "tokens": {
+                "prompt": self.prompt_tokens,
+                "response": self.response_tokens,
+                "per_request_prompt": round(self.prompt_tokens / len(lat), 1) if lat else 0.0,
+                "per_request_response": round(self.response_tokens / len(lat), 1) if lat else 0.0,
+            },
+            "parse": {
+                "ok": self.parse_ok,
+                "failed": self.parse_failed,
+                "failure_rate": round(self.parse_failed / parsed, 4) if parsed else 0.0,
+            },
+            "batches": {
+                "count": len(self.batch_sizes),
+                "items": self.batch_items,
+                "items_ok": self.batch_items_ok,
+                "truncated": self.batch_truncated,
+                "mean_size": round(self.batch_items / len(self.batch_sizes), 2) if self.batch_sizes else 0.0,
+                "size_histogram": _histogram(self.batch_sizes, BATCH_SIZE_BUCKETS),
+            },
+            "time_sec": {
+                "wall": round(wall, 3),
+                "active": round(active, 3),
+                "idle": round(max(0.0, wall - active), 3),
+                "backoff_sleep": round(self.backoff_sleep_sec, 3),
+                "queue_wait": round(self.queue_wait_sec, 3),
+                "throttle": round(self.throttle_sec, 3),
+                "request_total": round(sum(lat) / 1000, 3),
+            },
+        }
+
+    def live_line(self) -> str:
+        s = self.snapshot()
+        r, t = s["requests"], s["time_sec"]
+        return (
+            f"  [METRICS] {s['stage']}: 请求 {r['completed']}（p50 {r['latency_ms']['p50']:.0f} ms），429 {r['rate_limited']}，"
+            f"解析失败 {s['parse']['failed']}，在途 {t['active']:.0f}s / 退避 {t['backoff_sleep']:.0f}s / 墙钟 {t['wall']:.0f}s"
+        )
+
+    def write_json(self, path: Path) -> dict:
+        snap = self.snapshot()
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(snap, ensure_ascii=False, indent=2), encoding="utf-8")
+        return snap
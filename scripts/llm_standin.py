@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+离线替身 provider，供 llm_client.py 使用：无需 GEMINI_API_KEY 与网络即可跑通各 LLM 脚本、做吞吐基准。
+
+- replay：从 cassette（JSONL，每行 {"key", "model", "response"}）按 (模型名, prompt) 回放录制好的响应；
+  用 --record-cassette PATH 跑一次真实 Gemini 即可录制；cassette 中没有的请求按错误处理（不重试）。
+- standin：按 prompt 类型合成「格式合法」的响应（翻译单题/批量、打标单题/批量、百科词条、重写解析、多选答案），
+  可配置延迟（基础 + 每输出 token）、429 比例、格式异常比例（截断或非 JSON），随机数可固定种子。
+
+脚本参数（见 llm_client.add_llm_args）:
+  --provider standin --standin-latency-ms 800 --standin-429-rate 0.05 --standin-malformed-rate 0.02
+  --provider replay --cassette public/data/.llm_cassette.jsonl
+  --retry-wait-scale 0.01   # 429 退避时间按比例缩短，基准测试时不必真等 60 秒
+"""
+import asyncio
+import json
+import random
+import re
+from pathlib import Path
+
+from llm_batch import estimate_tokens
+from llm_cache import cache_key
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_CASSETTE_PATH = REPO_ROOT / "public" / "data" / ".llm_cassette.jsonl"
+DEFAULT_LATENCY_MS = 800.0
+DEFAULT_PER_TOKEN_MS = 2.0
+
+_BLOCK_RE = re.compile(r"--- 题目 \d+ \(id: ([^)]+)\) ---\n(.*?)(?=\n\n|\Z)", re.S)
+_OPTION_RE = re.compile(r"^\s*([A-F])\.\s", re.M)
+
+
+class StandinRateLimit(Exception):
+    """模拟 429；消息含 429 / Resource exhausted，llm_client.is_rate_limit_error 会识别。"""
+
+
+class Cassette:
+    """录制/回放用的响应文件：键为 cache_key(模型名, prompt)，同键以最后一条为准。"""
+
+    def __init__(self, path: Path = DEFAULT_CASSETTE_PATH):
+        self.path = Path(path)
+        self._responses: dict[str, str] | None = None
+
+    def responses(self) -> dict[str, str]:
+        if self._responses is None:
+            self._responses = {}
+            if self.path.exists():
+                for line in self.path.read_text(encoding="utf-8").splitlines():
+                    try:
+                        rec = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if isinstance(rec, dict) and "key" in rec and isinstance(rec.get("response"), str):
+                        self._responses[rec["key"]] = rec["response"]
+        return self._responses
+
+    def get(self, model: str, prompt: str) -> str | None:
+        return self.responses().get(cache_key(model, prompt))
+
+    def record(self, model: str, prompt: str, response: str):
+        key = cache_key(model, prompt)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"key": key, "model": model, "response": response}, ensure_ascii=False) + "\n")
+        if self._responses is not None:
+            self._responses[key] = response
+
+
+class ReplayProvider:
+    def __init__(self, cassette: Cassette):
+        self.cassette = cassette
+
+    async def generate(self, model: str, prompt: str) -> str:
+        text = self.cassette.get(model, prompt)
+        if text is None:
+            raise LookupError(f"cassette {self.cassette.path.name} 中没有该请求的录制响应")
+        return text
+
+
+def _options(block: str) -> list[str]:
+    return _OPTION_RE.findall(block) or ["A", "B", "C", "D"]
+
+
+def _translation(block: str) -> dict:
+    return {
+        "question_cn": f"（模拟译文）{block.strip()[:120]}",
+        "options_cn": {k: f"（模拟选项 {k}）" for k in _options(block)},
+    }
+
+
+def _enrichment() -> dict:
+    return {
+        "tags": ["Amazon S3"],
+        "explanation": {"analysis": "（模拟）考查点概述。", "why_correct": "（模拟）正确选项说明。", "why_wrong": "（模拟）错误选项说明。"},
+        "related_terms": ["Amazon S3"],
+    }
+
+
+def synthesize(prompt: str) -> str:
+    """按各脚本 prompt 的特征合成一个能被对应 parse 函数接受的响应。"""
+    blocks = _BLOCK_RE.findall(prompt)
+    if blocks:
+        if "JSON array:" in prompt:
+            arr = [{"id": _id_value(i), **_translation(b)} for i, b in blocks]
+        else:
+            arr = [{"id": _id_value(i), **_enrichment()} for i, _ in blocks]
+        return json.dumps(arr, ensure_ascii=False)
+    if "术语列表（每行一个）：" in prompt:
+        blob = prompt.split("术语列表（每行一个）：\n", 1)[1].split("\n\n直接输出", 1)[0]
+        return json.dumps(
+            {t: {"definition": f"（模拟释义）{t}", "analogy": "", "features": ["要点一", "要点二"]} for t in blob.split("\n") if t},
+            ensure_ascii=False,
+        )
+    if '"correct_letters"' in prompt:
+        m = re.search(r"需选 (\d+) 项", prompt)
+        n = int(m.group(1)) if m else 2
+        return json.dumps({"correct_letters": _options(prompt)[:n]})
+    if "Translate the following AWS" in prompt:
+        body = prompt.split("Question:", 1)[-1]
+        return json.dumps(_translation(body), ensure_ascii=False)
+    if '{"tags":' in prompt:
+        return json.dumps(_enrichment(), ensure_ascii=False)
+    exp = _enrichment()
+    return json.dumps({"explanation": exp["explanation"], "related_terms": exp["related_terms"]}, ensure_ascii=False)
+
+
+def _id_value(raw: str):
+    raw = raw.strip()
+    return int(raw) if raw.isdigit() else raw
+
+
+class StandinProvider:
+    """合成响应；latency = latency_ms + per_token_ms × 输出 token，±25% 抖动。"""
+
+    def __init__(
+        self,
+        latency_ms: float = DEFAULT_LATENCY_MS,
+        per_token_ms: float = DEFAULT_PER_TOKEN_MS,
+        rate_429: float = 0.0,
+        malformed_rate: float = 0.0,
+        seed: int | None = None,
+    ):
+        self.latency_ms = latency_ms
+        self.per_token_ms = per_token_ms
+        self.rate_429 = rate_429
+        self.malformed_rate = malformed_rate
+        self.rng = random.Random(seed)
+
+    async def generate(self, model: str, prompt: str) -> str:
+        if self.rng.random() < self.rate_429:
+            await asyncio.sleep(self.latency_ms / 4000)
+            raise StandinRateLimit("429 Resource exhausted (stand-in)")
+        text = synthesize(prompt)
+        delay_ms = (self.latency_ms + self.per_token_ms * estimate_tokens(text)) * self.rng.uniform(0.75, 1.25)
+        await asyncio.sleep(delay_ms / 1000)
+        if self.rng.random() < self.malformed_rate:
+            # 一半模拟输出被截断，一半模拟模型回了说明文字
+            return text[: len(text) * 2 // 3] if self.rng.random() < 0.5 else "抱歉，我无法按要求输出 JSON。"
+        return text
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+合并的后处理：把 apply_community_answers / ensure_community_disclaimer / soften_low_vote_explanations / refine_data
+注册为「逐题变换」，对 questions_v2.json、questions_bilingual_enriched.json 各读一遍、依次套用全部变换、各写一遍，
+不再由四个脚本轮流整份解析、重写（顺序也不必再手动记）。
+
+- 变换用 @transform 注册在各自的脚本里：func(q, file, key, ctx) 返回要改的顶层字段（不改返回 {}）；
+  按 order 从小到大执行，前一个变换的结果是后一个的输入；context 为一次性准备数据的函数（如读 raw 得到社区答案表），
+  结果以 ctx 传入；output 非空的变换不改原题，而是返回写入另一个文件的整题（refine → questions_v2_refined.json）；
+  default=False 的变换（如 term_matcher 的 related_terms）只在 --only 点名时执行；
+- 每个变换都须幂等（对自己的结果再跑一次不再改动）；--check 会逐题验证，并报告每个变换改了哪些字段；
+- 逐题互不依赖，--workers N 时按块分给 N 个进程（题库较小时单进程通常更快，变换较重时再开）；
+- 写回经 question_store.QuestionStore：只改有变动的题，两个文件在同一事务中提交后导出。
+
+用法:
+  python3 scripts/postprocess.py                   # 依次执行全部变换并写回
+  python3 scripts/postprocess.py --dry-run         # 只报告各变换将改动的题数与字段
+  python3 scripts/postprocess.py --only community_answer,community_disclaimer
+  python3 scripts/postprocess.py --check           # 验证每个变换幂等（不写回）
+  python3 scripts/postprocess.py --workers 4
+  python3 scripts/postprocess.py --list            # 列出已注册的变换
+  python3 scripts/postprocess.py --only related_terms   # 默认不执行的变换（按文本匹配重写 related_terms，见 term_matcher.py）
+"""
+import importlib
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from checkpoint import atomic_write_json
+from question_store import QuestionStore
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DATA_DIR = REPO_ROOT / "public" / "data"
+V2_PATH = DATA_DIR / "questions_v2.json"
+ENRICHED_PATH = DATA_DIR / "questions_bilingual_enriched.json"
+REFINED_PATH = DATA_DIR / "questions_v2_refined.json"
+# 注册变换的脚本；导入即注册
+TRANSFORM_MODULES = (
+    "apply_community_answers",
+    "ensure_community_disclaimer",
+    "soften_low_vote_explanations",
+    "refine_data",
+    "term_matcher",
+)
+
+
+class Transform:
+    def __init__(self, name: str, func, files: tuple, order: int, context=None, output: str | None = None, default: bool = True):
+        self.name = name
+        self.func = func
+        self.files = files
+        self.order = order
+        self.context = context
+        self.output = output
+        self.default = default
+
+
+_REGISTRY: dict[str, Transform] = {}
+_MISSING = object()
+
+
+def transform(name: str, files: tuple = ("v2", "enriched"), order: int = 50, context=None, output: str | None = None, default: bool = True):
+    """注册逐题变换。同名再次注册（脚本既作为 __main__ 运行又被导入时）以后者为准。
+    default=False 的变换不在默认全量执行之列，需用 --only 点名。"""
+
+    def register(func):
+        _REGISTRY[name] = Transform(name, func, tuple(files), order, context, output, default)
+        return func
+
+    return register
+
+
+def load_transforms(names=None) -> list[Transform]:
+    """导入 TRANSFORM_MODULES 完成注册，按 order 返回（names 非空时只返回这些，否则返回 default 的变换）。"""
+    for module in TRANSFORM_MODULES:
+        importlib.import_module(module)
+    if names:
+        unknown = [n for n in names if n not in _REGISTRY]
+        if unknown:
+            raise SystemExit(f"未注册的变换: {', '.join(unknown)}（可选 {', '.join(_REGISTRY)}）")
+    chosen = [t for t in _REGISTRY.values() if (t.name in names if names else t.default)]
+    return sorted(chosen, key=lambda t: t.order)
+
+
+def changed_fields(old: dict, new: dict) -> list[str]:
+    """两题之间不同的字段；对象字段（如 explanation）细到子字段，记为 "explanation.analysis"。"""
+    out = []
+    for field in dict.fromkeys([*old, *new]):
+        a, b = old.get(field, _MISSING), new.get(field, _MISSING)
+        if a == b:
+            continue
+        if isinstance(a, dict) and isinstance(b, dict):
+            out.extend(f"{field}.{sub}" for sub in dict.fromkeys([*a, *b]) if a.get(sub, _MISSING) != b.get(sub, _MISSING))
+        else:
+            out.append(field)
+    return out
+
+
+def apply_chain(chain: list[Transform], contexts: dict, file: str, key: str, q: dict, check: bool = False):
+    """对一题依次套用变换，返回 (新题, {变换: 改动字段}, {输出名: 输出题}, 非幂等的变换列表)。"""
+    changes: dict[str, list[str]] = {}
+    derived: dict[str, dict] = {}
+    not_idempotent: list[str] = []
+    for t in chain:
+        ctx = contexts.get(t.name)
+        if t.output:
+            derived[t.output] = out = t.func(q, file, key, ctx)
+            if check and t.func(out, file, key, ctx) != out:
+                not_idempotent.append(t.name)
+            continue
+        updated = {**q, **t.func(q, file, key, ctx)}
+        fields = changed_fields(q, updated)
+        if fields:
+            changes[t.name] = fields
+            q = updated
+        if check and changed_fields(q, {**q, **t.func(q, file, key, ctx)}):
+            not_idempotent.append(t.name)
+    return q, changes, derived, not_idempotent
+
+
+_worker_chain: list[Transform] = []
+_worker_contexts: dict = {}
+
+
+def _init_worker(names: list[str], contexts: dict):
+    global _worker_chain, _worker_contexts
+    _worker_chain = load_transforms(names)
+    _worker_contexts = contexts
+
+
+def _process_chunk(job):
+    file, chunk, check = job
+    chain = [t for t in _worker_chain if file in t.files]
+    return [apply_chain(chain, _worker_contexts, file, key, q, check) for key, q in chunk]
+
+
+class Report:
+    """每个变换在每个文件中改动的题数与字段计数。"""
+
+    def __init__(self, transforms: list[Transform]):
+        self.questions = {t.name: Counter() for t in transforms if not t.output}
+        self.fields = {t.name: {} for t in transforms if not t.output}
+        self.outputs: dict[str, int] = {}
+        self.not_idempotent: list[tuple[str, str, str]] = []
+
+    def add(self, file: str, changes: dict[str, list[str]]):
+        for name, fields in changes.items():
+            self.questions[name][file] += 1
+            self.fields[name].setdefault(file, Counter()).update(fields)
+
+    def changed(self, name: str, file: str | None = None) -> int:
+        c = self.questions.get(name, Counter())
+        return c[file] if file else sum(c.values())
+
+    def print(self):
+        for name, per_file in self.questions.items():
+            if not per_file:
+                print(f"  [{name}] 无改动")
+                continue
+            for file, n in per_file.items():
+                fields = "，".join(f"{f} {c}" for f, c in self.fields[name][file].most_common())
+                print(f"  [{name}] {file}: {n} 题（{fields}）")
+        for output, n in self.outputs.items():
+            print(f"  [{output}] 输出 {n} 题")
+        for name, file, key in self.not_idempotent[:20]:
+            print(f"  [非幂等] {name} 在 {file} 题 {key} 上再次运行仍有改动")
+
+
+def run(names=None, workers: int = 0, dry_run: bool = False, check: bool = False, files: dict | None = None) -> Report:
+    """执行已注册的变换（names 为空时全部），每个文件读一遍、写一遍；dry_run / check 时不写回。"""
+    transforms = load_transforms(names)
+    contexts = {t.name: t.context() if t.context else None for t in transforms}
+    outputs_paths = {"v2_refined": REFINED_PATH}
+    store = QuestionStore(files or {"v2": V2_PATH, "enriched": ENRICHED_PATH})
+    report = Report(transforms)
+    writes: dict[str, list[tuple[str, dict]]] = {}
+    outputs: dict[str, list[dict]] = {}
+    executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=([t.name for t in transforms], contexts)) if workers > 1 else None
+    try:
+        for file in store.files:
+            chain = [t for t in transforms if file in t.files]
+            if not chain:
+                continue
+            items = store.items(file)
+            if executor:
+                size = max(1, -(-len(items) // (workers * 4)))
+                jobs = [(file, items[i : i + size], check) for i in range(0, len(items), size)]
+                results = [r for chunk in executor.map(_process_chunk, jobs) for r in chunk]
+            else:
+                results = [apply_chain(chain, contexts, file, key, q, check) for key, q in items]
+            for (key, _), (new, changes, derived, not_idempotent) in zip(items, results):
+                report.add(file, changes)
+                report.not_idempotent.extend((name, file, key) for name in not_idempotent)
+                if changes:
+                    writes.setdefault(file, []).append((key, new))
+                for output, item in derived.items():
+                    outputs.setdefault(output, []).append(item)
+    finally:
+        if executor:
+            executor.shutdown()
+    report.outputs = {output: len(items) for output, items in outputs.items()}
+
+    if not (dry_run or check):
+        if writes:
+            with store.transaction():
+                for file, changed in writes.items():
+                    for key, item in changed:
+                        store.put(file, item, qid=key)
+        for output, items in outputs.items():
+            atomic_write_json(outputs_paths[output], items)
+    store.close()
+    return report
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="单遍执行全部后处理变换（社区答案、免责前缀、低票谨慎表述、多选格式）")
+    parser.add_argument("--only", type=str, default="", help="只执行这些变换，逗号分隔")
+    parser.add_argument("--dry-run", action="store_true", help="只报告将改动的题数与字段，不写回")
+    parser.add_argument("--check", action="store_true", help="验证每个变换幂等，不写回；有非幂等变换时退出码为 1")
+    parser.add_argument("--workers", type=int, default=0, help="进程数（0/1=单进程）")
+    parser.add_argument("--list", action="store_true", help="列出已注册的变换")
+    args = parser.parse_args()
+
+    if args.list:
+        load_transforms()
+        for t in sorted(_REGISTRY.values(), key=lambda t: t.order):
+            target = f" → {t.output}" if t.output else ""
+            extra = "" if t.default else "（默认不执行，需 --only）"
+            print(f"  {t.order:>3}  {t.name:<24}{'/'.join(t.files)}{target}{extra}")
+        return
+
+    names = [n.strip() for n in args.only.split(",") if n.strip()]
+    started = time.monotonic()
+    report = run(names, workers=args.workers, dry_run=args.dry_run, check=args.check)
+    report.print()
+    elapsed = time.monotonic() - started
+    if args.check:
+        print(f"幂等检查完成（{elapsed:.2f} 秒），非幂等 {len(report.not_idempotent)} 处")
+        if report.not_idempotent:
+            sys.exit(1)
+    elif args.dry_run:
+        print(f"--dry-run：未写回（{elapsed:.2f} 秒）")
+    else:
+        print(f"后处理完成，耗时 {elapsed:.2f} 秒")
+
+
+if __name__ == "__main__":
+    # 各脚本注册到的是 postprocess 模块的注册表（而非 __main__），经模块名运行以共用同一份
+    import postprocess
+
+    postprocess.main()
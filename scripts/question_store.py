@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+题库记录存储：把 questions_v2.json、questions_bilingual_enriched.json 等题目文件镜像到一个 SQLite 库（每题一行，按题号索引），
+脚本按题号读取、只改动需要改的字段，改完在同一事务里提交多个文件，再由导出器写回 App 读取的 JSON。
+
+- 每行存该题按 indent=2 排版好的 JSON 文本；导出只需按原顺序拼接各行，结果与 json.dump(..., indent=2) 逐字节一致，
+  不必再对整个 3.8 MB 列表重新序列化；
+- 按需同步：首次访问某文件时比对其 mtime/大小，JSON 在库外被改过（如 rebuild.py、手工编辑）就重新导入；
+- 写入必须在 transaction() 内：同一事务中改动的所有文件一起提交，提交后逐个原子替换（临时文件 + os.replace）导出；
+  导出前崩溃时文件仍标记为待导出，下次打开存储时先补导出，保证多个 JSON 之间不会一半新一半旧；
+- 题号重复（现有题库中 555、889 各两题）时第 n 次出现的键为 "题号#n"，与 rebuild.py 一致。
+
+库文件默认放在题目文件同目录的 .questions.sqlite（public/data/.questions.sqlite），可随时删除，下次打开时重新导入。
+
+用法（脚本内）:
+  from question_store import QuestionStore
+
+  store = QuestionStore({"v2": V2_PATH, "enriched": ENRICHED_PATH})
+  q = store.get("v2", 42)
+  with store.transaction():
+      store.update("v2", 42, {"best_answer": "BD", "explanation.analysis": "..."})
+      store.update("enriched", 42, {"correct_answer": "BD"})
+  # 退出 with 时提交并导出 questions_v2.json、questions_bilingual_enriched.json
+
+命令行:
+  python3 scripts/question_store.py --export      # 把待导出的文件写回 JSON
+  python3 scripts/question_store.py --stats       # 各文件题数与同步状态
+"""
+import json
+import os
+import sqlite3
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DATA_DIR = REPO_ROOT / "public" / "data"
+FILES = {
+    "raw": DATA_DIR / "raw_questions_en.json",
+    "bilingual": DATA_DIR / "questions_bilingual.json",
+    "enriched": DATA_DIR / "questions_bilingual_enriched.json",
+    "v2": DATA_DIR / "questions_v2.json",
+}
+DB_NAME = ".questions.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    dirty INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS questions (
+    file TEXT NOT NULL,
+    key TEXT NOT NULL,
+    pos INTEGER NOT NULL,
+    doc TEXT NOT NULL,
+    PRIMARY KEY (file, key)
+);
+CREATE INDEX IF NOT EXISTS questions_pos ON questions (file, pos);
+"""
+
+
+def question_keys(items: list[dict]) -> list[str]:
+    """每题的键为题号；同一题号重复出现时第 n 次出现记为 "题号#n"。"""
+    seen: dict[str, int] = {}
+    keys = []
+    for item in items:
+        qid = str(item.get("id"))
+        seen[qid] = seen.get(qid, 0) + 1
+        keys.append(qid if seen[qid] == 1 else f"{qid}#{seen[qid]}")
+    return keys
+
+
+def render(item: dict) -> str:
+    """单题在 indent=2 的 JSON 数组中的文本（每行多缩进两格）。"""
+    return "  " + json.dumps(item, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+
+
+def _set_path(item: dict, path: str, value):
+    """path 可用点号写嵌套字段，如 "explanation.analysis"；中间层不是对象时改为对象。"""
+    *parents, leaf = path.split(".")
+    node = item
+    for p in parents:
+        if not isinstance(node.get(p), dict):
+            node[p] = {}
+        node = node[p]
+    node[leaf] = value
+
+
+class QuestionStore:
+    def __init__(self, files: dict[str, Path] | None = None, db_path: Path | None = None):
+        self.files = {name: Path(p) for name, p in (files or FILES).items()}
+        if db_path is None:
+            db_path = next(iter(self.files.values())).parent / DB_NAME
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), isolation_level=None)
+        self.conn.executescript(_SCHEMA)
+        self._synced: set[str] = set()
+        self._touched: set[str] = set()
+        self._in_tx = False
+        self._recover()
+
+    # ---- 同步 ----
+    def _recover(self):
+        """上次提交后导出前中断的文件，先补导出；中断后 JSON 已在库外修改（mtime 或大小与记录不符）时以文件为准，
+        放弃库中未导出的改动，下次访问时重新导入。"""
+        rows = self.conn.execute("SELECT name, mtime_ns, size FROM files WHERE dirty = 1").fetchall()
+        for name, mtime_ns, size in rows:
+            if name not in self.files:
+                continue
+            path = self.files[name]
+            st = path.stat() if path.exists() else None
+            if st is None or (st.st_mtime_ns, st.st_size) != (mtime_ns, size):
+                print(f"  [STORE] {path.name} 上次未导出完成，但文件已在库外修改，以文件为准（放弃库中未导出的改动）")
+                self.conn.execute("UPDATE files SET dirty = 0, mtime_ns = 0, size = -1 WHERE name = ?", (name,))
+                continue
+            print(f"  [STORE] {path.name} 上次未导出完成，重新导出")
+            self._synced.add(name)
+            self.export(name)
+
+    def _sync(self, name: str):
+        """首次访问 name 时，若 JSON 文件在库外被修改（或库中还没有），重新导入。"""
+        if name in self._synced:
+            return
+        if name not in self.files:
+            raise KeyError(f"未登记的题目文件: {name}（可选 {', '.join(self.files)}）")
+        path = self.files[name]
+        row = self.conn.execute("SELECT path, mtime_ns, size FROM files WHERE name = ?", (name,)).fetchone()
+        st = path.stat() if path.exists() else None
+        current = (str(path), st.st_mtime_ns, st.st_size) if st else (str(path), 0, 0)
+        if row is None or tuple(row) != current:
+            self._import(name, path, current)
+        self._synced.add(name)
+
+    def _import(self, name: str, path: Path, current: tuple):
+        items = []
+        if path.exists():
+            data = json.loads(path.read_text(encoding="utf-8"))
+            items = data if isinstance(data, list) else [data]
+        rows = [(name, key, pos, render(item)) for pos, (key, item) in enumerate(zip(question_keys(items), items))]
+        with self._tx():
+            self.conn.execute("DELETE FROM questions WHERE file = ?", (name,))
+            self.conn.executemany("INSERT INTO questions (file, key, pos, doc) VALUES (?, ?, ?, ?)", rows)
+            self.conn.execute("INSERT OR REPLACE INTO files (name, path, mtime_ns, size, dirty) VALUES (?, ?, ?, ?, 0)", (name, *current))
+
+    @contextmanager
+    def _tx(self):
+        if self._in_tx:
+            yield
+            return
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    # ---- 读 ----
+    def get(self, name: str, qid) -> dict | None:
+        """按题号（或 "题号#n"）取一题，不存在返回 None。"""
+        self._sync(name)
+        row = self.conn.execute("SELECT doc FROM questions WHERE file = ? AND key = ?", (name, str(qid))).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_many(self, name: str, qids) -> dict[str, dict]:
+        """按题号批量取题，返回 键 -> 题；不存在的题号不在结果中。"""
+        self._sync(name)
+        keys = [str(q) for q in qids]
+        out = {}
+        for start in range(0, len(keys), 500):
+            part = keys[start : start + 500]
+            sql = f"SELECT key, doc FROM questions WHERE file = ? AND key IN ({','.join('?' * len(part))})"
+            out.update((k, json.loads(doc)) for k, doc in self.conn.execute(sql, (name, *part)))
+        return out
+
+    def items(self, name: str) -> list[tuple[str, dict]]:
+        """按文件中的顺序返回 (键, 题) 列表。"""
+        self._sync(name)
+        return [(k, json.loads(doc)) for k, doc in self.conn.execute("SELECT key, doc FROM questions WHERE file = ? ORDER BY pos", (name,))]
+
+    def all(self, name: str) -> list[dict]:
+        return [item for _, item in self.items(name)]
+
+    # ---- 写（须在 transaction() 内）----
+    @contextmanager
+    def transaction(self):
+        """事务内的所有改动一起提交；提交后导出被改动的文件。异常时全部回滚，JSON 不变。"""
+        if self._in_tx:
+            raise RuntimeError("不支持嵌套事务")
+        self.conn.execute("BEGIN IMMEDIATE")
+        self._in_tx = True
+        self._touched = set()
+        try:
+            yield self
+            self.conn.executemany("UPDATE files SET dirty = 1 WHERE name = ?", [(n,) for n in self._touched])
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        else:
+            self.conn.execute("COMMIT")
+        finally:
+            self._in_tx = False
+        for name in sorted(self._touched):
+            self.export(name)
+
+    def _write(self, name: str, key: str, item: dict):
+        if not self._in_tx:
+            raise RuntimeError("写入须在 store.transaction() 内")
+        self._touched.add(name)
+        self.conn.execute("UPDATE questions SET doc = ? WHERE file = ? AND key = ?", (render(item), name, key))
+
+    def update(self, name: str, qid, fields: dict) -> dict | None:
+        """只改给出的字段（键可用点号写嵌套字段），返回改后的题；题不存在返回 None。值未变时不写。"""
+        key = str(qid)
+        item = self.get(name, key)
+        if item is None:
+            return None
+        before = json.dumps(item, ensure_ascii=False, sort_keys=True)
+        for path, value in fields.items():
+            _set_path(item, path, value)
+        if json.dumps(item, ensure_ascii=False, sort_keys=True) != before:
+            self._write(name, key, item)
+        return item
+
+    def put(self, name: str, item: dict, qid=None):
+        """整题替换（键为 qid，默认 item["id"]）；题不存在时追加到末尾。"""
+        key = str(item.get("id") if qid is None else qid)
+        self._sync(name)
+        if self.conn.execute("SELECT 1 FROM questions WHERE file = ? AND key = ?", (name, key)).fetchone():
+            self._write(name, key, item)
+            return
+        if not self._in_tx:
+            raise RuntimeError("写入须在 store.transaction() 内")
+        self._touched.add(name)
+        (pos,) = self.conn.execute("SELECT COALESCE(MAX(pos) + 1, 0) FROM questions WHERE file = ?", (name,)).fetchone()
+        self.conn.execute("INSERT INTO questions (file, key, pos, doc) VALUES (?, ?, ?, ?)", (name, key, pos, render(item)))
+
+    # ---- 导出 ----
+    def export(self, name: str, path: Path | None = None) -> Path:
+        """按原顺序拼接各题文本写出 JSON（临时文件 + fsync + os.replace）；写到登记路径时清除待导出标记。"""
+        self._sync(name)
+        target = Path(path) if path else self.files[name]
+        docs = [doc for (doc,) in self.conn.execute("SELECT doc FROM questions WHERE file = ? ORDER BY pos", (name,))]
+        text = "[\n" + ",\n".join(docs) + "\n]" if docs else "[]"
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(target.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, target)
+        if path is None:
+            st = target.stat()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO files (name, path, mtime_ns, size, dirty) VALUES (?, ?, ?, ?, 0)", (name, str(target), st.st_mtime_ns, st.st_size)
+            )
+            self._synced.add(name)
+        return target
+
+    def stats(self) -> list[tuple[str, int, str]]:
+        out = []
+        for name, path in self.files.items():
+            (n,) = self.conn.execute("SELECT COUNT(*) FROM questions WHERE file = ?", (name,)).fetchone()
+            row = self.conn.execute("SELECT mtime_ns, size, dirty FROM files WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                status = "未导入"
+            elif row[2]:
+                status = "待导出"
+            else:
+                st = path.stat() if path.exists() else None
+                status = "已同步" if st and (st.st_mtime_ns, st.st_size) == (row[0], row[1]) else "JSON 已在库外修改，下次访问时重新导入"
+            out.append((name, n, status))
+        return out
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="题库记录存储：导出或查看同步状态")
+    parser.add_argument("--export", action="store_true", help="把所有登记的文件重新导出为 JSON")
+    parser.add_argument("--stats", action="store_true", help="显示各文件题数与同步状态")
+    args = parser.parse_args()
+    if not (args.export or args.stats):
+        parser.print_help()
+        sys.exit(1)
+
+    store = QuestionStore()
+    try:
+        if args.export:
+            for name in store.files:
+                print(f"已导出: {store.export(name)}")
+        if args.stats:
+            for name, n, status in store.stats():
+                print(f"  {name:<10}{n:>6} 题  {status}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -14,23 +14,19 @@
   python3 scripts/re_explain_community_answers.py --limit 5
   python3 scripts/re_explain_community_answers.py --dry-run
   python3 scripts/re_explain_community_answers.py --ids 6,7,592
+  python3 scripts/re_explain_community_answers.py --concurrency 8   # 同时在途的请求数（默认 4）
 """
 import json
-import os
 import re
 import sys
-import time
 from pathlib import Path
 
+from llm_client import add_llm_args, create_client, map_ordered, run_llm
+from llm_governor import QuotaExhausted
+from question_store import QuestionStore
+
 RETRY_MAX = 3
 RETRY_WAIT = [30, 60, 120]
-BASE_SLEEP = 1.5
-
-try:
-    import google.generativeai as genai
-except ImportError:
-    print("请先安装: pip install google-generativeai")
-    sys.exit(1)
 
 REPO_ROOT = Path(__file__).resolve().parent.parent
 V2_PATH = REPO_ROOT / "public" / "data" / "questions_v2.json"
@@ -130,12 +126,68 @@ def _log_fail(qid: int, raw_text: str):
         pass
 
 
+async def re_explain_one(client, item: dict, pos: str) -> dict | None:
+    """为单题请求新解析，返回要写回 v2 与 enriched 的字段；解析失败时重新请求，最多 RETRY_MAX 次，仍失败返回 None。"""
+    qid = item["qid"]
+    v2_q = item["v2_q"]
+    disclaimer_line = get_disclaimer_line(v2_q)
+    prompt = build_prompt(v2_q, item["letters"])
+    for _ in range(RETRY_MAX + 1):
+        text = await client.generate(prompt, label=f"id {qid}", validate=lambda t: parse_response(t) is not None)
+        if text is None:
+            return None
+        parsed = parse_response(text)
+        if parsed:
+            exp = parsed["explanation"]
+            new_analysis = (exp.get("analysis") or "").strip()
+            full_analysis = f"{disclaimer_line}\n\n{new_analysis}" if new_analysis else disclaimer_line
+            fields = {
+                "explanation": {
+                    "analysis": full_analysis,
+                    "why_correct": exp.get("why_correct", ""),
+                    "why_wrong": exp.get("why_wrong", ""),
+                }
+            }
+            if isinstance(parsed.get("related_terms"), list) and parsed["related_terms"]:
+                fields["related_terms"] = parsed["related_terms"]
+            print(f"  [{pos}] id {qid} 已生成新解析")
+            return fields
+        _log_fail(qid, text)
+        print(f"  [{pos}] id {qid} 解析失败（原始响应已写入 {FAIL_LOG.name}）")
+    return None
+
+
+async def _run(args, to_process: list[dict]) -> dict[str, dict]:
+    """返回 题目键 -> 要写回的字段（只含成功的题）。"""
+    client = create_client(args, retry_wait=RETRY_WAIT)
+    client.plan(len(to_process))
+    total = len(to_process)
+    done: dict[str, dict] = {}
+
+    def on_result(i: int, fields: dict | None):
+        if fields:
+            done[to_process[i]["key"]] = fields
+
+    try:
+        await map_ordered(
+            lambda pair: re_explain_one(client, pair[1], f"{pair[0] + 1}/{total}"),
+            list(enumerate(to_process)),
+            on_result,
+        )
+    except QuotaExhausted as e:
+        print(f"[QUOTA] {e}，先写回已完成的 {len(done)} 题")
+    finally:
+        client.close()
+    return done
+
+
 def main():
     import argparse
     parser = argparse.ArgumentParser(description="对社区答案题目用 Gemini 重新生成解析")
     parser.add_argument("--limit", type=int, default=0, help="只处理前 N 题（0=全部）")
     parser.add_argument("--dry-run", action="store_true", help="只列出将处理的题，不调用 API")
     parser.add_argument("--ids", type=str, default="", help="只处理指定题号，逗号分隔")
+    add_llm_args(parser)
     args = parser.parse_args()
 
     if not V2_PATH.exists():
@@ -145,22 +197,15 @@ def main():
         print(f"未找到 {ENRICHED_PATH}")
         sys.exit(1)
 
-    with open(V2_PATH, "r", encoding="utf-8") as f:
-        v2_list = json.load(f)
-    with open(ENRICHED_PATH, "r", encoding="utf-8") as f:
-        enriched_list = json.load(f)
-
-    v2_by_id = {int(q["id"]): (i, q) for i, q in enumerate(v2_list) if isinstance(q, dict) and "id" in q}
-    enriched_by_id = {int(q.get("id")): q for q in enriched_list if isinstance(q, dict) and "id" in q}
-
+    store = QuestionStore({"v2": V2_PATH, "enriched": ENRICHED_PATH})
     to_process = []
-    for qid, (idx, q) in v2_by_id.items():
+    for key, q in store.items("v2"):
         if not is_community_answer_question(q):
             continue
         letters = get_correct_letters(q)
         if not letters:
             continue
-        to_process.append({"qid": qid, "v2_index": idx, "v2_q": q, "letters": letters})
+        to_process.append({"qid": int(q["id"]), "key": key, "v2_q": q, "letters": letters})
 
     if args.ids.strip():
         filter_ids = {int(x.strip()) for x in args.ids.split(",") if x.strip()}
@@ -180,71 +225,18 @@ def main():
             print(f"  ... 共 {len(to_process)} 题")
         return
 
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        print("请设置环境变量 GEMINI_API_KEY")
-        sys.exit(1)
-    genai.configure(api_key=api_key.strip())
-    model = genai.GenerativeModel("gemini-2.0-flash-lite")
-
-    updated = 0
-    for idx, item in enumerate(to_process):
-        qid = item["qid"]
-        v2_q = item["v2_q"]
-        letters = item["letters"]
-        disclaimer_line = get_disclaimer_line(v2_q)
-
-        for attempt in range(RETRY_MAX + 1):
-            try:
-                prompt = build_prompt(v2_q, letters)
-                resp = model.generate_content(prompt)
-                text = resp.text if hasattr(resp, "text") else (resp.candidates[0].content.parts[0].text if resp.candidates else "")
-                parsed = parse_response(text)
-                if parsed:
-                    exp = parsed["explanation"]
-                    new_analysis = (exp.get("analysis") or "").strip()
-                    full_analysis = f"{disclaimer_line}\n\n{new_analysis}" if new_analysis else disclaimer_line
-                    v2_q["explanation"] = {
-                        "analysis": full_analysis,
-                        "why_correct": exp.get("why_correct", ""),
-                        "why_wrong": exp.get("why_wrong", ""),
-                    }
-                    if isinstance(parsed.get("related_terms"), list) and parsed["related_terms"]:
-                        v2_q["related_terms"] = parsed["related_terms"]
-                    # 同步到 enriched
-                    eq = enriched_by_id.get(qid)
-                    if eq:
-                        eq["explanation"] = {
-                            "analysis": full_analysis,
-                            "why_correct": exp.get("why_correct", ""),
-                            "why_wrong": exp.get("why_wrong", ""),
-                        }
-                        if isinstance(parsed.get("related_terms"), list) and parsed["related_terms"]:
-                            eq["related_terms"] = parsed["related_terms"]
-                    updated += 1
-                    print(f"  [{idx + 1}/{len(to_process)}] id {qid} 已更新解析并同步到 enriched")
-                    break
-                _log_fail(qid, text)
-                print(f"  [{idx + 1}/{len(to_process)}] id {qid} 解析失败（原始响应已写入 {FAIL_LOG.name}）")
-            except Exception as e:
-                err = str(e)
-                if "429" in err or "Resource exhausted" in err:
-                    wait = RETRY_WAIT[min(attempt, len(RETRY_WAIT) - 1)]
-                    print(f"  id {qid} 限流，{wait}s 后重试")
-                    time.sleep(wait)
-                else:
-                    print(f"  id {qid}: {e}")
-                    break
-        time.sleep(BASE_SLEEP)
-
-    if updated > 0:
-        with open(V2_PATH, "w", encoding="utf-8") as f:
-            json.dump(v2_list, f, ensure_ascii=False, indent=2)
-        with open(ENRICHED_PATH, "w", encoding="utf-8") as f:
-            json.dump(enriched_list, f, ensure_ascii=False, indent=2)
-        print(f"已写回 {V2_PATH} 与 {ENRICHED_PATH}，共更新 {updated} 题解析")
+    updates = run_llm(_run(args, to_process))
+
+    if updates:
+        # v2 与 enriched 在同一事务中按题号只改这些题，提交后一起导出
+        with store.transaction():
+            for key, fields in updates.items():
+                store.update("v2", key, fields)
+                store.update("enriched", key, fields)
+        print(f"已写回 {V2_PATH} 与 {ENRICHED_PATH}，共更新 {len(updates)} 题解析")
     else:
         print("未更新任何题目。")
+    store.close()
 
 
 if __name__ == "__main__":
@@ -11,24 +11,19 @@
   python3 scripts/re_explain_multiple_choice.py --dry-run   # 只列出将处理的题，不调用 API
   python3 scripts/re_explain_multiple_choice.py --ids 73,92,94   # 只处理指定题号
   python3 scripts/re_explain_multiple_choice.py --retry-failed   # 只重试上次失败日志中的题
+  python3 scripts/re_explain_multiple_choice.py --concurrency 8   # 同时在途的请求数（默认 4）
 解析失败时 API 原始响应会追加到 public/data/.re_explain_fail_log.txt，便于分析原因。
 """
 import json
-import os
 import re
-import sys
-import time
 from pathlib import Path
 
+from llm_client import add_llm_args, create_client, map_ordered, run_llm
+from llm_governor import QuotaExhausted
+from question_store import QuestionStore
+
 RETRY_MAX = 3
 RETRY_WAIT = [30, 60, 120]
-BASE_SLEEP = 1.5
-
-try:
-    import google.generativeai as genai
-except ImportError:
-    print("请先安装: pip install google-generativeai")
-    sys.exit(1)
 
 REPO_ROOT = Path(__file__).resolve().parent.parent
 QUESTIONS_PATH = REPO_ROOT / "public" / "data" / "questions_v2.json"
@@ -104,6 +99,57 @@ def _log_fail(qid: int, raw_text: str):
         pass
 
 
+async def re_explain_one(client, q: dict, letters: list[str], pos: str) -> dict | None:
+    """为单道多选题请求新解析，返回要写回的字段；解析失败时重新请求，最多 RETRY_MAX 次，仍失败返回 None。"""
+    qid = q.get("id")
+    prompt = build_prompt(q, letters)
+    for _ in range(RETRY_MAX + 1):
+        text = await client.generate(prompt, label=f"id {qid}", validate=lambda t: parse_response(t) is not None)
+        if text is None:
+            return None
+        parsed = parse_response(text)
+        if parsed:
+            exp = parsed["explanation"]
+            fields = {
+                "explanation": {
+                    "analysis": exp.get("analysis", (q.get("explanation") or {}).get("analysis", "")),
+                    "why_correct": exp.get("why_correct", ""),
+                    "why_wrong": exp.get("why_wrong", ""),
+                }
+            }
+            if parsed.get("related_terms"):
+                fields["related_terms"] = parsed["related_terms"]
+            print(f"  [{pos}] id {qid} 已生成新解析")
+            return fields
+        _log_fail(qid, text)
+        print(f"  [{pos}] id {qid} 解析失败（原始响应已追加到 {FAIL_LOG.name}）")
+    return None
+
+
+async def _run(args, to_process: list[dict]) -> dict[str, dict]:
+    """返回 题目键 -> 要写回的字段（只含成功的题）。"""
+    client = create_client(args, retry_wait=RETRY_WAIT)
+    client.plan(len(to_process))
+    total = len(to_process)
+    done: dict[str, dict] = {}
+
+    def on_result(i: int, fields: dict | None):
+        if fields:
+            done[to_process[i]["key"]] = fields
+
+    try:
+        await map_ordered(
+            lambda pair: re_explain_one(client, pair[1]["q"], pair[1]["letters"], f"{pair[0] + 1}/{total}"),
+            list(enumerate(to_process)),
+            on_result,
+        )
+    except QuotaExhausted as e:
+        print(f"[QUOTA] {e}，先写回已完成的 {len(done)} 题")
+    finally:
+        client.close()
+    return done
+
+
 def main():
     import argparse
     parser = argparse.ArgumentParser(description="对多选题重新生成解析")
@@ -111,16 +157,15 @@ def main():
     parser.add_argument("--dry-run", action="store_true", help="只列出将处理的题，不调用 API")
     parser.add_argument("--ids", type=str, default="", help="只处理指定题号，逗号分隔，如 --ids 73,92,94")
     parser.add_argument("--retry-failed", action="store_true", help="只重试上次运行失败日志中的题号")
+    add_llm_args(parser)
     args = parser.parse_args()
 
-    with open(QUESTIONS_PATH, "r", encoding="utf-8") as f:
-        questions = json.load(f)
-
+    store = QuestionStore({"v2": QUESTIONS_PATH})
     to_process = []
-    for i, q in enumerate(questions):
+    for key, q in store.items("v2"):
         letters = get_best_answer_letters(q)
         if len(letters) >= 2:
-            to_process.append({"index": i, "q": q, "letters": letters})
+            to_process.append({"key": key, "q": q, "letters": letters})
 
     filter_ids = set()
     if args.retry_failed and FAIL_LOG.exists():
@@ -148,54 +193,16 @@ def main():
             print(f"  ... 共 {len(to_process)} 题")
         return
 
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        print("请设置环境变量 GEMINI_API_KEY")
-        sys.exit(1)
-    genai.configure(api_key=api_key.strip())
-    model = genai.GenerativeModel("gemini-2.0-flash-lite")
-
-    updated = 0
-    for idx, item in enumerate(to_process):
-        i, q, letters = item["index"], item["q"], item["letters"]
-        qid = q.get("id")
-        prompt = build_prompt(q, letters)
-        for attempt in range(RETRY_MAX + 1):
-            try:
-                resp = model.generate_content(prompt)
-                text = resp.text if hasattr(resp, "text") else (resp.candidates[0].content.parts[0].text if resp.candidates else "")
-                parsed = parse_response(text)
-                if parsed:
-                    exp = parsed["explanation"]
-                    q["explanation"] = {
-                        "analysis": exp.get("analysis", (q.get("explanation") or {}).get("analysis", "")),
-                        "why_correct": exp.get("why_correct", ""),
-                        "why_wrong": exp.get("why_wrong", ""),
-                    }
-                    if parsed.get("related_terms"):
-                        q["related_terms"] = parsed["related_terms"]
-                    updated += 1
-                    print(f"  [{idx + 1}/{len(to_process)}] id {qid} 已更新解析")
-                    break
-                _log_fail(qid, text)
-                print(f"  [{idx + 1}/{len(to_process)}] id {qid} 解析失败（原始响应已追加到 {FAIL_LOG.name}）")
-            except Exception as e:
-                err = str(e)
-                if "429" in err or "Resource exhausted" in err:
-                    wait = RETRY_WAIT[min(attempt, len(RETRY_WAIT) - 1)]
-                    print(f"  id {qid} 限流，{wait}s 后重试")
-                    time.sleep(wait)
-                else:
-                    print(f"  id {qid}: {e}")
-                    break
-        time.sleep(BASE_SLEEP)
-
-    if updated > 0:
-        with open(QUESTIONS_PATH, "w", encoding="utf-8") as f:
-            json.dump(questions, f, ensure_ascii=False, indent=2)
-        print(f"已写回 {QUESTIONS_PATH}，共更新 {updated} 题解析")
+    updates = run_llm(_run(args, to_process))
+
+    if updates:
+        with store.transaction():
+            for key, fields in updates.items():
+                store.update("v2", key, fields)
+        print(f"已写回 {QUESTIONS_PATH}，共更新 {len(updates)} 题解析")
     else:
         print("未更新任何题目。")
+    store.close()
 
 
 if __name__ == "__main__":
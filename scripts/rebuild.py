@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+增量重建 raw → bilingual → enriched → v2：只重算「输入变了」的题，并把结果就地补进下游文件。
+改一道题的答案后不必再手动依次跑 apply/sync/build 等整阶段脚本，也不会重翻或重打标整个题库。
+
+每题每个阶段在 public/data/.build_state.json 中记录两类指纹（内容哈希；另存整题指纹，未变的题不逐字段比对）：
+- 字段指纹：上游派生出的每个字段（bilingual ← raw 的题干/选项/答案/投票，enriched ← bilingual 全部字段，
+  v2 ← build_app_questions.to_app_item(enriched)）。只有指纹变了的字段才覆盖下游，下游手工或脚本做的其它修改保留；
+- LLM 指纹：该阶段 prompt 用到的字段 + PROMPT_VERSION + 模型名。变了才调用 Gemini 重算
+  （translate：question_en/options_en；enrich：question_cn/options_cn/correct_answer）。
+首次运行（无状态文件或新增阶段记录）时认可现有产物、只记录指纹，不做任何重算。
+LLM 失败（保留英文 / 解析为空）的题不记录 LLM 指纹，下次运行会再试。
+
+用法:
+  python3 scripts/rebuild.py                # 修改 raw_questions_en.json 等之后增量重建
+  python3 scripts/rebuild.py --dry-run      # 只列出各阶段将修补的字段与需调用 API 的题
+  python3 scripts/rebuild.py --no-llm       # 只同步不需 API 的字段，需重算的题留待下次
+  python3 scripts/rebuild.py --concurrency 4 --batch-tokens 3000
+"""
+
+import hashlib
+import json
+import sys
+import time
+from pathlib import Path
+
+import add_tags_and_explanation as enrich_stage
+import build_app_questions as build_stage
+import translate_en_to_cn as translate_stage
+from checkpoint import atomic_write_json
+from llm_batch import AdaptiveBatcher, add_batch_args
+from llm_client import DEFAULT_MODEL, add_llm_args, create_client, map_ordered, run_llm
+from question_store import question_keys
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DATA_DIR = REPO_ROOT / "public" / "data"
+RAW_PATH = DATA_DIR / "raw_questions_en.json"
+BILINGUAL_PATH = DATA_DIR / "questions_bilingual.json"
+ENRICHED_PATH = DATA_DIR / "questions_bilingual_enriched.json"
+V2_PATH = DATA_DIR / "questions_v2.json"
+STATE_PATH = DATA_DIR / ".build_state.json"
+STATE_VERSION = 1
+# raw 中进入 bilingual 的字段（community_answer 只供 apply_community_answers 使用）
+RAW_FIELDS = ("id", "topic", "question_en", "options_en", "correct_answer", "vote_percentage", "question_image", "options_image")
+
+
+def fingerprint(value) -> str:
+    return hashlib.blake2b(json.dumps(value, ensure_ascii=False, sort_keys=True).encode("utf-8"), digest_size=8).hexdigest()
+
+
+class Stage:
+    """一个产物文件：derive(上游题) 给出应同步的字段；llm_inputs 非空时，这些字段（连同 prompt 版本）变了才需调用 API 重算 llm_outputs。"""
+
+    def __init__(self, name: str, path: Path, derive, llm_inputs: tuple = (), llm_outputs: tuple = (), prompt_version: int = 0, is_done=None):
+        self.name = name
+        self.path = path
+        self.derive = derive
+        self.llm_inputs = llm_inputs
+        self.llm_outputs = llm_outputs
+        self.prompt_version = prompt_version
+        self.is_done = is_done
+
+    def llm_fingerprint(self, item: dict, model: str) -> str | None:
+        if not self.llm_inputs:
+            return None
+        return fingerprint([self.prompt_version, model, [item.get(f) for f in self.llm_inputs]])
+
+
+STAGES = (
+    Stage(
+        "bilingual",
+        BILINGUAL_PATH,
+        lambda item: {f: item[f] for f in RAW_FIELDS if f in item},
+        llm_inputs=("question_en", "options_en"),
+        llm_outputs=("question_cn", "options_cn"),
+        prompt_version=translate_stage.PROMPT_VERSION,
+        is_done=lambda item: not translate_stage.is_failed_item(item),
+    ),
+    Stage(
+        "enriched",
+        ENRICHED_PATH,
+        dict,
+        llm_inputs=("question_cn", "options_cn", "correct_answer"),
+        llm_outputs=("tags", "explanation", "related_terms"),
+        prompt_version=enrich_stage.PROMPT_VERSION,
+        is_done=enrich_stage.has_enrichment,
+    ),
+    Stage("v2", V2_PATH, build_stage.to_app_item),
+)
+
+
+def load_list(path: Path) -> list[dict]:
+    if not path.exists():
+        return []
+    data = json.loads(path.read_text(encoding="utf-8"))
+    return data if isinstance(data, list) else [data]
+
+
+def load_state() -> dict:
+    try:
+        state = json.loads(STATE_PATH.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return {"version": STATE_VERSION, "questions": {}}
+    if state.get("version") != STATE_VERSION:
+        return {"version": STATE_VERSION, "questions": {}}
+    return state
+
+
+class StagePlan:
+    """一个阶段的比对结果：新的下游列表、被修补的字段、需调用 API 的题（键 → 新列表下标）。"""
+
+    def __init__(self):
+        self.items: list[dict] = []
+        self.keys: list[str] = []
+        self.records: list[dict] = []
+        self.patched: dict[str, list[str]] = {}
+        self.added: list[str] = []
+        self.removed: list[str] = []
+        self.adopted = 0
+        self.llm_dirty: list[int] = []
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.patched or self.added or self.removed or self.llm_dirty)
+
+
+def plan_stage(stage: Stage, upstream: list[dict], up_keys: list[str], downstream: list[dict], state: dict, model: str) -> StagePlan:
+    plan = StagePlan()
+    down_by_key = dict(zip(question_keys(downstream), downstream))
+    questions = state["questions"]
+    for key, up in zip(up_keys, upstream):
+        derived = stage.derive(up)
+        src_fp = fingerprint(derived)
+        rec = questions.get(key, {}).get(stage.name)
+        # 整题指纹未变时沿用记录的字段指纹，只对变了的题逐字段比对
+        if rec is not None and rec.get("src") == src_fp:
+            field_fps = rec["fields"]
+        else:
+            field_fps = {f: fingerprint(v) for f, v in derived.items()}
+        item = down_by_key.pop(key, None)
+        if item is None:
+            # 新题：整题派生，需要 LLM 的阶段必须调用
+            item = dict(derived)
+            plan.added.append(key)
+            llm_fp = None
+        elif rec is None:
+            # 首次记录：认可现有产物
+            plan.adopted += 1
+            llm_fp = stage.llm_fingerprint(item, model)
+        else:
+            stale = [f for f, fp in field_fps.items() if rec["fields"].get(f) != fp]
+            if stale:
+                item = {**item, **{f: derived[f] for f in stale}}
+                plan.patched[key] = stale
+            llm_fp = rec.get("llm")
+        if stage.llm_inputs and llm_fp != stage.llm_fingerprint(item, model):
+            plan.llm_dirty.append(len(plan.items))
+        plan.items.append(item)
+        plan.keys.append(key)
+        plan.records.append({"src": src_fp, "fields": field_fps, "llm": llm_fp})
+    plan.removed = list(down_by_key)
+    return plan
+
+
+async def _run_llm(stage: Stage, client, items: list[dict], args) -> list[dict]:
+    """对需重算的题按 token 预算装批调用对应阶段的批量函数，返回更新后的题（顺序不变）。"""
+    if stage.name == "bilingual":
+        batcher = AdaptiveBatcher(
+            translate_stage.estimate_input_tokens, translate_stage.estimate_output_tokens, output_budget=args.batch_tokens, metrics=client.metrics
+        )
+        func = lambda chunk: translate_stage.translate_batch(client, chunk, batcher)
+    else:
+        batcher = AdaptiveBatcher(
+            enrich_stage.estimate_input_tokens, enrich_stage.estimate_output_tokens, output_budget=args.batch_tokens, metrics=client.metrics
+        )
+        glossary_keys = enrich_stage.load_glossary_keys()
+        func = lambda chunk: enrich_stage.enrich_batch(client, chunk, glossary_keys, batcher)
+    chunks = batcher.split(items)
+    client.plan(len(chunks))
+    results = await map_ordered(func, chunks)
+    return [item for chunk in results for item in chunk]
+
+
+def describe(stage: Stage, plan: StagePlan) -> str:
+    parts = []
+    if plan.adopted:
+        parts.append(f"首次记录 {plan.adopted} 题")
+    if plan.added:
+        parts.append(f"新增 {len(plan.added)} 题")
+    if plan.removed:
+        parts.append(f"删除 {len(plan.removed)} 题（{','.join(plan.removed[:10])}）")
+    if plan.patched:
+        fields = sorted({f for fs in plan.patched.values() for f in fs})
+        sample = ",".join(list(plan.patched)[:10])
+        parts.append(f"修补 {len(plan.patched)} 题的 {'/'.join(fields)}（{sample}{'...' if len(plan.patched) > 10 else ''}）")
+    if plan.llm_dirty:
+        sample = ",".join(plan.keys[i] for i in plan.llm_dirty[:10])
+        parts.append(f"需调用 API {len(plan.llm_dirty)} 题（{sample}{'...' if len(plan.llm_dirty) > 10 else ''}）")
+    return f"  [{stage.name}] " + ("；".join(parts) if parts else "无变化")
+
+
+async def _rebuild(args):
+    started = time.monotonic()
+    state = load_state()
+    upstream = load_list(RAW_PATH)
+    if not upstream:
+        print(f"输入文件不存在或为空: {RAW_PATH}")
+        sys.exit(1)
+    up_keys = question_keys(upstream)
+    client = None
+    writes: list[tuple[Path, list[dict]]] = []
+    try:
+        for stage in STAGES:
+            plan = plan_stage(stage, upstream, up_keys, load_list(stage.path), state, DEFAULT_MODEL)
+            print(describe(stage, plan))
+            if plan.llm_dirty and not args.dry_run and not args.no_llm:
+                if client is None:
+                    client = create_client(args, stage="rebuild")
+                todo = [plan.items[i] for i in plan.llm_dirty]
+                done = await _run_llm(stage, client, todo, args)
+                for i, src, out in zip(plan.llm_dirty, todo, done):
+                    plan.items[i] = {**src, **{f: out[f] for f in stage.llm_outputs if f in out}}
+                    if stage.is_done(plan.items[i]):
+                        plan.records[i]["llm"] = stage.llm_fingerprint(src, DEFAULT_MODEL)
+            for key, rec in zip(plan.keys, plan.records):
+                state["questions"].setdefault(key, {})[stage.name] = rec
+            if plan.changed:
+                writes.append((stage.path, plan.items))
+            upstream, up_keys = plan.items, plan.keys
+    finally:
+        if client:
+            client.close()
+
+    if args.dry_run:
+        print(f"--dry-run：未写回（比对耗时 {time.monotonic() - started:.2f} 秒）")
+        return
+    for key in set(state["questions"]) - set(up_keys):
+        del state["questions"][key]
+    for path, items in writes:
+        atomic_write_json(path, items)
+        print(f"已写入: {path}，共 {len(items)} 题")
+    atomic_write_json(STATE_PATH, state, indent=None)
+    print(f"增量重建完成，耗时 {time.monotonic() - started:.2f} 秒")
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="按内容指纹增量重建 bilingual / enriched / questions_v2")
+    parser.add_argument("--dry-run", action="store_true", help="只列出将修补的字段与需调用 API 的题，不写回")
+    parser.add_argument("--no-llm", action="store_true", help="不调用 API，只同步不需重算的字段")
+    add_llm_args(parser)
+    add_batch_args(parser)
+    args = parser.parse_args()
+    run_llm(_rebuild(args))
+
+
+if __name__ == "__main__":
+    main()
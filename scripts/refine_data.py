@@ -5,6 +5,9 @@ refine_data.py - 将题目转换为多选兼容格式
 1. 识别多选：best_answer/official_answer 含多个字母，或题干含「选择两个」等关键词
 2. 字段重构：best_answer/official_answer 转为字符串数组，增加 is_multiple、answer_count
 3. 多选解析：确保 explanation.why_correct 覆盖所有正确项说明
+
+逐题逻辑注册为 postprocess.py 的 refine 变换（在其它后处理之后，由 v2 生成 questions_v2_refined.json）；
+本脚本可指定任意输入/输出文件单独运行。
 """
 
 import json
@@ -12,6 +15,8 @@ import re
 import sys
 from pathlib import Path
 
+from postprocess import transform
+
 # 题干中表示多选的关键词（不区分大小写匹配）
 MULTIPLE_KEYWORDS = [
     "选择两个", "选择三个", "选择四个",
@@ -100,9 +105,10 @@ def refine_question(q):
     official_list = answer_to_list(official_raw) if official_raw is not None else []
 
     # 若解析结果为空，保留原样为单元素列表（兼容异常数据）
-    if not best_list and best_raw is not None:
+    # 原值已是空列表时保持为空（str([]) 会得到 "["）
+    if not best_list and best_raw is not None and not isinstance(best_raw, list):
         best_list = [str(best_raw).strip().upper()[0]] if str(best_raw).strip() else []
-    if not official_list and official_raw is not None:
+    if not official_list and official_raw is not None and not isinstance(official_raw, list):
         official_list = [str(official_raw).strip().upper()[0]] if str(official_raw).strip() else []
 
     is_multiple = is_multiple_question(q, best_list, official_list)
@@ -122,6 +128,11 @@ def refine_question(q):
     return out
 
 
+@transform("refine", files=("v2",), order=90, output="v2_refined")
+def refine(q, file, key, ctx):
+    return refine_question(q)
+
+
 def main():
     script_dir = Path(__file__).resolve().parent
     repo_root = script_dir.parent
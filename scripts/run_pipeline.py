@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+阶段 2→3→4 流水线：翻译完一批就交给打标，打标完一批就并入 App 输出，不再等上一阶段整份 JSON 写完。
+全新题库的总耗时接近最慢的那个阶段，而不是翻译 + 打标 + 生成三者之和。
+
+- 翻译（translate_en_to_cn）与打标（add_tags_and_explanation）各用一个客户端、各自 --concurrency 个 worker，
+  两者之间是有界队列（--queue-batches 批）：打标跟不上时翻译自动停下等待，不会把配额全花在翻译上；
+- 每批完成即追加到两个阶段原有的断点日志（.translate_progress.jsonl / .enrich_progress.jsonl），
+  中断后 --resume 续跑，也可以改用单独的脚本 --resume 接着跑；
+- 打标完成的题按题号收集，连续完成的前缀每隔 --build-every 秒写一次旁路文件 questions_v2.partial.json
+  （build_app_questions.to_app_item），中断（配额用尽、Ctrl-C、出错）时也只写旁路文件，已发布的 questions_v2.json 不变；
+- 全部完成后写出 questions_bilingual.json、questions_bilingual_enriched.json 与 questions_v2.json（并删除旁路文件），与逐阶段运行的结果一致。
+阶段 1（extract_pdf_en.py）是本地解析、很快，仍先单独运行生成 raw_questions_en.json。
+
+用法:
+  export GEMINI_API_KEY="你的API密钥"
+  python3 scripts/run_pipeline.py
+  python3 scripts/run_pipeline.py --limit 20          # 试跑前 20 题
+  python3 scripts/run_pipeline.py --resume            # 从两个阶段的断点继续
+  python3 scripts/run_pipeline.py --concurrency 4 --queue-batches 8 --build-every 60
+"""
+
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+import add_tags_and_explanation as enrich_stage
+import build_app_questions as build_stage
+import translate_en_to_cn as translate_stage
+from checkpoint import ProgressJournal, atomic_write_json
+from llm_batch import AdaptiveBatcher, add_batch_args
+from llm_client import add_llm_args, create_client, map_ordered, run_llm
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_INPUT = translate_stage.DEFAULT_INPUT
+DEFAULT_BILINGUAL = translate_stage.DEFAULT_OUTPUT
+DEFAULT_ENRICHED = enrich_stage.DEFAULT_OUTPUT
+DEFAULT_APP_OUTPUT = build_stage.DEFAULT_OUTPUT
+# 翻译 → 打标队列最多积压的批数
+DEFAULT_QUEUE_BATCHES = 8
+# 每隔多少秒把已完成的前缀写入 App 输出
+DEFAULT_BUILD_EVERY = 30.0
+
+
+def partial_path(path: Path) -> Path:
+    """运行中快照的旁路文件：questions_v2.json -> questions_v2.partial.json。"""
+    return path.with_name(f"{path.stem}.partial{path.suffix}")
+
+
+class IncrementalBuild:
+    """按题号收集打标完成的题；从第 0 题起连续完成的部分每隔 every 秒转成 App 格式写到旁路文件，
+    finish() 时才写入正式输出。"""
+
+    def __init__(self, path: Path, every: float):
+        self.path = path
+        self.partial = partial_path(path)
+        self.every = every
+        self.items: dict[int, dict] = {}
+        self.app_items: list[dict] = []
+        self._last_flush = time.monotonic()
+
+    def add(self, start: int, items: list[dict]):
+        for k, item in enumerate(items):
+            self.items[start + k] = item
+        while len(self.app_items) in self.items:
+            self.app_items.append(build_stage.to_app_item(self.items[len(self.app_items)]))
+        if self.every > 0 and time.monotonic() - self._last_flush >= self.every:
+            self.flush()
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+        if self.app_items:
+            atomic_write_json(self.partial, self.app_items)
+
+    def finish(self):
+        """全部完成后写正式输出并删除旁路文件。"""
+        atomic_write_json(self.path, self.app_items)
+        if self.partial.exists():
+            self.partial.unlink()
+
+
+class Pipeline:
+    def __init__(self, args, raw: list[dict], app_output: Path):
+        self.args = args
+        self.raw = raw
+        self.t_client = create_client(args, stage="pipeline_translate")
+        self.e_client = create_client(args, stage="pipeline_enrich")
+        self.t_batcher = AdaptiveBatcher(
+            translate_stage.estimate_input_tokens,
+            translate_stage.estimate_output_tokens,
+            output_budget=args.batch_tokens,
+            metrics=self.t_client.metrics,
+        )
+        self.e_batcher = AdaptiveBatcher(
+            enrich_stage.estimate_input_tokens,
+            enrich_stage.estimate_output_tokens,
+            output_budget=args.batch_tokens,
+            metrics=self.e_client.metrics,
+        )
+        self.t_journal = ProgressJournal(translate_stage.PROGRESS_FILE, legacy_path=translate_stage.LEGACY_PROGRESS_FILE)
+        self.e_journal = ProgressJournal(enrich_stage.PROGRESS_FILE, legacy_path=enrich_stage.LEGACY_PROGRESS_FILE)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, args.queue_batches))
+        self.build = IncrementalBuild(app_output, args.build_every)
+        self.glossary_keys = enrich_stage.load_glossary_keys()
+        self.translated: dict[int, dict] = {}
+        self.enriched: dict[int, dict] = {}
+        self.end = 0
+
+    def close(self):
+        self.t_client.close()
+        self.e_client.close()
+
+    def _status(self) -> str:
+        return f"  [流水线] 翻译 {len(self.translated)}/{self.end}，打标 {len(self.enriched)}/{self.end}，队列 {self.queue.qsize()}/{self.queue.maxsize} 批"
+
+    def restore(self) -> tuple[int, int]:
+        """按 --resume 读回两个阶段的断点，返回 (翻译起点, 打标起点)。"""
+        if not self.args.resume:
+            # 从头开始时清掉旧日志，避免新旧记录混在一起
+            self.t_journal.remove()
+            self.e_journal.remove()
+            return 0, 0
+        translated = self.t_journal.load()
+        enriched = self.e_journal.load()
+        # 打标断点走在翻译前面（如翻译已单独跑完、断点已删除）时，打标结果本身含译文
+        if len(enriched) > len(translated):
+            translated = enriched + translated[len(enriched) :]
+        self.translated.update(enumerate(translated))
+        self.enriched.update(enumerate(enriched))
+        self.build.add(0, enriched)
+        if translated:
+            print(f"从进度恢复: 已翻译 {len(translated)} 题，已打标 {len(enriched)} 题")
+        return len(translated), len(enriched)
+
+    async def _translate_worker(self, cursor: list[int]):
+        src = self.raw[: self.end]
+        while cursor[0] < self.end:
+            start = cursor[0]
+            cursor[0] = self.t_batcher.take(src, start)
+            translated = await translate_stage.translate_batch(self.t_client, src[start : cursor[0]], self.t_batcher)
+            self.t_journal.append(start, translated)
+            self.translated.update((start + k, item) for k, item in enumerate(translated))
+            # 队列满时在此等待：打标跟不上，翻译就先停下
+            await self.queue.put((start, translated))
+            print(self._status())
+
+    async def translate(self, t_start: int, e_start: int):
+        # 已翻译、未打标的题（续跑时）先排进队列
+        pending = [self.translated[i] for i in range(e_start, t_start)]
+        offset = e_start
+        for chunk in self.e_batcher.split(pending):
+            await self.queue.put((offset, chunk))
+            offset += len(chunk)
+        cursor = [t_start]
+        await asyncio.gather(*(self._translate_worker(cursor) for _ in range(self.t_client.concurrency)))
+        for _ in range(self.e_client.concurrency):
+            await self.queue.put(None)
+
+    def _on_enriched(self, start: int, enriched: list[dict]):
+        self.e_journal.append(start, enriched)
+        self.enriched.update((start + k, item) for k, item in enumerate(enriched))
+        self.build.add(start, enriched)
+        print(self._status())
+
+    async def _enrich_worker(self):
+        while True:
+            batch = await self.queue.get()
+            if batch is None:
+                return
+            start, items = batch
+            # 翻译批按打标的 token 预算重新切分（打标输出更长，批通常更小）
+            chunks = self.e_batcher.split(items)
+            offsets = [start + sum(len(c) for c in chunks[:k]) for k in range(len(chunks))]
+            await map_ordered(
+                lambda chunk: enrich_stage.enrich_batch(self.e_client, chunk, self.glossary_keys, self.e_batcher),
+                chunks,
+                lambda k, enriched: self._on_enriched(offsets[k], enriched),
+            )
+
+    async def enrich(self):
+        await asyncio.gather(*(self._enrich_worker() for _ in range(self.e_client.concurrency)))
+
+    async def run(self, limit: int):
+        t_start, e_start = self.restore()
+        self.end = len(self.raw) if limit <= 0 else min(t_start + limit, len(self.raw))
+        print(
+            f"翻译每批约 {self.t_batcher.output_budget}、打标每批约 {self.e_batcher.output_budget} 输出 token，"
+            f"各 {self.t_client.concurrency} 个并发，队列上限 {self.queue.maxsize} 批"
+        )
+        self.t_client.plan(len(self.t_batcher.split(self.raw[t_start : self.end])))
+        self.e_client.plan(len(self.e_batcher.split(self.raw[e_start : self.end])))
+        stages = [asyncio.ensure_future(self.translate(t_start, e_start)), asyncio.ensure_future(self.enrich())]
+        try:
+            done, pending = await asyncio.wait(stages, return_when=asyncio.FIRST_EXCEPTION)
+            for task in pending:
+                task.cancel()
+            for task in done:
+                task.result()
+        finally:
+            # 中断（含配额用尽）时也把已完成的前缀写进旁路文件，正式输出只在全部完成后由 _run 写入
+            self.build.flush()
+
+
+async def _run(args, input_path: Path, bilingual_path: Path, enriched_path: Path, app_path: Path):
+    with open(input_path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    if not isinstance(raw, list):
+        raw = [raw]
+
+    pipeline = Pipeline(args, raw, app_path)
+    print(f"使用: Gemini 2 Flash Lite（翻译 → 打标 → App 输出流水线），已加载 glossary 键数: {len(pipeline.glossary_keys)}")
+    started = time.monotonic()
+    try:
+        await pipeline.run(args.limit)
+    finally:
+        pipeline.close()
+
+    end = pipeline.end
+    with open(bilingual_path, "w", encoding="utf-8") as f:
+        json.dump([pipeline.translated[i] for i in range(end)], f, ensure_ascii=False, indent=2)
+    with open(enriched_path, "w", encoding="utf-8") as f:
+        json.dump([pipeline.enriched[i] for i in range(end)], f, ensure_ascii=False, indent=2)
+    pipeline.build.finish()
+    pipeline.t_journal.remove()
+    pipeline.e_journal.remove()
+    print(f"已写入: {bilingual_path}、{enriched_path}、{app_path}，共 {end} 题（耗时 {time.monotonic() - started:.0f} 秒）")
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="翻译 → 打标 → 生成 App 数据的流水线（各阶段按批衔接）")
+    parser.add_argument("input", nargs="?", default=str(DEFAULT_INPUT), help="输入 JSON（raw_questions_en.json）")
+    parser.add_argument("--bilingual", type=str, default=str(DEFAULT_BILINGUAL), help="翻译结果输出路径")
+    parser.add_argument("--enriched", type=str, default=str(DEFAULT_ENRICHED), help="打标结果输出路径")
+    parser.add_argument("--app-output", type=str, default=str(DEFAULT_APP_OUTPUT), help="App 用 questions_v2.json 输出路径")
+    parser.add_argument("--resume", action="store_true", help="从两个阶段的断点继续")
+    parser.add_argument("--limit", type=int, default=0, help="最多处理题数（0=全部）")
+    parser.add_argument("--queue-batches", type=int, default=DEFAULT_QUEUE_BATCHES, help=f"翻译 → 打标队列最多积压的批数（默认 {DEFAULT_QUEUE_BATCHES}）")
+    parser.add_argument("--build-every", type=float, default=DEFAULT_BUILD_EVERY, help=f"每隔多少秒把已完成的前缀写入旁路文件 *.partial.json（默认 {DEFAULT_BUILD_EVERY:g}，0=只在结束或中断时写）")
+    add_llm_args(parser)
+    add_batch_args(parser)
+    args = parser.parse_args()
+
+    input_path = Path(args.input).resolve()
+    if not input_path.exists():
+        print(f"输入文件不存在: {input_path}")
+        print("请先运行: python3 scripts/extract_pdf_en.py 生成 raw_questions_en.json")
+        sys.exit(1)
+    paths = [Path(p).resolve() for p in (args.bilingual, args.enriched, args.app_output)]
+    for p in paths:
+        p.parent.mkdir(parents=True, exist_ok=True)
+
+    run_llm(_run(args, input_path, *paths))
+
+
+if __name__ == "__main__":
+    main()
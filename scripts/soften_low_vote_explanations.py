@@ -2,9 +2,10 @@
 """
 对社区投票率 < 60% 的题目，将解析改为更谨慎的表述：
 - 不断定某答案一定正确/错误，而是建议用户上网搜索、结合权威资料自行判断，避免被参考答案误导。
+逐题逻辑注册为 postprocess.py 的 soften_low_vote 变换；本脚本只执行这一个变换。
 """
-import json
-import os
+
+from postprocess import ENRICHED_PATH, V2_PATH, run, transform
 
 THRESHOLD = 60
 CAUTION_SUFFIX = (
@@ -69,31 +70,21 @@ def process_explanation(explanation, answer_str):
     return out
 
 
-def process_file(path, use_best_answer=True):
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    updated = 0
-    for q in data:
-        if not is_low_vote(q):
-            continue
-        if not q.get("explanation") or not isinstance(q["explanation"], dict):
-            continue
-        answer = get_answer(q, use_best=use_best_answer)
-        q["explanation"] = process_explanation(q["explanation"], answer)
-        updated += 1
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    return updated
+@transform("soften_low_vote", order=30)
+def soften_low_vote(q, file, key, ctx):
+    """低投票率的题改为谨慎表述（v2 用 best_answer，enriched 用 correct_answer）。"""
+    if not is_low_vote(q):
+        return {}
+    if not q.get("explanation") or not isinstance(q["explanation"], dict):
+        return {}
+    answer = get_answer(q, use_best=file == "v2")
+    return {"explanation": process_explanation(q["explanation"], answer)}
 
 
 def main():
-    base = os.path.join(os.path.dirname(__file__), "..", "public", "data")
-    v2_path = os.path.join(base, "questions_v2.json")
-    enriched_path = os.path.join(base, "questions_bilingual_enriched.json")
-    v2_n = process_file(v2_path, use_best_answer=True)
-    enriched_n = process_file(enriched_path, use_best_answer=False)
-    print(f"questions_v2.json: {v2_n} 条低投票率题目解析已改为谨慎表述")
-    print(f"questions_bilingual_enriched.json: {enriched_n} 条低投票率题目解析已改为谨慎表述")
+    report = run(["soften_low_vote"], files={"v2": V2_PATH, "enriched": ENRICHED_PATH})
+    print(f"questions_v2.json: {report.changed('soften_low_vote', 'v2')} 条低投票率题目解析已改为谨慎表述")
+    print(f"questions_bilingual_enriched.json: {report.changed('soften_low_vote', 'enriched')} 条低投票率题目解析已改为谨慎表述")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+标签规范化：LLM 打的标签写法不一（"Amazon S3" / "S3"、"Application Load Balancer (ALB)" / "ALB"、
+"Read Replica" / "Read Replicas"），同一考点被拆成多个标签。按以下顺序把每个标签映射到规范名：
+
+1. 合并空白，去掉 "Amazon " / "AWS " 前缀与末尾的括号缩写（"Elastic File System (Amazon EFS)" -> "Elastic File System"）；
+2. 查别名表 public/data/tag_aliases.json（规范名 -> 别名列表，手工维护，只需列真正的同义词/缩写）；
+3. 表中没有的，只差大小写或末词单复数的写法合并为题数最多的那个（两种写法都出现在题库中时才合并）。
+
+比较时忽略大小写与末词单复数，别名表里写任一形式即可。build_app_questions.py --tag-index 用它生成标签倒排索引。
+
+用法:
+  python3 scripts/tag_aliases.py                   # 报告：规范化前后标签数、合并最多的标签、别名表中未用到的别名
+  python3 scripts/tag_aliases.py --json tag_map.json   # 原标签 -> 规范名 另存为 JSON
+"""
+import json
+import re
+import sys
+from collections import Counter
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DATA_DIR = REPO_ROOT / "public" / "data"
+QUESTIONS_PATH = DATA_DIR / "questions_v2.json"
+TAG_ALIASES_PATH = DATA_DIR / "tag_aliases.json"
+PREFIXES = ("Amazon", "AWS")
+# 报告中列出的条目数
+REPORT_TOP = 20
+
+
+def base_tag(tag: str) -> str:
+    """合并空白，去掉厂商前缀与末尾括号（去掉后为空时保留原样）。"""
+    words = (tag or "").split()
+    while len(words) > 1 and words[0] in PREFIXES:
+        words = words[1:]
+    text = " ".join(words)
+    stripped = re.sub(r"\s*\([^()]*\)$", "", text)
+    return stripped or text
+
+
+def _singular(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def fold(tag: str) -> str:
+    """比较用的键：去前缀、忽略大小写、末词取单数。"""
+    words = base_tag(tag).casefold().split()
+    if words:
+        words[-1] = _singular(words[-1])
+    return " ".join(words)
+
+
+def load_aliases(path: Path = TAG_ALIASES_PATH) -> dict[str, list[str]]:
+    try:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def canonical_map(tags, aliases: dict[str, list[str]]) -> dict[str, str]:
+    """原标签 -> 规范名。tags 为题库中全部标签（可重复，出现次数用于挑选代表写法）。"""
+    counts = Counter(t for t in tags if isinstance(t, str) and t.strip())
+    table = {}
+    for canonical, names in aliases.items():
+        for name in [canonical, *names]:
+            table.setdefault(fold(name), canonical)
+    # 别名表以外：同一比较键下出现最多的写法（相同时取字典序最小）作代表
+    variants: dict[str, Counter] = {}
+    for tag, n in counts.items():
+        variants.setdefault(fold(tag), Counter())[base_tag(tag)] += n
+    chosen = {key: min(c.items(), key=lambda kv: (-kv[1], kv[0]))[0] for key, c in variants.items()}
+    return {tag: table.get(fold(tag)) or chosen[fold(tag)] for tag in counts}
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="标签规范化报告")
+    parser.add_argument("--input", type=str, default=str(QUESTIONS_PATH), help="题库 JSON（默认 questions_v2.json）")
+    parser.add_argument("--aliases", type=str, default=str(TAG_ALIASES_PATH), help="别名表 JSON")
+    parser.add_argument("--json", type=str, default="", help="原标签 -> 规范名 另存为 JSON")
+    args = parser.parse_args()
+
+    input_path = Path(args.input)
+    if not input_path.exists():
+        print(f"文件不存在: {input_path}")
+        sys.exit(1)
+    questions = json.loads(input_path.read_text(encoding="utf-8"))
+    aliases = load_aliases(Path(args.aliases))
+    tags = [t for q in questions for t in q.get("tags") or []]
+    mapping = canonical_map(tags, aliases)
+
+    groups: dict[str, list[str]] = {}
+    for tag, canonical in mapping.items():
+        groups.setdefault(canonical, []).append(tag)
+    merged = sorted(((c, ts) for c, ts in groups.items() if len(ts) > 1), key=lambda g: (-len(g[1]), g[0]))
+    print(f"标签: {len(mapping)} 个 → 规范化后 {len(groups)} 个（别名表 {len(aliases)} 组，合并了 {len(merged)} 组写法）")
+    for canonical, members in merged[:REPORT_TOP]:
+        print(f"  {canonical} ← {'，'.join(sorted(t for t in members if t != canonical))}")
+    used = {fold(t) for t in mapping}
+    unused = [name for canonical, names in aliases.items() for name in names if fold(name) not in used]
+    if unused:
+        print(f"  别名表中未出现在题库里的别名 {len(unused)} 个: " + "，".join(unused[:REPORT_TOP]))
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(mapping, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"已写入: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+术语匹配：把 glossary.json 的全部键编译成一个 Aho-Corasick 自动机，一遍扫描题干、选项、解析（中英文），
+得到每题确切的术语出现位置，据此给出不经 LLM 的确定性 related_terms，并在构建时报告术语覆盖情况。
+
+- 规范化逐字符进行（NFKC 全角转半角 + casefold 忽略大小写），结果多于一个字符的字符保持原样，
+  因此规范化后的下标与原文一一对应，匹配结果 (start, length) 可直接切原文；
+- 扫描耗时与文本长度成正比，与术语个数无关（10 万题也只是线性增长）；
+- 只取「最左、最长、互不重叠」的匹配（最早出现的优先，同一位置取最长的术语）；
+- 以英文字母或数字开头/结尾的术语要求两侧不是英文字母或数字（"S3" 不匹配 "S3a"，"IAM" 不匹配 "DIAMOND"），中文术语不受限制；
+- exact=True 时不做规范化、不要求词边界、术语原样（不去空白），分段与 components/HighlightTerms.tsx 的
+  segmentByTerms 逐字符一致，供 build_app_questions.py --highlights 使用；
+- 规范化后相同的键（如 "FSx" 与 "fsx"）共用一个模式，原文与其中某个键完全相同时返回该键，否则返回先出现的键；
+- term_question_ids() 给出 术语 -> 引用它的题号，供 build_app_questions.py --term-index 与 fill_glossary.py 的优先级使用；
+- 注册为 postprocess 变换 related_terms（默认不执行，需 --only related_terms）：按术语在题中首次出现的顺序重写 related_terms，
+  跳过题库中超过 COMMON_TERM_SHARE 的题都出现的泛用词（"AWS"、"存储"、"实例" 等），最多 MAX_RELATED_TERMS 个。
+
+用法:
+  python3 scripts/term_matcher.py                     # 覆盖报告：命中的题数、从未出现的术语、与现有 related_terms 的差异
+  python3 scripts/term_matcher.py --json coverage.json
+  python3 scripts/term_matcher.py --id 42             # 查看某题的术语出现位置
+  python3 scripts/postprocess.py --only related_terms --dry-run
+"""
+import json
+import sys
+import time
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+
+from postprocess import transform
+from question_store import question_keys
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DATA_DIR = REPO_ROOT / "public" / "data"
+QUESTIONS_PATH = DATA_DIR / "questions_v2.json"
+GLOSSARY_PATH = DATA_DIR / "glossary.json"
+# 扫描的字段，也是 related_terms 中术语的排列顺序（按首次出现）
+TEXT_FIELDS = ("question_cn", "options_cn", "explanation", "question_en", "options_en")
+# 出现在超过该比例题目中的术语视为泛用词，不计入 related_terms
+COMMON_TERM_SHARE = 0.15
+MAX_RELATED_TERMS = 12
+# 报告中列出的条目数
+REPORT_TOP = 20
+
+
+@lru_cache(maxsize=None)
+def normalize_char(ch: str) -> str:
+    """NFKC + casefold；结果不是单个字符时（如 "ß" -> "ss"）退回 lower()，仍不是则保持原样，保证下标不变。"""
+    out = unicodedata.normalize("NFKC", ch).casefold()
+    if len(out) == 1:
+        return out
+    out = ch.lower()
+    return out if len(out) == 1 else ch
+
+
+def normalize(text: str) -> str:
+    """逐字符规范化，返回与 text 等长的字符串。"""
+    if text.isascii():
+        return text.lower()
+    return "".join(map(normalize_char, text))
+
+
+def _is_word(ch: str) -> bool:
+    return ch.isascii() and ch.isalnum()
+
+
+def field_texts(q: dict, fields: tuple = TEXT_FIELDS):
+    """按字段顺序产出 (路径, 文本)；对象字段展开为 "options_cn.A"、"explanation.analysis"。"""
+    for field in fields:
+        value = q.get(field)
+        if isinstance(value, str):
+            if value:
+                yield field, value
+        elif isinstance(value, dict):
+            for sub, text in value.items():
+                if isinstance(text, str) and text:
+                    yield f"{field}.{sub}", text
+
+
+class TermMatcher:
+    """多模式匹配自动机。terms 中规范化后相同的术语共用一个模式（先出现的为代表，其余记入 duplicates）。
+    exact=True 时区分大小写与全角/半角、不要求词边界，只有完全相同的术语才合并。"""
+
+    def __init__(self, terms, exact: bool = False):
+        self.exact = exact
+        self.terms: list[str] = []
+        # 被合并的术语 -> 代表术语
+        self.duplicates: dict[str, str] = {}
+        # 模式下标 -> 规范化后相同的全部术语（只记有重复的）
+        self._variants: dict[int, set[str]] = {}
+        self._goto: list[dict[str, int]] = [{}]
+        self._term_of: list[int] = [-1]
+        seen: dict[str, int] = {}
+        for term in terms:
+            term = (term or "") if exact else (term or "").strip()
+            if not term:
+                continue
+            key = term if exact else normalize(term)
+            if key in seen:
+                if self.terms[seen[key]] != term:
+                    self.duplicates[term] = self.terms[seen[key]]
+                    self._variants.setdefault(seen[key], {self.terms[seen[key]]}).add(term)
+                continue
+            seen[key] = len(self.terms)
+            self.terms.append(term)
+            node = 0
+            for ch in key:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._term_of.append(-1)
+                node = nxt
+            self._term_of[node] = seen[key]
+        self._lengths = [len(t) for t in self.terms]
+        self._bounded = [(False, False) if exact else (_is_word(t[0]), _is_word(t[-1])) for t in self.terms]
+        self._build_links()
+
+    def _build_links(self):
+        """BFS 计算失败指针，并把失败链上的输出合并到每个节点（扫描时不必再沿链查找）。"""
+        goto = self._goto
+        self._fail = fail = [0] * len(goto)
+        self._out = out = [(t,) if t >= 0 else () for t in self._term_of]
+        queue = list(goto[0].values())
+        for node in queue:
+            for ch, child in goto[node].items():
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[child] = goto[f].get(ch, 0)
+                out[child] = out[child] + out[fail[child]]
+                queue.append(child)
+
+    @classmethod
+    def from_glossary(cls, path: Path = GLOSSARY_PATH) -> "TermMatcher":
+        return cls(glossary_keys(path))
+
+    def find_all(self, text: str) -> list[tuple[int, int, str]]:
+        """全部出现（含重叠），按 (start, -length) 排序；已按英文术语的词边界过滤。"""
+        norm = text if self.exact else normalize(text)
+        goto, fail, out = self._goto, self._fail, self._out
+        lengths, bounded = self._lengths, self._bounded
+        n = len(norm)
+        found = []
+        node = 0
+        for i, ch in enumerate(norm):
+            while True:
+                nxt = goto[node].get(ch)
+                if nxt is not None:
+                    node = nxt
+                    break
+                if not node:
+                    break
+                node = fail[node]
+            for t in out[node]:
+                start = i - lengths[t] + 1
+                left, right = bounded[t]
+                if left and start > 0 and _is_word(norm[start - 1]):
+                    continue
+                if right and i + 1 < n and _is_word(norm[i + 1]):
+                    continue
+                found.append((start, lengths[t], t))
+        found.sort(key=lambda m: (m[0], -m[1]))
+        variants, terms = self._variants, self.terms
+        out = []
+        for start, length, t in found:
+            term = terms[t]
+            if t in variants and text[start : start + length] in variants[t]:
+                term = text[start : start + length]
+            out.append((start, length, term))
+        return out
+
+    def find(self, text: str, allowed: set[str] | None = None) -> list[tuple[int, int, str]]:
+        """最左、最长、互不重叠的出现 (start, length, term)；text[start:start+length] 为原文片段。
+        给出 allowed 时只在其中的术语里取（如 HighlightTerms 每题的术语表为 related_terms ∪ glossary）。"""
+        matches = self.find_all(text)
+        if allowed is not None:
+            matches = [m for m in matches if m[2] in allowed]
+        return leftmost_longest(matches)
+
+    def scan(self, q: dict, fields: tuple = TEXT_FIELDS) -> dict[str, list[tuple[int, int, str]]]:
+        """一题各字段的出现位置：路径 -> [(start, length, term)]，没有命中的字段不出现。"""
+        out = {}
+        for path, text in field_texts(q, fields):
+            spans = self.find(text)
+            if spans:
+                out[path] = spans
+        return out
+
+    def terms_in(self, q: dict, fields: tuple = TEXT_FIELDS) -> set[str]:
+        """题中出现过的全部术语（含被更长术语覆盖的，如 "EC2 实例" 中的 "EC2"），重复键归到代表术语。"""
+        return {
+            self.duplicates.get(term, term) for _, text in field_texts(q, fields) for _, _, term in self.find_all(text)
+        }
+
+    def related_terms(self, q: dict, common: set[str] = frozenset(), limit: int = MAX_RELATED_TERMS) -> list[str]:
+        """按 TEXT_FIELDS 顺序、首次出现先后排列的去重术语（高亮的那些），跳过 common，最多 limit 个。"""
+        terms = dict.fromkeys(term for spans in self.scan(q).values() for _, _, term in spans)
+        return [t for t in terms if self.duplicates.get(t, t) not in common][:limit]
+
+
+def segment_by_terms(text: str, terms: list[str]) -> list[tuple[int, int, str]]:
+    """components/HighlightTerms.tsx segmentByTerms 的逐行移植（术语按长度降序，每段对全部术语 find 取最早的），
+    返回术语段 [(start, length, term)]。只作对照与基准用：耗时与术语个数成正比。"""
+    ordered = sorted(filter(None, terms), key=len, reverse=True)
+    spans = []
+    pos = 0
+    while pos < len(text):
+        found = None
+        for term in ordered:
+            idx = text.find(term, pos)
+            if idx != -1 and (found is None or idx < found[1]):
+                found = (term, idx)
+        if found is None:
+            break
+        term, idx = found
+        spans.append((idx, len(term), term))
+        pos = idx + len(term)
+    return spans
+
+
+def glossary_keys(path: Path = GLOSSARY_PATH) -> list[str]:
+    """glossary.json 的键（原样、按文件顺序）；文件不存在或无法解析时为空。"""
+    try:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        data = {}
+    return list(data) if isinstance(data, dict) else []
+
+
+def leftmost_longest(matches: list[tuple[int, int, str]]) -> list[tuple[int, int, str]]:
+    """从按 (start, -length) 排序的全部出现中取最左、最长、互不重叠的。"""
+    spans = []
+    end = 0
+    for start, length, term in matches:
+        if start >= end:
+            spans.append((start, length, term))
+            end = start + length
+    return spans
+
+
+def common_terms(matcher: TermMatcher, questions: list[dict], share: float = COMMON_TERM_SHARE) -> set[str]:
+    """出现在超过 share 比例题目中的术语（代表术语）。"""
+    df = Counter(t for q in questions for t in matcher.terms_in(q))
+    return {t for t, c in df.items() if c > share * len(questions)}
+
+
+def term_question_ids(matcher: TermMatcher, questions: list[dict]) -> dict[str, list[int]]:
+    """术语 -> 引用它的题号（升序、去重），按引用题数从多到少排列。引用指题中出现（含被更长术语覆盖的）
+    或列在 related_terms 中；glossary 的重复键归到代表术语，不在 glossary 中的 related_terms 原样计入。"""
+    refs: dict[str, set[int]] = {}
+    for q in questions:
+        qid = q.get("id")
+        if not isinstance(qid, int):
+            continue
+        terms = matcher.terms_in(q)
+        terms.update(matcher.duplicates.get(t, t) for t in (x.strip() for x in q.get("related_terms") or [] if isinstance(x, str)) if t)
+        for t in terms:
+            refs.setdefault(t, set()).add(qid)
+    return {t: sorted(ids) for t, ids in sorted(refs.items(), key=lambda kv: (-len(kv[1]), kv[0]))}
+
+
+def load_related_context() -> tuple[TermMatcher, set[str]]:
+    matcher = TermMatcher.from_glossary()
+    questions = json.loads(QUESTIONS_PATH.read_text(encoding="utf-8")) if QUESTIONS_PATH.exists() else []
+    return matcher, common_terms(matcher, questions)
+
+
+@transform("related_terms", order=80, context=load_related_context, default=False)
+def related_terms_from_text(q: dict, file: str, key: str, ctx: tuple) -> dict:
+    """related_terms 改为题中确实出现的 glossary 术语（按首次出现顺序，去掉泛用词）。"""
+    matcher, common = ctx
+    terms = matcher.related_terms(q, common)
+    return {"related_terms": terms} if terms != q.get("related_terms") else {}
+
+
+def coverage(matcher: TermMatcher, questions: list[dict]) -> dict:
+    """术语被多少题引用（含被更长术语覆盖的出现）、高亮次数，以及与现有 related_terms 的差异。"""
+    keys = question_keys(questions)
+    glossary = set(matcher.terms) | set(matcher.duplicates)
+    term_questions: Counter = Counter()
+    occurrences: Counter = Counter()
+    no_match, related_total, related_found, related_outside = [], 0, 0, Counter()
+    chars = 0
+    started = time.perf_counter()
+    for key, q in zip(keys, questions):
+        terms = set()
+        for _, text in field_texts(q):
+            chars += len(text)
+            matches = matcher.find_all(text)
+            terms.update(matcher.duplicates.get(t, t) for _, _, t in matches)
+            occurrences.update(matcher.duplicates.get(t, t) for _, _, t in leftmost_longest(matches))
+        term_questions.update(terms)
+        if not terms:
+            no_match.append(key)
+        for t in dict.fromkeys(q.get("related_terms") or []):
+            if t not in glossary:
+                continue
+            related_total += 1
+            if matcher.duplicates.get(t, t) in terms:
+                related_found += 1
+            else:
+                related_outside[t] += 1
+    elapsed = time.perf_counter() - started
+    return {
+        "questions": len(questions),
+        "chars": chars,
+        "scan_seconds": round(elapsed, 3),
+        "terms": len(matcher.terms),
+        "duplicates": matcher.duplicates,
+        "questions_without_terms": no_match,
+        "terms_used": len(term_questions),
+        "unused_terms": [t for t in matcher.terms if t not in term_questions],
+        "term_questions": dict(term_questions.most_common()),
+        "term_occurrences": dict(occurrences.most_common()),
+        "related_in_glossary": related_total,
+        "related_found_in_text": related_found,
+        "related_not_in_text": dict(related_outside.most_common()),
+    }
+
+
+def print_coverage(report: dict, build_seconds: float):
+    n = report["questions"]
+    print(
+        f"自动机：{report['terms']} 个术语（规范化后合并 {len(report['duplicates'])} 个），构建 {build_seconds:.2f} 秒；"
+        f"扫描 {n} 题 / {report['chars']:,} 字符 {report['scan_seconds']:.2f} 秒"
+        f"（{report['chars'] / max(report['scan_seconds'], 1e-9) / 1e6:.1f} M 字符/秒）"
+    )
+    with_terms = n - len(report["questions_without_terms"])
+    print(f"  命中至少一个术语的题: {with_terms}/{n}（{with_terms / max(n, 1):.1%}）")
+    print(f"  出现过的术语: {report['terms_used']}/{report['terms']}，从未出现 {len(report['unused_terms'])} 个")
+    if report["related_in_glossary"]:
+        print(
+            f"  现有 related_terms（glossary 内）在题中出现: {report['related_found_in_text']}/{report['related_in_glossary']}"
+            f"（{report['related_found_in_text'] / report['related_in_glossary']:.1%}）"
+        )
+    print("  引用最多的术语（题数）: " + "，".join(f"{t} {c}" for t, c in list(report["term_questions"].items())[:REPORT_TOP]))
+    if report["unused_terms"]:
+        print(f"  从未出现的术语（前 {REPORT_TOP} 个）: " + "，".join(report["unused_terms"][:REPORT_TOP]))
+    if report["related_not_in_text"]:
+        items = list(report["related_not_in_text"].items())[:REPORT_TOP]
+        print(f"  related_terms 中有、题中未出现（前 {REPORT_TOP} 个）: " + "，".join(f"{t} {c}" for t, c in items))
+    if report["duplicates"]:
+        print("  规范化后重复的键: " + "，".join(f"{a} → {b}" for a, b in report["duplicates"].items()))
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="glossary 术语多模式匹配：题中术语出现位置与覆盖报告")
+    parser.add_argument("--input", type=str, default=str(QUESTIONS_PATH), help="题库 JSON（默认 questions_v2.json）")
+    parser.add_argument("--glossary", type=str, default=str(GLOSSARY_PATH), help="glossary JSON")
+    parser.add_argument("--id", type=int, default=None, help="只打印该题号的术语出现位置")
+    parser.add_argument("--json", type=str, default="", help="覆盖报告另存为 JSON")
+    args = parser.parse_args()
+
+    input_path = Path(args.input)
+    if not input_path.exists():
+        print(f"文件不存在: {input_path}")
+        sys.exit(1)
+    questions = json.loads(input_path.read_text(encoding="utf-8"))
+    started = time.perf_counter()
+    matcher = TermMatcher.from_glossary(Path(args.glossary))
+    build_seconds = time.perf_counter() - started
+    if not matcher.terms:
+        print(f"glossary 为空或无法读取: {args.glossary}")
+        sys.exit(1)
+
+    if args.id is not None:
+        matched = [q for q in questions if q.get("id") == args.id]
+        if not matched:
+            print(f"未找到题号 {args.id}")
+            sys.exit(1)
+        common = common_terms(matcher, questions)
+        for q in matched:
+            texts = dict(field_texts(q))
+            for path, spans in matcher.scan(q).items():
+                print(f"  {path}: " + "，".join(f"{texts[path][s : s + n]}@{s}→{term}" for s, n, term in spans))
+            print(f"  related_terms（文本匹配）: {matcher.related_terms(q, common)}")
+            print(f"  related_terms（现有）: {q.get('related_terms') or []}")
+        return
+
+    report = coverage(matcher, questions)
+    print_coverage(report, build_seconds)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"已写入: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,42 +7,37 @@
   export GEMINI_API_KEY="你的API密钥"
   python3 scripts/translate_en_to_cn.py
   python3 scripts/translate_en_to_cn.py public/data/raw_questions_en.json public/data/questions_bilingual.json
-  python3 scripts/translate_en_to_cn.py --resume  # 从上次进度继续（每 50 题自动断点）
+  python3 scripts/translate_en_to_cn.py --resume  # 从上次进度继续（每批完成即追加到断点日志）
   python3 scripts/translate_en_to_cn.py --limit 5  # 先试跑 5 题
-  python3 scripts/translate_en_to_cn.py --retry-failed  # 只重试失败题，每 15 题一批 API，减少 429
+  python3 scripts/translate_en_to_cn.py --retry-failed  # 只重试失败题（同样按 token 预算多题一批）
+  python3 scripts/translate_en_to_cn.py --no-batch  # 每题单独一个请求（旧流程，请求数多、易 429）
+  python3 scripts/translate_en_to_cn.py --concurrency 8  # 同时在途的请求数（默认 4），见 llm_client.py
 """
 
 import json
-import os
 import re
 import sys
-import time
 from pathlib import Path
 
-# 429/限流时重试：最多重试次数、每次等待秒数
-RETRY_MAX = 4
-RETRY_WAIT_SEC = [60, 120, 180, 300]  # 第 1~4 次重试前等待
-BASE_SLEEP_SEC = 1.0  # 每题之间的基础间隔，降低触发限流
-# --retry-failed 时每批题数，减少 API 调用次数以降低 429
-RETRY_BATCH_SIZE = 15
-
-# 优先使用新版 google-genai；若无则用旧版 google-generativeai
-USE_NEW_GENAI = False
-try:
-    from google import genai as genai_new
-    USE_NEW_GENAI = True
-except ImportError:
-    try:
-        import google.generativeai as genai_old
-    except ImportError:
-        print("请先安装: pip install google-genai  或  pip install google-generativeai")
-        sys.exit(1)
+from checkpoint import ProgressJournal
+from llm_batch import AdaptiveBatcher, add_batch_args, bisect_batch, estimate_tokens, is_truncated, record_poison, salvage_by_id
+from llm_client import SDK_NAMES, add_llm_args, create_client, map_ordered, run_llm
+from question_store import question_keys
+
+# --no-batch 时每处理这么多题保存一次断点
+PROGRESS_SAVE_EVERY = 50
 
 
 REPO_ROOT = Path(__file__).resolve().parent.parent
 DEFAULT_INPUT = REPO_ROOT / "public" / "data" / "raw_questions_en.json"
 DEFAULT_OUTPUT = REPO_ROOT / "public" / "data" / "questions_bilingual.json"
-PROGRESS_FILE = REPO_ROOT / "public" / "data" / ".translate_progress.json"
+# 断点日志：每批完成后追加该批译文（见 checkpoint.py）；旧版整体重写的 .json 断点会自动迁移
+PROGRESS_FILE = REPO_ROOT / "public" / "data" / ".translate_progress.jsonl"
+LEGACY_PROGRESS_FILE = REPO_ROOT / "public" / "data" / ".translate_progress.json"
+# 批量翻译中被二分隔离出的「毒题」题号
+POISON_LOG = REPO_ROOT / "public" / "data" / ".translate_poison_log.jsonl"
+# 修改翻译 prompt 或规则时 +1：rebuild.py 会把所有题标为待重译
+PROMPT_VERSION = 1
 
 # 翻译时保留英文的专有名词/产品名（可增补）；描述性短语译成中文
 KEEP_ENGLISH = (
@@ -65,17 +60,6 @@ MUST_TRANSLATE = (
 )
 
 
-def get_client_or_model():
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        print("请设置环境变量 GEMINI_API_KEY")
-        sys.exit(1)
-    if USE_NEW_GENAI:
-        return genai_new.Client(api_key=api_key), "new"
-    genai_old.configure(api_key=api_key)
-    return genai_old.GenerativeModel("gemini-2.0-flash-lite"), "old"
-
-
 def build_prompt(question_en: str, options_en: dict) -> str:
     opts = "\n".join(f"{k}. {v}" for k, v in sorted(options_en.items()))
     return f"""You are a translator. Translate the following AWS certification exam question and options from English to Simplified Chinese.
@@ -97,13 +81,13 @@ JSON:"""
 
 
 def build_batch_prompt(items: list[dict]) -> str:
-    """多题一批的 prompt，要求返回 JSON 数组，顺序与输入一致。"""
+    """多题一批的 prompt，每题带 id（批内题目键，见 question_keys），要求返回 JSON 数组且每个元素回带 id，便于按 id 取回。"""
     parts = []
-    for i, item in enumerate(items, 1):
+    for i, (key, item) in enumerate(zip(question_keys(items), items), 1):
         q = item.get("question_en", "")
         opts = item.get("options_en", {})
         opts_str = "\n   ".join(f"{k}. {v}" for k, v in sorted(opts.items()))
-        parts.append(f"--- 题目 {i} ---\n题干: {q}\n选项:\n   {opts_str}")
+        parts.append(f"--- 题目 {i} (id: {key}) ---\n题干: {q}\n选项:\n   {opts_str}")
     body = "\n\n".join(parts)
     return f"""You are a translator. Translate the following AWS certification exam questions from English to Simplified Chinese.
 
@@ -112,7 +96,7 @@ Rules:
    Do NOT leave in English: "Storage Optimized", "Cross-Region Replication", or "source" (use 源).
 2. You MUST use these Chinese phrases where applicable: {MUST_TRANSLATE}
 3. Use natural Simplified Chinese for the rest.
-4. Return ONLY a valid JSON array. The array must have exactly {len(items)} elements, in the same order as the input (题目 1 → index 0, 题目 2 → index 1, ...). Each element is an object with exactly two keys: "question_cn" (string), "options_cn" (object with keys A, B, C, D).
+4. Return ONLY a valid JSON array. The array must have exactly {len(items)} elements, in the same order as the input (题目 1 → index 0, 题目 2 → index 1, ...). Each element is an object with exactly three keys: "id" (the question's id, copied from the input), "question_cn" (string), "options_cn" (object with keys A, B, C, D).
 
 Input:
 
@@ -121,6 +105,19 @@ Input:
 JSON array:"""
 
 
+def estimate_input_tokens(item: dict) -> int:
+    """单题在批量 prompt 中占用的输入 token（题干 + 选项 + 分隔行）。"""
+    opts = item.get("options_en") or {}
+    return estimate_tokens(item.get("question_en", "")) + sum(estimate_tokens(v) for v in opts.values()) + 20
+
+
+def estimate_output_tokens(item: dict) -> int:
+    """单题译文的输出 token：英译中后 token 数约为原文 1.8 倍，另加 JSON 键名开销。"""
+    opts = item.get("options_en") or {}
+    src = estimate_tokens(item.get("question_en", "")) + sum(estimate_tokens(v) for v in opts.values())
+    return int(src * 1.8) + 30
+
+
 def parse_response(text: str) -> dict | None:
     text = text.strip()
     # 去掉可能的 markdown 代码块
@@ -133,32 +130,15 @@ def parse_response(text: str) -> dict | None:
         return None
 
 
-def parse_batch_response(text: str, expected_len: int) -> list[dict] | None:
-    """解析多题一批的 JSON 数组，长度须与 expected_len 一致。"""
-    text = text.strip()
-    if text.startswith("```"):
-        text = re.sub(r"^```(?:json)?\s*", "", text)
-        text = re.sub(r"\s*```\s*$", "", text)
-    try:
-        arr = json.loads(text)
-        if not isinstance(arr, list) or len(arr) != expected_len:
-            return None
-        for i, o in enumerate(arr):
-            if not isinstance(o, dict) or "question_cn" not in o or "options_cn" not in o:
-                return None
-        return arr
-    except (json.JSONDecodeError, TypeError):
+def _normalize_translation(o: dict) -> dict | None:
+    if "question_cn" not in o or "options_cn" not in o:
         return None
+    return {"question_cn": o["question_cn"], "options_cn": o["options_cn"]}
 
 
-def load_progress() -> tuple[list, int]:
-    if not PROGRESS_FILE.exists():
-        return [], 0
-    try:
-        data = json.loads(PROGRESS_FILE.read_text(encoding="utf-8"))
-        return data.get("items", []), data.get("last_index", 0)
-    except Exception:
-        return [], 0
+def parse_batch_response(text: str, keys: list) -> dict[str, dict]:
+    """按 id 解析多题一批的 JSON 数组：返回 题目键 -> {question_cn, options_cn}，只含完好的元素；缺失或格式错误的题不在结果中。"""
+    return salvage_by_id(text, keys, _normalize_translation)
 
 
 def is_failed_item(item: dict) -> bool:
@@ -168,93 +148,84 @@ def is_failed_item(item: dict) -> bool:
     return not qcn.strip() or qcn.strip() == qen.strip()
 
 
-def save_progress(items: list, last_index: int):
-    PROGRESS_FILE.parent.mkdir(parents=True, exist_ok=True)
-    PROGRESS_FILE.write_text(
-        json.dumps({"items": items, "last_index": last_index}, ensure_ascii=False, indent=2),
-        encoding="utf-8",
-    )
+def _keep_english(item: dict) -> dict:
+    return {**item, "question_cn": item.get("question_en", ""), "options_cn": item.get("options_en", {})}
+
+
+def _is_valid_single(text: str) -> bool:
+    parsed = parse_response(text)
+    return isinstance(parsed, dict) and "question_cn" in parsed and "options_cn" in parsed
 
 
-def _translate_one(client_or_model, sdk: str, item: dict) -> dict:
+async def _translate_one(client, item: dict) -> dict:
     """翻译单题，失败则保留英文。返回更新后的 item。"""
     qid = item.get("id", 0)
     question_en = item.get("question_en", "")
     options_en = item.get("options_en", {})
-    prompt = build_prompt(question_en, options_en)
-    for attempt in range(RETRY_MAX + 1):
-        try:
-            if sdk == "new":
-                response = client_or_model.models.generate_content(
-                    model="gemini-2.0-flash-lite",
-                    contents=prompt,
-                )
-                text = response.text if hasattr(response, "text") else (response.candidates[0].content.parts[0].text if response.candidates else "")
-            else:
-                response = client_or_model.generate_content(prompt)
-                text = response.text if hasattr(response, "text") else (response.candidates[0].content.parts[0].text if response.candidates else "")
-            parsed = parse_response(text)
-            if parsed and "question_cn" in parsed and "options_cn" in parsed:
-                return {**item, "question_cn": parsed["question_cn"], "options_cn": parsed["options_cn"]}
-            return {**item, "question_cn": question_en, "options_cn": options_en}
-        except Exception as e:
-            err_str = str(e)
-            is_rate_limit = "429" in err_str or "Resource exhausted" in err_str or "quota" in err_str.lower() or "rate" in err_str.lower()
-            if is_rate_limit and attempt < RETRY_MAX:
-                wait = RETRY_WAIT_SEC[attempt]
-                print(f"  [429/限流] 题 {qid}，{wait} 秒后重试（第 {attempt + 1}/{RETRY_MAX} 次）")
-                time.sleep(wait)
-            else:
-                print(f"  [ERROR] 题 {qid}: {e}")
-                return {**item, "question_cn": question_en, "options_cn": options_en}
-    return {**item, "question_cn": question_en, "options_cn": options_en}
-
-
-def _translate_batch(client_or_model, sdk: str, items: list[dict]) -> list[dict]:
-    """每批最多 RETRY_BATCH_SIZE 题调用一次 API；失败或解析异常则逐题回退。返回更新后的 items。"""
+    if not question_en and not options_en:
+        return item
+    text = await client.generate(build_prompt(question_en, options_en), label=f"题 {qid}", validate=_is_valid_single)
+    if text is None:
+        return _keep_english(item)
+    parsed = parse_response(text)
+    if parsed and "question_cn" in parsed and "options_cn" in parsed:
+        return {**item, "question_cn": parsed["question_cn"], "options_cn": parsed["options_cn"]}
+    print(f"  [WARN] 题 {qid} 解析失败，保留英文")
+    return _keep_english(item)
+
+
+async def _request_batch(client, items: list[dict], batcher: AdaptiveBatcher | None = None) -> list[dict | None] | None:
+    """一批题只发一次请求；按批内题目键（重复题号为 "题号#n"）取回完好的译文，取不回的题为 None（由 bisect_batch 重新排队），请求失败返回 None（整批保留英文）。"""
     n = len(items)
-    prompt = build_batch_prompt(items)
-    for attempt in range(RETRY_MAX + 1):
-        try:
-            if sdk == "new":
-                response = client_or_model.models.generate_content(
-                    model="gemini-2.0-flash-lite",
-                    contents=prompt,
-                )
-                text = response.text if hasattr(response, "text") else (response.candidates[0].content.parts[0].text if response.candidates else "")
-            else:
-                response = client_or_model.generate_content(prompt)
-                text = response.text if hasattr(response, "text") else (response.candidates[0].content.parts[0].text if response.candidates else "")
-            parsed_list = parse_batch_response(text, n)
-            if parsed_list:
-                return [
-                    {**item, "question_cn": p["question_cn"], "options_cn": p["options_cn"]}
-                    for item, p in zip(items, parsed_list)
-                ]
-            # 解析失败则逐题回退
-            print(f"  [WARN] 本批 {n} 题解析异常，改为逐题请求")
-            return [_translate_one(client_or_model, sdk, item) for item in items]
-        except Exception as e:
-            err_str = str(e)
-            is_rate_limit = "429" in err_str or "Resource exhausted" in err_str or "quota" in err_str.lower() or "rate" in err_str.lower()
-            if is_rate_limit and attempt < RETRY_MAX:
-                wait = RETRY_WAIT_SEC[attempt]
-                ids_str = ",".join(str(item.get("id", i)) for i, item in enumerate(items))
-                print(f"  [429/限流] 本批题 {ids_str}，{wait} 秒后重试（第 {attempt + 1}/{RETRY_MAX} 次）")
-                time.sleep(wait)
-            else:
-                print(f"  [ERROR] 本批 {n} 题: {e}，改为逐题请求")
-                return [_translate_one(client_or_model, sdk, item) for item in items]
+    keys = question_keys(items)
+    ids_str = ",".join(keys)
+    text = await client.generate(build_batch_prompt(items), label=f"本批题 {ids_str}", validate=lambda t: bool(parse_batch_response(t, keys)))
+    if text is None:
+        print(f"  [WARN] 本批 {n} 题请求失败，保留英文，留待 --retry-failed")
+        return None
+    parsed = parse_batch_response(text, keys)
+    if batcher:
+        batcher.record(n, len(parsed), is_truncated(text))
+    if not parsed:
+        print(f"  [WARN] 本批 {n} 题解析异常{'，二分拆批重试' if n > 1 else ''}")
+    elif len(parsed) < n:
+        missing = [k for k in keys if k not in parsed]
+        print(f"  [WARN] 本批 {n} 题取回 {len(parsed)} 题，缺失/格式异常的题 {','.join(missing)} 重新请求")
     return [
-        {**item, "question_cn": item.get("question_en", ""), "options_cn": item.get("options_en", {})}
-        for item in items
+        {**item, "question_cn": parsed[key]["question_cn"], "options_cn": parsed[key]["options_cn"]} if key in parsed else None
+        for item, key in zip(items, keys)
     ]
 
 
-def _run_retry_failed(client_or_model, sdk: str, output_path: Path):
-    """只重试失败题；每 RETRY_BATCH_SIZE 题调用一次 API，减少 429。"""
-    if PROGRESS_FILE.exists():
-        done_items, last_index = load_progress()
+def _on_poison(item: dict):
+    print(f"  [POISON] 题 {item.get('id')} 单独成批仍失败，改用单题请求（已记入 {POISON_LOG.name}）")
+    record_poison(POISON_LOG, "translate", item.get("id"))
+
+
+async def translate_batch(client, items: list[dict], batcher: AdaptiveBatcher | None = None) -> list[dict]:
+    """一批题调用一次 API；解析异常则对半拆批递归重试，拆到单题仍失败再用单题 prompt；请求失败的批保留英文。返回更新后的 items。"""
+    # 无题干无选项的题不发请求，原样返回
+    todo = [item for item in items if item.get("question_en") or item.get("options_en")]
+    if not todo:
+        return list(items)
+    # 只有按预算装出的整批才反馈给 batcher，二分出的子批不计
+    translated = await bisect_batch(
+        todo,
+        lambda sub: _request_batch(client, sub, batcher if sub is todo else None),
+        lambda item: _translate_one(client, item),
+        _on_poison,
+        _keep_english,
+    )
+    by_obj = {id(src): out for src, out in zip(todo, translated)}
+    return [by_obj.get(id(item), item) for item in items]
+
+
+async def _run_retry_failed(client, output_path: Path, batcher: AdaptiveBatcher):
+    """只重试失败题；按 token 预算多题一批调用 API，每轮并发 concurrency 批。"""
+    journal = ProgressJournal(PROGRESS_FILE, legacy_path=LEGACY_PROGRESS_FILE)
+    if journal.exists():
+        done_items = journal.load()
+        last_index = len(done_items)
         source = "进度"
     else:
         if not output_path.exists():
@@ -269,49 +240,48 @@ def _run_retry_failed(client_or_model, sdk: str, output_path: Path):
     if not failed_indices:
         print(f"当前 {source} 中无失败题，无需重试。")
         return
-    print(f"从 {source} 中检出 {len(failed_indices)} 题需重试，每 {RETRY_BATCH_SIZE} 题一批调用 API")
-    # 按批处理
-    for start in range(0, len(failed_indices), RETRY_BATCH_SIZE):
-        chunk = failed_indices[start : start + RETRY_BATCH_SIZE]
-        batch_items = [done_items[i] for i in chunk]
-        updated = _translate_batch(client_or_model, sdk, batch_items)
-        for j, idx in enumerate(chunk):
-            done_items[idx] = updated[j]
-        batch_no = start // RETRY_BATCH_SIZE + 1
-        total_batches = (len(failed_indices) + RETRY_BATCH_SIZE - 1) // RETRY_BATCH_SIZE
-        print(f"  已重试第 {batch_no}/{total_batches} 批（本批 {len(chunk)} 题）")
-        time.sleep(BASE_SLEEP_SEC)
-    if PROGRESS_FILE.exists():
-        save_progress(done_items, last_index)
+    print(f"从 {source} 中检出 {len(failed_indices)} 题需重试，按每批约 {batcher.output_budget} 输出 token 装批调用 API")
+    client.plan(len(batcher.split([done_items[i] for i in failed_indices])))
+    pending = [done_items[i] for i in failed_indices]
+    updated: list[dict] = []
+    while len(updated) < len(pending):
+        chunks = batcher.split(pending[len(updated) :], max_batches=client.concurrency)
+        offsets = [len(updated) + sum(len(c) for c in chunks[:k]) for k in range(len(chunks))]
+
+        def on_batch(k: int, translated: list[dict]):
+            # 每批完成即写入断点日志，中断时已重试的题不丢
+            if source == "进度":
+                journal.update(failed_indices[offsets[k] : offsets[k] + len(translated)], translated)
+
+        results = await map_ordered(lambda chunk: translate_batch(client, chunk, batcher), chunks, on_batch)
+        for translated in results:
+            updated.extend(translated)
+        print(f"  已重试 {len(updated)}/{len(pending)} 题（本轮 {len(chunks)} 批，每批 {'/'.join(str(len(c)) for c in chunks)} 题）")
+    for idx, item in zip(failed_indices, updated):
+        done_items[idx] = item
+    if source == "进度":
+        journal.compact(done_items)
         print(f"已更新进度，共 {len(done_items)} 题，断点第 {last_index} 题。")
     else:
         output_path.write_text(json.dumps(done_items, ensure_ascii=False, indent=2), encoding="utf-8")
         print(f"已写入: {output_path}，共 {len(done_items)} 题。")
 
 
-def main():
-    import argparse
-    parser = argparse.ArgumentParser(description="Translate raw_questions_en.json to Chinese with Gemini")
-    parser.add_argument("input", nargs="?", default=str(DEFAULT_INPUT), help="Input JSON path")
-    parser.add_argument("output", nargs="?", default=str(DEFAULT_OUTPUT), help="Output JSON path")
-    parser.add_argument("--resume", action="store_true", help="Resume from last progress")
-    parser.add_argument("--limit", type=int, default=0, help="Max questions to translate (0 = all)")
-    parser.add_argument("--retry-failed", action="store_true", help="Only re-translate items that failed (429, etc.)")
-    args = parser.parse_args()
+async def _run(args, input_path: Path, output_path: Path):
+    client = create_client(args)
+    print("使用: Gemini 2 Flash Lite (SDK:", SDK_NAMES.get(client.sdk, client.sdk), f"，并发 {client.concurrency})")
 
-    input_path = Path(args.input).resolve()
-    output_path = Path(args.output).resolve()
-    if not input_path.exists():
-        print(f"输入文件不存在: {input_path}")
-        sys.exit(1)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        await _translate_all(args, client, input_path, output_path)
+    finally:
+        client.close()
 
-    client_or_model, sdk = get_client_or_model()
-    print("使用: Gemini 2 Flash Lite (SDK:", "google-genai" if sdk == "new" else "google-generativeai", ")")
 
+async def _translate_all(args, client, input_path: Path, output_path: Path):
     # --retry-failed：只重试失败题（从进度或最终 json 里找出 question_cn == question_en 的题）
     if args.retry_failed:
-        _run_retry_failed(client_or_model, sdk, output_path)
+        batcher = AdaptiveBatcher(estimate_input_tokens, estimate_output_tokens, output_budget=args.batch_tokens, metrics=client.metrics)
+        await _run_retry_failed(client, output_path, batcher)
         return
 
     with open(input_path, "r", encoding="utf-8") as f:
@@ -319,69 +289,75 @@ def main():
     if not isinstance(raw, list):
         raw = [raw]
 
-    done_items, last_index = load_progress() if args.resume else ([], 0)
-    if args.resume and done_items:
+    journal = ProgressJournal(PROGRESS_FILE, legacy_path=LEGACY_PROGRESS_FILE)
+    done_items = journal.load() if args.resume else []
+    last_index = len(done_items)
+    if done_items:
         print(f"从进度恢复: 已完成 {len(done_items)} 题，从第 {last_index + 1} 题继续")
     else:
-        last_index = 0
-        done_items = []
+        # 从头开始时清掉旧日志，避免新旧记录混在一起
+        journal.remove()
 
     end_index = len(raw) if args.limit <= 0 else min(last_index + args.limit, len(raw))
 
-    for i in range(last_index, end_index):
-        item = raw[i]
-        qid = item.get("id", i + 1)
-        question_en = item.get("question_en", "")
-        options_en = item.get("options_en", {})
-        if not question_en and not options_en:
-            done_items.append(item)
-            continue
-        prompt = build_prompt(question_en, options_en)
-        last_error = None
-        for attempt in range(RETRY_MAX + 1):
-            try:
-                if sdk == "new":
-                    response = client_or_model.models.generate_content(
-                        model="gemini-2.0-flash-lite",
-                        contents=prompt,
-                    )
-                    text = response.text if hasattr(response, "text") else (response.candidates[0].content.parts[0].text if response.candidates else "")
-                else:
-                    response = client_or_model.generate_content(prompt)
-                    text = response.text if hasattr(response, "text") else (response.candidates[0].content.parts[0].text if response.candidates else "")
-                parsed = parse_response(text)
-                if parsed and "question_cn" in parsed and "options_cn" in parsed:
-                    out = {**item, "question_cn": parsed["question_cn"], "options_cn": parsed["options_cn"]}
-                    done_items.append(out)
-                else:
-                    print(f"  [WARN] 题 {qid} 解析失败，保留英文")
-                    done_items.append({**item, "question_cn": question_en, "options_cn": options_en})
-                last_error = None
-                break
-            except Exception as e:
-                last_error = e
-                err_str = str(e)
-                is_rate_limit = "429" in err_str or "Resource exhausted" in err_str or "quota" in err_str.lower() or "rate" in err_str.lower()
-                if is_rate_limit and attempt < RETRY_MAX:
-                    wait = RETRY_WAIT_SEC[attempt]
-                    print(f"  [429/限流] 题 {qid}，{wait} 秒后重试（第 {attempt + 1}/{RETRY_MAX} 次）")
-                    time.sleep(wait)
-                else:
-                    print(f"  [ERROR] 题 {qid}: {e}")
-                    done_items.append({**item, "question_cn": question_en, "options_cn": options_en})
-                    break
-        # 每 50 题为 1 set 断点保存，便于 --resume 续跑
-        if (i + 1) % 50 == 0:
-            save_progress(done_items, i + 1)
-            print(f"  已处理 {i + 1}/{end_index} 题，已保存断点（第 {i + 1} 题）")
-        time.sleep(BASE_SLEEP_SEC)
+    if args.no_batch:
+        client.plan(end_index - last_index)
+        # 每 50 题为 1 set 并发单题翻译，按题号顺序收集后断点保存，便于 --resume 续跑
+        for start in range(last_index, end_index, PROGRESS_SAVE_EVERY):
+            chunk_end = min(start + PROGRESS_SAVE_EVERY, end_index)
+            translated = await map_ordered(lambda item: _translate_one(client, item), raw[start:chunk_end])
+            done_items.extend(translated)
+            journal.append(start, translated)
+            print(f"  已处理 {chunk_end}/{end_index} 题，已保存断点（第 {chunk_end} 题）")
+    else:
+        # 每轮按 token 预算装出 concurrency 批并发请求，按顺序收集后保存断点；预算随截断/缺失情况自动调整
+        batcher = AdaptiveBatcher(estimate_input_tokens, estimate_output_tokens, output_budget=args.batch_tokens, metrics=client.metrics)
+        print(f"按每批约 {batcher.output_budget} 输出 token 装批调用 API，每轮 {client.concurrency} 批")
+        client.plan(len(batcher.split(raw[last_index:end_index])))
+        start = last_index
+        while start < end_index:
+            chunks = batcher.split(raw[start:end_index], max_batches=client.concurrency)
+            round_end = start + sum(len(c) for c in chunks)
+            offsets = [start + sum(len(c) for c in chunks[:k]) for k in range(len(chunks))]
+            # 每批一完成就追加到断点日志（不必等同轮其它批），崩溃最多丢失在途的批次
+            results = await map_ordered(
+                lambda chunk: translate_batch(client, chunk, batcher),
+                chunks,
+                lambda k, translated: journal.append(offsets[k], translated),
+            )
+            for translated in results:
+                done_items.extend(translated)
+            print(f"  已处理 {round_end}/{end_index} 题（本轮每批 {'/'.join(str(len(c)) for c in chunks)} 题），已保存断点（第 {round_end} 题）")
+            start = round_end
 
     with open(output_path, "w", encoding="utf-8") as f:
         json.dump(done_items, f, ensure_ascii=False, indent=2)
-    if PROGRESS_FILE.exists():
-        PROGRESS_FILE.unlink()
+    journal.remove()
     print(f"已写入: {output_path}，共 {len(done_items)} 题")
 
 
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Translate raw_questions_en.json to Chinese with Gemini")
+    parser.add_argument("input", nargs="?", default=str(DEFAULT_INPUT), help="Input JSON path")
+    parser.add_argument("output", nargs="?", default=str(DEFAULT_OUTPUT), help="Output JSON path")
+    parser.add_argument("--resume", action="store_true", help="Resume from last progress")
+    parser.add_argument("--limit", type=int, default=0, help="Max questions to translate (0 = all)")
+    parser.add_argument("--retry-failed", action="store_true", help="Only re-translate items that failed (429, etc.)")
+    parser.add_argument("--no-batch", action="store_true", help="One request per question instead of token-budget batches")
+    add_llm_args(parser)
+    add_batch_args(parser)
+    args = parser.parse_args()
+
+    input_path = Path(args.input).resolve()
+    output_path = Path(args.output).resolve()
+    if not input_path.exists():
+        print(f"输入文件不存在: {input_path}")
+        sys.exit(1)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    run_llm(_run(args, input_path, output_path))
+
+
 if __name__ == "__main__":
     main()